@@ -0,0 +1,53 @@
+"""Add pending dependencies counter to build tasks
+
+Revision ID: 3b7d9e2f4a10
+Revises: 8f3c2d7a41e6
+Create Date: 2026-10-19 11:02:17.504113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3b7d9e2f4a10'
+down_revision = '8f3c2d7a41e6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'build_tasks',
+        sa.Column(
+            'pending_dependencies',
+            sa.Integer(),
+            server_default='0',
+            nullable=False,
+        ),
+    )
+    op.execute(
+        """
+        UPDATE build_tasks
+        SET pending_dependencies = deps.total
+        FROM (
+            SELECT build_task_id, count(*) AS total
+            FROM build_task_dependency
+            GROUP BY build_task_id
+        ) AS deps
+        WHERE build_tasks.id = deps.build_task_id
+        """
+    )
+    op.create_index(
+        'idx_build_tasks_ready',
+        'build_tasks',
+        ['arch', 'id'],
+        unique=False,
+        postgresql_where=sa.text(
+            'pending_dependencies = 0 AND status < 2'
+        ),
+    )
+
+
+def downgrade():
+    op.drop_index('idx_build_tasks_ready', table_name='build_tasks')
+    op.drop_column('build_tasks', 'pending_dependencies')
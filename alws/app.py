@@ -13,6 +13,7 @@ from alws.auth.oauth.github import get_github_oauth_client
 from alws.auth.schemas import UserRead
 from alws.config import settings
 from alws.middlewares import handlers
+from alws.utils.fastapi_sqla_setup import instrument_engines
 from alws.utils.limiter import limiter_shutdown, limiter_startup
 from alws.utils.metrics import PrometheusMiddleware, metrics_app
 from alws.utils.sentry import sentry_init
@@ -44,6 +45,9 @@ app.add_middleware(ExceptionMiddleware, handlers=handlers)
 app.add_middleware(PrometheusMiddleware)
 app.mount("/metrics", metrics_app())
 fastapi_sqla_setup(app)
+# Must be registered after fastapi-sqla's own startup handlers,
+# which create the engines being instrumented
+app.add_event_handler("startup", instrument_engines)
 
 for module in ROUTERS:
     for router_type in (
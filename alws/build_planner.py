@@ -12,6 +12,7 @@ from sqlalchemy.orm import selectinload
 from alws import models
 from alws.config import settings
 from alws.constants import BuildTaskRefType, BuildTaskStatus
+from alws.crud.build_repos_pool import BuildRepoPoolKey, claim_build_repos
 from alws.errors import DataNotFoundError, EmptyBuildError
 from alws.schemas import build_schema
 from alws.utils.beholder_client import BeholderClient
@@ -135,12 +136,18 @@ class BuildPlanner:
         arch: str,
         repo_type: str,
         is_debug: typing.Optional[bool] = False,
+        pool_entry: typing.Optional[models.BuildRepoPoolEntry] = None,
     ):
         debug_suffix = 'debug-' if is_debug else ''
         repo_name = f'{platform.name}-{arch}-{self._build.id}-{debug_suffix}br'
-        repo_url, pulp_href = await self._pulp_client.create_build_rpm_repo(
-            repo_name
-        )
+        if pool_entry:
+            repo_url, pulp_href = await self._pulp_client.rename_build_rpm_repo(
+                pool_entry.pulp_href, pool_entry.distro_href, repo_name
+            )
+        else:
+            repo_url, pulp_href = await self._pulp_client.create_build_rpm_repo(
+                repo_name
+            )
         modules = self._modules_by_platform_arch.get((platform.name, arch), [])
         if modules and not is_debug:
             await self._pulp_client.modify_repository(
@@ -187,6 +194,7 @@ class BuildPlanner:
                 self.create_log_repo(repo_type, repo_prefix=repo_prefix)
             )
 
+        repo_keys = []
         for platform in self._platforms:
             self.logger.info(
                 'Create repos for platform "%s" with id "%s"',
@@ -196,16 +204,29 @@ class BuildPlanner:
             for arch in self._request_platforms_arch_list[platform.name]:
                 if arch == 'src':
                     continue
+                repo_keys.append(BuildRepoPoolKey(platform.id, arch, False))
+                repo_keys.append(BuildRepoPoolKey(platform.id, arch, True))
+            # Add source RPM repository
+            repo_keys.append(BuildRepoPoolKey(platform.id, 'src', False))
 
-                tasks.append(self.create_build_repo(platform, arch, 'rpm'))
-                tasks.append(
-                    self.create_build_repo(
-                        platform, arch, 'rpm', is_debug=True
-                    )
+        # Repositories taken from the pool only need to be renamed,
+        # which is much faster than creating and publishing new ones
+        pool_entries = await claim_build_repos(
+            self._db, self._platforms, repo_keys
+        )
+        platforms_by_id = {
+            platform.id: platform for platform in self._platforms
+        }
+        for key in repo_keys:
+            tasks.append(
+                self.create_build_repo(
+                    platforms_by_id[key.platform_id],
+                    key.arch,
+                    'rpm',
+                    is_debug=key.debug,
+                    pool_entry=pool_entries.get(key),
                 )
-
-            # Add source RPM repository
-            tasks.append(self.create_build_repo(platform, 'src', 'rpm'))
+            )
 
         await asyncio.gather(*tasks)
 
@@ -709,4 +730,6 @@ class BuildPlanner:
                             [first_arch_task, *previous_tasks]
                         )
                 all_tasks.extend(tasks)
+        for task in all_tasks:
+            task.pending_dependencies = len(task.dependencies)
         self._db.add_all(all_tasks)
@@ -1,5 +1,5 @@
 import urllib.parse
-from typing import Annotated, Optional
+from typing import Annotated, List, Optional
 
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings
@@ -88,9 +88,51 @@ class Settings(BaseSettings):
     sign_server_username: Optional[str] = None
     sign_server_password: Optional[str] = None
     test_sign_key_id: Optional[str] = None
+    # Signed packages converted concurrently on sign task completion and
+    # the number of packages sent per repository modification
+    sign_task_conversion_concurrency: int = 10
+    sign_task_repo_batch_size: int = 200
+    # Build artifacts (packages and logs) put into Pulp at once on build
+    # task completion
+    build_artifacts_upload_concurrency: int = 10
 
     documentation_path: str = 'alws/documentation/'
 
+    # Pre-created build repositories kept per platform, arch and debug flag,
+    # claimed by new builds instead of creating repositories on build start.
+    # 0 disables the pool.
+    build_repos_pool_size: int = 0
+    build_repos_pool_platforms: List[str] = []
+
+    # Pulp repositories deleted concurrently on build removal and the
+    # number of attempts for each of them
+    pulp_cleanup_concurrency: int = 5
+    pulp_cleanup_retries: int = 3
+    # Repository modifications and publications running in Pulp at once
+    # per process
+    pulp_max_concurrent_tasks: int = 10
+    # Pages of a Pulp list endpoint requested at once
+    pulp_pagination_concurrency: int = 4
+    # Pulp artifact hrefs cached by sha256 to skip existence checks on
+    # upload, optionally shared between workers through redis
+    pulp_artifacts_cache_size: int = 10000
+    pulp_artifacts_cache_ttl: int = 3600
+    pulp_artifacts_cache_redis_enabled: bool = False
+    # Repositories modified by errata releases are published once they
+    # weren't modified for this number of seconds, 0 publishes right away
+    errata_publication_window: int = 60
+    # Failed publications are retried with doubling delays up to this
+    # number of times, then the repositories wait for the next release
+    errata_publication_max_retries: int = 5
+    # Updateinfo XML of released errata records is kept in redis for
+    # this number of seconds, 0 disables the cache
+    updateinfo_xml_cache_ttl: int = 7 * 24 * 3600
+    # OVAL registry of a platform is rebuilt from released errata records
+    # once it's older than this number of seconds, 0 disables expiration
+    oval_registry_ttl: int = 24 * 3600
+    # Fetched modules.yaml files cached by their repomd.xml checksum
+    modules_yaml_cache_size: int = 64
+
     # When False, the Swagger UI "Try it out" button is removed from /docs so
     # that endpoints can't be executed against the live server. Enable it only
     # on dev/local environments.
@@ -98,6 +140,11 @@ class Settings(BaseSettings):
 
     logging_level: Optional[str] = 'INFO'
 
+    # Opt-in SQLAlchemy instrumentation: per-route/per-actor query counts and
+    # a log of statements slower than the threshold (in seconds).
+    db_query_metrics_enabled: bool = False
+    db_slow_query_threshold: float = 1.0
+
     frontend_baseurl: Annotated[str, Field(validate_default=True)] = (
         'http://localhost:8080'
     )
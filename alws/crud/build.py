@@ -3,6 +3,7 @@ import typing
 
 import redis.asyncio as aioredis
 import sqlalchemy
+from fastapi_sqla import open_async_session
 from sqlalchemy import delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -12,6 +13,7 @@ from sqlalchemy.sql.expression import func
 from alws import models
 from alws.config import settings
 from alws.crud.repository import remove_repos_from_pulp
+from alws.dependencies import get_async_db_key
 from alws.dramatiq import start_build
 from alws.errors import BuildError, DataNotFoundError, PermissionDenied
 from alws.perms import actions
@@ -19,6 +21,9 @@ from alws.perms.authorization import can_perform
 from alws.schemas import build_schema
 from alws.utils.pulp_client import PulpClient
 
+# Build tasks deleted per transaction by remove_build_data
+BUILD_REMOVAL_CHUNK_SIZE = 500
+
 
 async def create_build(
     db: AsyncSession,
@@ -172,6 +177,8 @@ async def get_builds(
 
         if build_id is not None:
             query = query.where(models.Build.id == build_id)
+        else:
+            query = query.where(models.Build.deleting.is_(False))
         if project is not None:
             query = query.filter(
                 models.BuildTaskRef.url.like(f"%/{project}%"),
@@ -262,65 +269,31 @@ async def get_module_preview(
     )
 
 
-def get_task_data_from_build(build: models.Build):
-    repos = []
-    repo_ids = []
-    build_task_ids = []
-    build_task_artifact_ids = []
-    build_task_ref_ids = []
-    test_task_ids = []
-    test_task_artifact_ids = []
-    for bt in build.tasks:
-        build_task_ids.append(bt.id)
-        build_task_ref_ids.append(bt.ref_id)
-        for build_artifact in bt.artifacts:
-            build_task_artifact_ids.append(build_artifact.id)
-        for tt in bt.test_tasks:
-            test_task_ids.append(tt.id)
-            repo_ids.append(tt.repository_id)
-            for test_artifact in tt.artifacts:
-                test_task_artifact_ids.append(test_artifact.id)
-    for br in build.repos:
-        repos.append(br.pulp_href)
-        repo_ids.append(br.id)
-    return (
-        repos,
-        repo_ids,
-        build_task_ids,
-        build_task_artifact_ids,
-        build_task_ref_ids,
-        test_task_ids,
-        test_task_artifact_ids,
-    )
-
-
-async def remove_build_data(db: AsyncSession, build: models.Build):
-    (
-        repos,
-        repo_ids,
-        build_task_ids,
-        build_task_artifact_ids,
-        build_task_ref_ids,
-        test_task_ids,
-        test_task_artifact_ids,
-    ) = get_task_data_from_build(build)
-    build_id = build.id
-    await db.execute(
-        delete(models.BuildRepo).where(models.BuildRepo.c.build_id == build_id)
-    )
-    await db.execute(
-        delete(models.BuildPlatformFlavour).where(
-            models.BuildPlatformFlavour.c.build_id == build_id
+async def __remove_build_tasks(
+    db: AsyncSession,
+    build_task_ids: typing.List[int],
+) -> typing.Tuple[typing.Set[int], typing.Set[int]]:
+    test_repo_ids = (
+        (
+            await db.execute(
+                select(models.TestTask.repository_id).where(
+                    models.TestTask.build_task_id.in_(build_task_ids)
+                )
+            )
         )
+        .scalars()
+        .all()
     )
-    await db.execute(
-        delete(models.SignTask).where(models.SignTask.build_id == build_id)
-    )
-    await db.execute(
-        delete(models.BinaryRpm).where(models.BinaryRpm.build_id == build_id)
-    )
-    await db.execute(
-        delete(models.SourceRpm).where(models.SourceRpm.build_id == build_id)
+    ref_ids = (
+        (
+            await db.execute(
+                select(models.BuildTask.ref_id).where(
+                    models.BuildTask.id.in_(build_task_ids)
+                )
+            )
+        )
+        .scalars()
+        .all()
     )
     await db.execute(
         delete(models.PerformanceStats).where(
@@ -329,49 +302,142 @@ async def remove_build_data(db: AsyncSession, build: models.Build):
     )
     await db.execute(
         delete(models.PerformanceStats).where(
-            models.PerformanceStats.test_task_id.in_(test_task_ids)
+            models.PerformanceStats.test_task_id == models.TestTask.id,
+            models.TestTask.build_task_id.in_(build_task_ids),
         )
     )
     await db.execute(
         delete(models.TestTaskArtifact).where(
-            models.TestTaskArtifact.id.in_(test_task_artifact_ids)
+            models.TestTaskArtifact.test_task_id == models.TestTask.id,
+            models.TestTask.build_task_id.in_(build_task_ids),
         )
     )
     await db.execute(
-        delete(models.TestTask).where(models.TestTask.id.in_(test_task_ids))
+        delete(models.TestTask).where(
+            models.TestTask.build_task_id.in_(build_task_ids)
+        )
     )
     await db.execute(
         delete(models.BuildTaskArtifact).where(
-            models.BuildTaskArtifact.id.in_(build_task_artifact_ids)
+            models.BuildTaskArtifact.build_task_id.in_(build_task_ids)
         )
     )
     await db.execute(
         delete(models.BuildTaskDependency).where(
-            models.BuildTaskDependency.c.build_task_dependency.in_(
-                build_task_ids
+            sqlalchemy.or_(
+                models.BuildTaskDependency.c.build_task_id.in_(build_task_ids),
+                models.BuildTaskDependency.c.build_task_dependency.in_(
+                    build_task_ids
+                ),
             )
         )
     )
     await db.execute(
-        delete(models.Repository).where(models.Repository.id.in_(repo_ids))
+        delete(models.BuildTaskRpmModuleMapping).where(
+            models.BuildTaskRpmModuleMapping.c.build_task_id.in_(build_task_ids)
+        )
     )
     await db.execute(
-        delete(models.BuildTask).where(models.BuildTask.build_id == build_id)
+        delete(models.BuildTask).where(models.BuildTask.id.in_(build_task_ids))
     )
-    await db.execute(
-        delete(models.BuildDependency).where(
-            sqlalchemy.or_(
-                models.BuildDependency.c.build_dependency == build_id,
-                models.BuildDependency.c.build_id == build_id,
+    return set(test_repo_ids), set(ref_ids)
+
+
+async def remove_build_data(build_id: int):
+    """Delete the build with all its data and Pulp repositories.
+
+    Rows are removed with set-based statements in several short
+    transactions, build tasks are processed in chunks of
+    BUILD_REMOVAL_CHUNK_SIZE. Every step can be safely re-run,
+    so a removal interrupted by an error can simply be retried.
+    Builds which aren't marked for deletion are left untouched.
+    """
+    async with open_async_session(key=get_async_db_key()) as db:
+        deleting = await db.scalar(
+            select(models.Build.deleting).where(models.Build.id == build_id)
+        )
+        if not deleting:
+            logging.warning(
+                "Build %s is not marked for deletion, skipping removal",
+                build_id,
             )
+            return
+        build_repos = (
+            await db.execute(
+                select(models.Repository.id, models.Repository.pulp_href)
+                .join(
+                    models.BuildRepo,
+                    models.BuildRepo.c.repository_id == models.Repository.id,
+                )
+                .where(models.BuildRepo.c.build_id == build_id)
+            )
+        ).all()
+        build_task_ids = (
+            (
+                await db.execute(
+                    select(models.BuildTask.id)
+                    .where(models.BuildTask.build_id == build_id)
+                    .order_by(models.BuildTask.id)
+                )
+            )
+            .scalars()
+            .all()
         )
-    )
-    await db.execute(
-        delete(models.BuildTaskRef).where(
-            models.BuildTaskRef.id.in_(build_task_ref_ids)
+        await db.execute(
+            delete(models.BuildPlatformFlavour).where(
+                models.BuildPlatformFlavour.c.build_id == build_id
+            )
+        )
+        await db.execute(
+            delete(models.SignTask).where(models.SignTask.build_id == build_id)
+        )
+        await db.execute(
+            delete(models.BinaryRpm).where(
+                models.BinaryRpm.build_id == build_id
+            )
+        )
+        await db.execute(
+            delete(models.SourceRpm).where(
+                models.SourceRpm.build_id == build_id
+            )
+        )
+
+    repo_ids = {repo_id for repo_id, _ in build_repos}
+    ref_ids = set()
+    for start in range(0, len(build_task_ids), BUILD_REMOVAL_CHUNK_SIZE):
+        chunk = build_task_ids[start : start + BUILD_REMOVAL_CHUNK_SIZE]
+        async with open_async_session(key=get_async_db_key()) as db:
+            chunk_repo_ids, chunk_ref_ids = await __remove_build_tasks(
+                db, chunk
+            )
+        repo_ids.update(chunk_repo_ids)
+        ref_ids.update(chunk_ref_ids)
+
+    async with open_async_session(key=get_async_db_key()) as db:
+        await db.execute(
+            delete(models.BuildRepo).where(
+                models.BuildRepo.c.build_id == build_id
+            )
+        )
+        await db.execute(
+            delete(models.BuildDependency).where(
+                sqlalchemy.or_(
+                    models.BuildDependency.c.build_dependency == build_id,
+                    models.BuildDependency.c.build_id == build_id,
+                )
+            )
+        )
+        await db.execute(
+            delete(models.Repository).where(models.Repository.id.in_(repo_ids))
+        )
+        await db.execute(
+            delete(models.BuildTaskRef).where(
+                models.BuildTaskRef.id.in_(ref_ids)
+            )
+        )
+        await db.execute(
+            delete(models.Build).where(models.Build.id == build_id)
         )
-    )
-    await db.execute(delete(models.Build).where(models.Build.id == build_id))
     # FIXME
     # it seems we cannot just delete any files because
     # https://docs.pulpproject.org/pulpcore/restapi.html#tag/Content:-Files
@@ -381,26 +447,23 @@ async def remove_build_data(db: AsyncSession, build: models.Build):
     # "Remove Artifact only if it is not associated with any Content."
     # for artifact in artifacts:
     # await pulp_client.remove_artifact(artifact)
-    try:
-        await remove_repos_from_pulp(repos)
-    except Exception as err:
-        logging.exception("Cannot delete repo from pulp: %s", err)
+    failed_repos = await remove_repos_from_pulp(
+        [pulp_href for _, pulp_href in build_repos]
+    )
+    if failed_repos:
+        logging.error(
+            "Cannot delete repos of build %d from pulp: %s",
+            build_id,
+            ", ".join(failed_repos),
+        )
 
 
 async def remove_build_job(db: AsyncSession, build_id: int):
+    """Mark the build for removal, the data is deleted by remove_build_data."""
     query_bj = (
         select(models.Build)
         .where(models.Build.id == build_id)
-        .options(
-            selectinload(models.Build.tasks).selectinload(
-                models.BuildTask.artifacts
-            ),
-            selectinload(models.Build.repos),
-            selectinload(models.Build.products),
-            selectinload(models.Build.tasks)
-            .selectinload(models.BuildTask.test_tasks)
-            .selectinload(models.TestTask.artifacts),
-        )
+        .options(selectinload(models.Build.products))
     )
     build = await db.execute(query_bj)
     build = build.scalars().first()
@@ -414,4 +477,5 @@ async def remove_build_job(db: AsyncSession, build_id: int):
         )
     if build.released:
         raise BuildError(f"Build with {build_id} is released")
-    await remove_build_data(db, build)
+    build.deleting = True
+    await db.flush()
@@ -1,4 +1,5 @@
 import asyncio
+import contextlib
 import datetime
 import logging
 import traceback
@@ -58,7 +59,7 @@ async def get_available_build_task(
     )
     db_task = await db.execute(
         select(models.BuildTask)
-        .where(~models.BuildTask.dependencies.any())
+        .where(models.BuildTask.pending_dependencies == 0)
         .join(
             models.BuildTask.ref,
         )
@@ -72,6 +73,12 @@ async def get_available_build_task(
                     models.BuildTask.ts.is_(None),
                 ),
                 exclude_condition,
+                # Tasks of builds marked for removal are never dispatched
+                models.BuildTask.build_id.not_in(
+                    select(models.Build.id).where(
+                        models.Build.deleting.is_(True)
+                    )
+                ),
             )
         )
         .options(
@@ -111,6 +118,46 @@ def add_build_task_dependencies(
     last_task: models.BuildTask,
 ):
     task.dependencies.append(last_task)
+    task.pending_dependencies += 1
+
+
+async def remove_build_task_dependencies(
+    db: AsyncSession,
+    dependency_ids: typing.List[int],
+):
+    """Release the tasks waiting for the given (finished) tasks.
+
+    Dependency edges are removed and the pending dependencies counters
+    of their dependents are decremented in a single statement.
+    """
+    removed_dependencies = (
+        delete(models.BuildTaskDependency)
+        .where(
+            models.BuildTaskDependency.c.build_task_dependency.in_(
+                dependency_ids
+            ),
+        )
+        .returning(models.BuildTaskDependency.c.build_task_id)
+        .cte("removed_dependencies")
+    )
+    released_tasks = (
+        select(
+            removed_dependencies.c.build_task_id,
+            sqlalchemy.func.count().label("total"),
+        )
+        .group_by(removed_dependencies.c.build_task_id)
+        .cte("released_tasks")
+    )
+    await db.execute(
+        update(models.BuildTask)
+        .where(models.BuildTask.id == released_tasks.c.build_task_id)
+        .values(
+            pending_dependencies=(
+                models.BuildTask.pending_dependencies - released_tasks.c.total
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
 
 
 async def get_failed_build_tasks_matrix(db: AsyncSession, build_id: int):
@@ -300,6 +347,18 @@ async def get_build_task(db: AsyncSession, task_id: int) -> models.BuildTask:
     return build_tasks.scalars().first()
 
 
+@contextlib.contextmanager
+def __measure_stage(processing_stats: dict, stage: str):
+    start_time = datetime.datetime.utcnow()
+    yield
+    end_time = datetime.datetime.utcnow()
+    processing_stats[stage] = {
+        "start_ts": str(start_time),
+        "end_ts": str(end_time),
+        "delta": str(end_time - start_time),
+    }
+
+
 def __verify_checksums(
     processed_entities: typing.List[
         typing.Tuple[str, str, build_node_schema.BuildDoneArtifact]
@@ -330,18 +389,14 @@ async def get_srpm_artifact_by_build_task_id(
     return srpm_artifact.scalars().first()
 
 
-async def __process_rpms(
-    db: AsyncSession,
-    pulp_client: PulpClient,
-    build_id: int,
-    task_id: int,
+def __group_rpm_artifacts(
     task_arch: str,
-    task_artifacts: list,
-    repositories: list,
-    built_srpm_url: str = None,
-    module_index=None,
-    task_excluded=False,
-):
+    task_artifacts: typing.List[BuildDoneArtifact],
+    repositories: typing.List[models.Repository],
+    built_srpm_url: typing.Optional[str] = None,
+) -> typing.List[
+    typing.Tuple[models.Repository, typing.List[BuildDoneArtifact]]
+]:
     def get_repo(repo_arch, is_debug):
         return next(
             build_repo
@@ -351,59 +406,134 @@ async def __process_rpms(
             and build_repo.debug == is_debug
         )
 
-    arch_repo = None
-    debug_repo = None
-    if task_arch != 'src':
-        arch_repo = get_repo(task_arch, False)
-        debug_repo = get_repo(task_arch, True)
-    src_repo = get_repo("src", False)
-    arch_packages_tasks = []
-    src_packages_tasks = []
-    debug_packages_tasks = []
+    src_artifacts = []
+    arch_artifacts = []
+    debug_artifacts = []
     for artifact in task_artifacts:
         if task_arch == 'src':
             if artifact.arch == "src":
-                src_packages_tasks.append(pulp_client.create_entity(artifact))
+                src_artifacts.append(artifact)
                 break
             continue
         if artifact.arch == "src":
             if built_srpm_url is None:
-                src_packages_tasks.append(pulp_client.create_entity(artifact))
+                src_artifacts.append(artifact)
         elif artifact.is_debuginfo:
-            debug_packages_tasks.append(pulp_client.create_entity(artifact))
+            debug_artifacts.append(artifact)
         else:
-            arch_packages_tasks.append(pulp_client.create_entity(artifact))
+            arch_artifacts.append(artifact)
 
-    processed_packages = []
-    for tasks, repo in (
-        (src_packages_tasks, src_repo),
-        (arch_packages_tasks, arch_repo),
-        (debug_packages_tasks, debug_repo),
-    ):
-        if not tasks:
-            continue
-        try:
-            results = await asyncio.gather(*tasks)
-        except Exception as e:
-            logging.exception(
-                "Cannot create RPM packages for repo %s", str(repo)
-            )
-            raise ArtifactConversionError(
-                f"Cannot put RPM packages into Pulp storage: {e}"
-            )
-        processed_packages.extend(results)
-        hrefs = [item[0] for item in results]
-        __verify_checksums(processed_packages)
-        try:
-            await pulp_client.modify_repository(repo.pulp_href, add=hrefs)
-        except Exception:
-            logging.exception(
-                "Cannot add RPM packages to the repository: %s", str(repo)
-            )
-            raise RepositoryAddError(
-                f"Cannot add RPM packages to the repository {str(repo)}"
+    groups = []
+    if src_artifacts:
+        groups.append((get_repo("src", False), src_artifacts))
+    if arch_artifacts:
+        groups.append((get_repo(task_arch, False), arch_artifacts))
+    if debug_artifacts:
+        groups.append((get_repo(task_arch, True), debug_artifacts))
+    return groups
+
+
+async def __create_entities(
+    pulp_client: PulpClient,
+    semaphore: asyncio.Semaphore,
+    repository: models.Repository,
+    artifacts: typing.List[BuildDoneArtifact],
+) -> typing.List[typing.Tuple[str, str, BuildDoneArtifact]]:
+    async def create_entity(artifact: BuildDoneArtifact):
+        async with semaphore:
+            return await pulp_client.create_entity(artifact)
+
+    try:
+        return list(
+            await asyncio.gather(
+                *(create_entity(artifact) for artifact in artifacts)
             )
+        )
+    except Exception as e:
+        logging.exception(
+            "Cannot create artifacts for repo %s", str(repository)
+        )
+        raise ArtifactConversionError(
+            f"Cannot put artifacts for {str(repository)} "
+            f"into Pulp storage: {e}"
+        )
+
 
+async def __add_to_repository(
+    pulp_client: PulpClient,
+    repository: models.Repository,
+    hrefs: typing.List[str],
+    immediate: bool = False,
+):
+    try:
+        await pulp_client.modify_repository(
+            repository.pulp_href, add=hrefs, immediate=immediate
+        )
+    except Exception as e:
+        logging.exception(
+            "Cannot add artifacts to the repository: %s", str(repository)
+        )
+        raise RepositoryAddError(
+            f"Cannot add artifacts to the repository {str(repository)}: {e}"
+        )
+
+
+async def __upload_artifacts(
+    pulp_client: PulpClient,
+    artifact_groups: typing.List[
+        typing.Tuple[models.Repository, typing.List[BuildDoneArtifact]]
+    ],
+    immediate: bool = False,
+) -> typing.List[typing.List[typing.Tuple[str, str, BuildDoneArtifact]]]:
+    """
+    Creates Pulp entities for all artifact groups at once, verifies their
+    checksums and adds each group to its repository. Repositories are
+    modified on the build_done transaction commit unless immediate is set.
+    """
+
+    # All artifacts are checked with a single lookup, so missing uploads
+    # fail the build task before any Pulp content is created
+    existing_artifacts = await pulp_client.get_existing_artifacts(
+        artifact.sha256
+        for _, artifacts in artifact_groups
+        for artifact in artifacts
+    )
+    missing_artifacts = sorted({
+        artifact.name
+        for _, artifacts in artifact_groups
+        for artifact in artifacts
+        if artifact.sha256 not in existing_artifacts
+    })
+    if missing_artifacts:
+        raise ArtifactConversionError(
+            "Artifacts are missing in Pulp storage: "
+            f"{', '.join(missing_artifacts)}"
+        )
+    semaphore = asyncio.Semaphore(settings.build_artifacts_upload_concurrency)
+    results = await asyncio.gather(*(
+        __create_entities(pulp_client, semaphore, repo, artifacts)
+        for repo, artifacts in artifact_groups
+    ))
+    __verify_checksums([entity for group in results for entity in group])
+    for (repo, _), entities in zip(artifact_groups, results):
+        await __add_to_repository(
+            pulp_client,
+            repo,
+            [href for href, _, _ in entities],
+            immediate=immediate,
+        )
+    return results
+
+
+async def __process_rpms(
+    db: AsyncSession,
+    build_id: int,
+    task_id: int,
+    processed_packages: typing.List[typing.Tuple[str, str, BuildDoneArtifact]],
+    built_srpm_url: str = None,
+    module_index=None,
+    task_excluded=False,
+):
     rpms = [
         models.BuildTaskArtifact(
             build_task_id=task_id,
@@ -498,47 +628,20 @@ async def __process_rpms(
     return rpms
 
 
-async def __process_logs(
-    pulp_client: PulpClient,
+def __get_log_entries(
     task_id: int,
-    task_artifacts: list,
-    repository: models.Repository,
-):
-    if not repository:
-        logging.error("Log repository is absent, skipping logs processing")
-        return
-    logs = []
-    tasks = [pulp_client.create_entity(artifact) for artifact in task_artifacts]
-    try:
-        results = await asyncio.gather(*tasks)
-    except Exception as e:
-        logging.exception("Cannot create log files for %s", str(repository))
-        raise ArtifactConversionError(
-            f"Cannot create log files for {str(repository)}, error: {str(e)}"
-        )
-
-    __verify_checksums(results)
-
-    hrefs = []
-    for href, _, artifact in results:
-        logs.append(
-            models.BuildTaskArtifact(
-                build_task_id=task_id,
-                name=artifact.name,
-                type=artifact.type,
-                href=href,
-                cas_hash=artifact.cas_hash,
-            )
-        )
-        hrefs.append(href)
-    try:
-        await pulp_client.modify_repository(repository.pulp_href, add=hrefs)
-    except Exception as e:
-        logging.exception("Cannot add log files to the repository: %s", str(e))
-        raise RepositoryAddError(
-            "Cannot save build log into Pulp repository: %s", str(e)
+    processed_logs: typing.List[typing.Tuple[str, str, BuildDoneArtifact]],
+) -> typing.List[models.BuildTaskArtifact]:
+    return [
+        models.BuildTaskArtifact(
+            build_task_id=task_id,
+            name=artifact.name,
+            type=artifact.type,
+            href=href,
+            cas_hash=artifact.cas_hash,
         )
-    return logs
+        for href, _, artifact in processed_logs
+    ]
 
 
 # TODO: Improve readability
@@ -634,10 +737,13 @@ async def __process_build_task_artifacts(
             if build_repo.arch == build_task.arch and build_repo.debug is False
         )
         try:
-            repo_modules_yaml = await pulp_client.get_repo_modules_yaml(
+            repo_modules = await pulp_client.fetch_repo_modules_yaml(
                 module_repo.url
             )
-            module_index = IndexWrapper.from_template(repo_modules_yaml)
+            if repo_modules is None:
+                raise ValueError(f"{module_repo.url} has no modules.yaml")
+            # The cached index is shared, it's modified below
+            module_index = repo_modules.index.copy()
         except Exception as e:
             message = f"Cannot parse modules index: {str(e)}"
             logging.exception("Cannot parse modules index: %s", str(e))
@@ -656,42 +762,42 @@ async def __process_build_task_artifacts(
         message = "No source RPM was sent from build node"
         logging.error(message)
         raise SrpmProvisionError(message)
-    # Committing logs separately for UI to be able to fetch them
+    # Committing logs separately for UI to be able to fetch them,
+    # they are kept even if packages processing fails
     logging.info("Processing logs")
-    start_time = datetime.datetime.utcnow()
-    logs_entries = await __process_logs(
-        pulp_client, build_task.id, log_artifacts, log_repository
-    )
-    if logs_entries:
-        db.add_all(logs_entries)
-        await db.flush()
-    end_time = datetime.datetime.utcnow()
-    processing_stats["logs_processing"] = {
-        "start_ts": str(start_time),
-        "end_ts": str(end_time),
-        "delta": str(end_time - start_time),
-    }
+    with __measure_stage(processing_stats, "logs_processing"):
+        if not log_repository:
+            logging.error("Log repository is absent, skipping logs processing")
+        elif log_artifacts:
+            (processed_logs,) = await __upload_artifacts(
+                pulp_client,
+                [(log_repository, log_artifacts)],
+                immediate=True,
+            )
+            db.add_all(__get_log_entries(build_task.id, processed_logs))
+            await db.flush()
     logging.info("Logs processing is finished")
     logging.info("Processing packages")
-    start_time = datetime.datetime.utcnow()
-    rpm_entries = await __process_rpms(
-        db,
-        pulp_client,
-        build_task.build_id,
-        build_task.id,
-        build_task.arch,
-        rpm_artifacts,
-        rpm_repositories,
-        built_srpm_url=build_task.built_srpm_url,
-        module_index=module_index,
-        task_excluded=status.value == BuildTaskStatus.EXCLUDED,
-    )
-    end_time = datetime.datetime.utcnow()
-    processing_stats["packages_processing"] = {
-        "start_ts": str(start_time),
-        "end_ts": str(end_time),
-        "delta": str(end_time - start_time),
-    }
+    with __measure_stage(processing_stats, "packages_processing"):
+        artifact_groups = __group_rpm_artifacts(
+            build_task.arch,
+            rpm_artifacts,
+            rpm_repositories,
+            built_srpm_url=build_task.built_srpm_url,
+        )
+        with __measure_stage(processing_stats, "artifacts_upload"):
+            processed_groups = await __upload_artifacts(
+                pulp_client, artifact_groups
+            )
+        rpm_entries = await __process_rpms(
+            db,
+            build_task.build_id,
+            build_task.id,
+            [entity for group in processed_groups for entity in group],
+            built_srpm_url=build_task.built_srpm_url,
+            module_index=module_index,
+            task_excluded=status.value == BuildTaskStatus.EXCLUDED,
+        )
     logging.info("Packages processing is finished")
     multilib_conditions = (
         src_rpm is not None,
@@ -707,27 +813,23 @@ async def __process_build_task_artifacts(
             db, build_task, pulp_client=pulp_client, module_index=module_index
         )
         logging.info("Processing multilib packages")
-        start_time = datetime.datetime.utcnow()
-        multilib_packages = await processor.get_packages(src_rpm)
-        if module_index:
-            multilib_module_artifacts = await processor.get_module_artifacts()
-            multilib_packages.update(
-                {i["name"]: i["version"] for i in multilib_module_artifacts}
-            )
-            await processor.add_multilib_packages(multilib_packages)
-            parsed_src = RpmArtifact.from_str(src_rpm)
-            await processor.add_multilib_module_artifacts(
-                src_name=parsed_src.name,
-                prepared_artifacts=multilib_module_artifacts,
-            )
-        else:
-            await processor.add_multilib_packages(multilib_packages)
-        end_time = datetime.datetime.utcnow()
-        processing_stats["multilib_processing"] = {
-            "start_ts": str(start_time),
-            "end_ts": str(end_time),
-            "delta": str(end_time - start_time),
-        }
+        with __measure_stage(processing_stats, "multilib_processing"):
+            multilib_packages = await processor.get_packages(src_rpm)
+            if module_index:
+                multilib_module_artifacts = (
+                    await processor.get_module_artifacts()
+                )
+                multilib_packages.update(
+                    {i["name"]: i["version"] for i in multilib_module_artifacts}
+                )
+                await processor.add_multilib_packages(multilib_packages)
+                parsed_src = RpmArtifact.from_str(src_rpm)
+                await processor.add_multilib_module_artifacts(
+                    src_name=parsed_src.name,
+                    prepared_artifacts=multilib_module_artifacts,
+                )
+            else:
+                await processor.add_multilib_packages(multilib_packages)
         logging.info("Multilib packages processing is finished")
     old_modules = []
     new_modules = []
@@ -902,13 +1004,7 @@ async def __update_built_srpm_url(
             .values(status=BuildTaskStatus.FAILED, error=fast_fail_msg)
         )
         await db.execute(update_query)
-
-        remove_query = delete(models.BuildTaskDependency).where(
-            models.BuildTaskDependency.c.build_task_dependency.in_(
-                uncompleted_tasks_ids
-            ),
-        )
-        await db.execute(remove_query)
+        await remove_build_task_dependencies(db, uncompleted_tasks_ids)
         return
 
     # if SRPM built we need to download them
@@ -981,13 +1077,7 @@ async def fast_fail_other_tasks_by_ref(
         )
         .values(status=BuildTaskStatus.FAILED, error=fast_fail_msg)
     )
-    await db.execute(
-        delete(models.BuildTaskDependency).where(
-            models.BuildTaskDependency.c.build_task_dependency.in_(
-                uncompleted_tasks_ids
-            ),
-        )
-    )
+    await remove_build_task_dependencies(db, uncompleted_tasks_ids)
 
 
 async def safe_build_done(
@@ -1032,10 +1122,6 @@ async def safe_build_done(
         await __update_built_srpm_url(db, build_task, request)
         await db.flush()
     finally:
-        remove_dep_query = delete(models.BuildTaskDependency).where(
-            models.BuildTaskDependency.c.build_task_dependency
-            == request.task_id
-        )
         build_task_start_time = request.stats.get("build_node_task", {}).get(
             "start_ts"
         )
@@ -1057,7 +1143,7 @@ async def safe_build_done(
                 statistics=build_task_stats,
             ),
         )
-        await db.execute(remove_dep_query)
+        await remove_build_task_dependencies(db, [request.task_id])
         await db.flush()
     logging.info("Build task: %d, processing is finished", request.task_id)
     return success
@@ -1088,12 +1174,16 @@ async def build_done(
     )
 
     start_time = datetime.datetime.utcnow()
-    binary_rpms = await save_noarch_packages(db, pulp, build_task)
+    noarch_stats = {}
+    binary_rpms = await save_noarch_packages(
+        db, pulp, build_task, stats=noarch_stats
+    )
     end_time = datetime.datetime.utcnow()
-    processing_stats["noarch_processing"] = {
+    build_done_stats["noarch_processing"] = {
         "start_ts": str(start_time),
         "end_ts": str(end_time),
         "delta": str(end_time - start_time),
+        **noarch_stats,
     }
 
     rpms_result = await db.execute(
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import typing
+import uuid
+
+from fastapi_sqla import open_async_session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.sql.expression import func
+
+from alws import models
+from alws.config import settings
+from alws.crud.repository import remove_repos_from_pulp
+from alws.dependencies import get_async_db_key
+from alws.utils.metrics import (
+    BUILD_REPOS_POOL_AVAILABLE,
+    BUILD_REPOS_POOL_CLAIMS,
+    BUILD_REPOS_POOL_CREATED,
+)
+from alws.utils.pulp_client import PulpClient
+
+__all__ = [
+    'BuildRepoPoolKey',
+    'claim_build_repos',
+    'refill_build_repos_pool',
+]
+
+# Arbitrary key of the postgres advisory lock serializing pool registrations
+BUILD_REPOS_POOL_LOCK_ID = 7_031_001
+
+
+class BuildRepoPoolKey(typing.NamedTuple):
+    platform_id: int
+    arch: str
+    debug: bool
+
+
+def _get_pool_keys(platform: models.Platform) -> typing.List[BuildRepoPoolKey]:
+    keys = [BuildRepoPoolKey(platform.id, 'src', False)]
+    for arch in platform.arch_list:
+        keys.append(BuildRepoPoolKey(platform.id, arch, False))
+        keys.append(BuildRepoPoolKey(platform.id, arch, True))
+    return keys
+
+
+async def claim_build_repos(
+    db: AsyncSession,
+    platforms: typing.List[models.Platform],
+    keys: typing.List[BuildRepoPoolKey],
+) -> typing.Dict[BuildRepoPoolKey, models.BuildRepoPoolEntry]:
+    """Take one pooled repository for each key, when the pool has any.
+
+    Claimed entries are deleted within the caller's transaction, so they
+    return to the pool if the build creation is rolled back.
+    """
+    claimed = {}
+    if settings.build_repos_pool_size <= 0:
+        return claimed
+    platform_names = {platform.id: platform.name for platform in platforms}
+    for key in keys:
+        entry = (
+            (
+                await db.execute(
+                    select(models.BuildRepoPoolEntry)
+                    .where(
+                        models.BuildRepoPoolEntry.platform_id
+                        == key.platform_id,
+                        models.BuildRepoPoolEntry.arch == key.arch,
+                        models.BuildRepoPoolEntry.debug == key.debug,
+                    )
+                    .order_by(models.BuildRepoPoolEntry.id)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                )
+            )
+            .scalars()
+            .first()
+        )
+        platform_name = platform_names.get(key.platform_id, 'unknown')
+        if not entry:
+            BUILD_REPOS_POOL_CLAIMS.labels(platform_name, 'miss').inc()
+            continue
+        BUILD_REPOS_POOL_CLAIMS.labels(platform_name, 'hit').inc()
+        await db.delete(entry)
+        claimed[key] = entry
+    return claimed
+
+
+async def _create_pool_repo(
+    pulp_client: PulpClient,
+    platform_name: str,
+    key: BuildRepoPoolKey,
+) -> models.BuildRepoPoolEntry:
+    debug_suffix = 'debug-' if key.debug else ''
+    name = (
+        f'pool-{platform_name}-{key.arch}-{debug_suffix}'
+        f'{uuid.uuid4().hex[:12]}'
+    )
+    _, repo_href = await pulp_client.create_build_rpm_repo(name)
+    distro = await pulp_client.get_rpm_distro(name)
+    return models.BuildRepoPoolEntry(
+        platform_id=key.platform_id,
+        arch=key.arch,
+        debug=key.debug,
+        name=name,
+        pulp_href=repo_href,
+        distro_href=distro['pulp_href'],
+    )
+
+
+async def _remove_pool_repos(entries: typing.List[models.BuildRepoPoolEntry]):
+    failed = await remove_repos_from_pulp([
+        href
+        for entry in entries
+        for href in (entry.distro_href, entry.pulp_href)
+    ])
+    if failed:
+        logging.error('Cannot remove pooled repositories: %s', failed)
+
+
+async def _get_available_counts(
+    db: AsyncSession,
+) -> typing.Dict[BuildRepoPoolKey, int]:
+    counts = await db.execute(
+        select(
+            models.BuildRepoPoolEntry.platform_id,
+            models.BuildRepoPoolEntry.arch,
+            models.BuildRepoPoolEntry.debug,
+            func.count(),
+        ).group_by(
+            models.BuildRepoPoolEntry.platform_id,
+            models.BuildRepoPoolEntry.arch,
+            models.BuildRepoPoolEntry.debug,
+        )
+    )
+    return {
+        BuildRepoPoolKey(platform_id, arch, debug): count
+        for platform_id, arch, debug, count in counts
+    }
+
+
+async def refill_build_repos_pool(pulp_client: PulpClient):
+    """Top up the pool of every configured platform to the configured size.
+
+    Pulp repositories are created outside of DB transactions and are
+    registered afterwards in a short transaction holding the pool lock.
+    Repositories which aren't needed anymore because of a concurrent
+    refill, or which couldn't be registered, are removed from Pulp.
+    """
+    if (
+        settings.build_repos_pool_size <= 0
+        or not settings.build_repos_pool_platforms
+    ):
+        return
+    async with open_async_session(key=get_async_db_key()) as db:
+        platforms = (
+            (
+                await db.execute(
+                    select(models.Platform).where(
+                        models.Platform.name.in_(
+                            settings.build_repos_pool_platforms
+                        )
+                    )
+                )
+            )
+            .scalars()
+            .all()
+        )
+        platform_names = {platform.id: platform.name for platform in platforms}
+        pool_keys = [
+            key for platform in platforms for key in _get_pool_keys(platform)
+        ]
+        available = await _get_available_counts(db)
+    to_create = []
+    for key in pool_keys:
+        missing = settings.build_repos_pool_size - available.get(key, 0)
+        to_create.extend([key] * max(missing, 0))
+
+    logging.info('Creating %d pooled build repositories', len(to_create))
+    results = await asyncio.gather(
+        *(
+            _create_pool_repo(pulp_client, platform_names[key.platform_id], key)
+            for key in to_create
+        ),
+        return_exceptions=True,
+    )
+    created = []
+    for key, result in zip(to_create, results):
+        if isinstance(result, Exception):
+            logging.error(
+                'Cannot create pooled repository for %s: %s', key, result
+            )
+            continue
+        created.append((key, result))
+
+    registered = []
+    unused = []
+    try:
+        async with open_async_session(key=get_async_db_key()) as db:
+            await db.execute(
+                select(func.pg_advisory_xact_lock(BUILD_REPOS_POOL_LOCK_ID))
+            )
+            # Pool could be refilled concurrently, counts are taken again
+            available = await _get_available_counts(db)
+            for key, entry in created:
+                if available.get(key, 0) >= settings.build_repos_pool_size:
+                    unused.append(entry)
+                    continue
+                db.add(entry)
+                registered.append(key)
+                available[key] = available.get(key, 0) + 1
+    except Exception:
+        logging.exception('Cannot register pooled build repositories')
+        await _remove_pool_repos([entry for _, entry in created])
+        raise
+    if unused:
+        await _remove_pool_repos(unused)
+    for key in registered:
+        BUILD_REPOS_POOL_CREATED.labels(platform_names[key.platform_id]).inc()
+    for key in pool_keys:
+        BUILD_REPOS_POOL_AVAILABLE.labels(
+            platform_names[key.platform_id], key.arch, str(key.debug).lower()
+        ).set(available.get(key, 0))
@@ -2,11 +2,12 @@ import asyncio
 import collections
 import copy
 import datetime
-import json
+import functools
 import logging
 import re
 import typing
 import uuid
+from dataclasses import dataclass, field
 from typing import (
     Any,
     Awaitable,
@@ -18,7 +19,6 @@ from typing import (
     Union,
 )
 
-import aioredis
 import createrepo_c as cr
 import jinja2
 from fastapi_sqla import open_async_session, open_session
@@ -61,7 +61,16 @@ from alws.utils.github_integration_helper import (
     get_github_client,
 )
 from alws.utils.oval_add_al8_gpg_keys import add_multiple_gpg_keys_to_oval
+from alws.utils.oval_records import (
+    OVAL_RECORD_COLUMNS,
+    OVAL_RECORDS_CHUNK_SIZE,
+    OvalRecord,
+)
+from alws.utils.oval_registry import OvalRegistry
 from alws.utils.parsing import clean_release, parse_evr, parse_rpm_nevra
+from alws.utils.publication_scheduler import (
+    schedule_repositories_publication,
+)
 from alws.utils.pulp_client import PulpClient
 from alws.utils.pulp_utils import (
     get_rpm_module_packages_from_repository,
@@ -69,6 +78,12 @@ from alws.utils.pulp_utils import (
     get_rpm_packages_from_repository,
     get_uuid_from_pulp_href,
 )
+from alws.utils.updateinfo_cache import (
+    get_cached_updateinfo,
+    get_updateinfo_etag,
+    invalidate_updateinfo,
+    store_updateinfo,
+)
 
 try:
     # FIXME: ovallib dependency should stay optional
@@ -137,10 +152,9 @@ async def get_oval_xml(
     db: AsyncSession, platform_name: str, only_released: bool = False
 ):
     query = select(models.NewErrataRecord).options(
-        selectinload(models.NewErrataRecord.packages)
-        .selectinload(models.NewErrataPackage.albs_packages)
-        .selectinload(models.NewErrataToALBSPackage.build_artifact)
-        .selectinload(models.BuildTaskArtifact.build_task),
+        selectinload(models.NewErrataRecord.packages).selectinload(
+            models.NewErrataPackage.albs_packages
+        ),
         selectinload(models.NewErrataRecord.references).selectinload(
             models.NewErrataReference.cve
         ),
@@ -173,18 +187,20 @@ async def get_new_oval_xml(
         select(models.Platform.id).where(models.Platform.name == platform_name)
     ).scalar_subquery()
 
+    # Packages aren't needed here, OVAL data is already stored in records
     query = (
         select(models.NewErrataRecord)
         .where(models.NewErrataRecord.platform_id == platform_subq)
         .options(
-            selectinload(models.NewErrataRecord.packages)
-            .selectinload(models.NewErrataPackage.albs_packages)
-            .selectinload(models.NewErrataToALBSPackage.build_artifact)
-            .selectinload(models.BuildTaskArtifact.build_task),
+            load_only(*(
+                getattr(models.NewErrataRecord, column)
+                for column in OVAL_RECORD_COLUMNS
+            )),
             selectinload(models.NewErrataRecord.references).selectinload(
                 models.NewErrataReference.cve
             ),
         )
+        .execution_options(yield_per=OVAL_RECORDS_CHUNK_SIZE)
     )
 
     if only_released:
@@ -193,7 +209,13 @@ async def get_new_oval_xml(
             == ErrataReleaseStatus.RELEASED
         )
 
-    records = (await db.execute(query)).scalars().all()
+    # Records are converted chunk by chunk, ORM objects aren't referenced
+    # afterwards, so the whole platform is never kept as ORM objects
+    records = []
+    cves = {}
+    result = await db.stream(query)
+    async for chunk in result.scalars().partitions():
+        records.extend(OvalRecord.from_model(record, cves) for record in chunk)
     return new_errata_records_to_oval(records)
 
 
@@ -236,6 +258,9 @@ def _should_skip_cross_ref(pkg):
     return False
 
 
+# Criteria of sibling records are parsed again for every record sharing
+# a CVE with them
+@functools.lru_cache(maxsize=2**16)
 def _evr_from_comment(comment):
     match = _EVR_COMMENT_RE.match(comment or "")
     if not match:
@@ -735,7 +760,7 @@ async def load_platform_packages(
 
         repo_id = get_uuid_from_pulp_href(repo.pulp_href)
         if module:
-            pkgs = get_rpm_module_packages_from_repository(
+            pkgs = await get_rpm_module_packages_from_repository(
                 repo_id=repo_id,
                 module=module,
                 pkg_names=search_params["name"],
@@ -807,6 +832,7 @@ async def update_errata_record(
             record.description = update_record.description
     await db.flush()
     await db.refresh(record)
+    await invalidate_updateinfo([record.id])
     return record
 
 
@@ -1501,6 +1527,178 @@ async def update_package_status(
     return True
 
 
+UPDATEINFO_PACKAGE_FIELDS = (
+    "name",
+    "version",
+    "release",
+    "epoch",
+    "arch",
+    "location_href",
+    "rpm_sourcerpm",
+)
+
+
+@dataclass
+class UpdateinfoIndex:
+    """
+    Build artifacts, errata links and Pulp metadata of released packages
+    keyed by package Pulp href, loaded once for all target repositories.
+    """
+
+    pulp_packages: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    artifacts: DefaultDict[str, List[models.BuildTaskArtifact]] = field(
+        default_factory=lambda: collections.defaultdict(list)
+    )
+    artifacts_by_id: Dict[int, models.BuildTaskArtifact] = field(
+        default_factory=dict
+    )
+    errata_packages: List[models.NewErrataToALBSPackage] = field(
+        default_factory=list
+    )
+    errata_by_artifact: DefaultDict[
+        Optional[int], List[models.NewErrataToALBSPackage]
+    ] = field(default_factory=lambda: collections.defaultdict(list))
+    errata_by_href: DefaultDict[
+        Optional[str], List[models.NewErrataToALBSPackage]
+    ] = field(default_factory=lambda: collections.defaultdict(list))
+
+    def add_errata_packages(
+        self,
+        errata_packages: typing.Iterable[models.NewErrataToALBSPackage],
+    ):
+        for errata_pkg in errata_packages:
+            self.errata_packages.append(errata_pkg)
+            self.errata_by_artifact[errata_pkg.albs_artifact_id].append(
+                errata_pkg
+            )
+            self.errata_by_href[errata_pkg.pulp_href].append(errata_pkg)
+
+    def get_artifact(
+        self,
+        errata_pkg: models.NewErrataToALBSPackage,
+    ) -> Optional[models.BuildTaskArtifact]:
+        if errata_pkg.albs_artifact_id is not None:
+            return self.artifacts_by_id.get(errata_pkg.albs_artifact_id)
+        artifacts = self.artifacts.get(errata_pkg.pulp_href)
+        return artifacts[0] if artifacts else None
+
+    def get_updateinfo_mapping(
+        self,
+        package_hrefs: List[str],
+        blacklist_updateinfo: typing.Collection[str] = (),
+    ) -> DefaultDict[
+        str,
+        List[
+            Tuple[models.BuildTaskArtifact, dict, models.NewErrataToALBSPackage]
+        ],
+    ]:
+        updateinfo_mapping = collections.defaultdict(list)
+        for pkg_href in set(package_hrefs):
+            pulp_pkg = self.pulp_packages.get(pkg_href)
+            if pulp_pkg is None:
+                logging.warning("Package %s is not found in Pulp", pkg_href)
+                continue
+            for db_pkg in self.artifacts.get(pkg_href, []):
+                linked_pkgs = self.errata_by_artifact.get(
+                    db_pkg.id, []
+                ) + self.errata_by_href.get(pkg_href, [])
+                errata_pkgs = {
+                    errata_pkg.id: errata_pkg for errata_pkg in linked_pkgs
+                }
+                for errata_pkg in errata_pkgs.values():
+                    errata_id = errata_pkg.errata_package.errata_record_id
+                    if errata_id in blacklist_updateinfo:
+                        continue
+                    updateinfo_mapping[errata_id].append(
+                        (db_pkg, pulp_pkg, errata_pkg),
+                    )
+        return updateinfo_mapping
+
+
+async def prepare_updateinfo_index(
+    db: AsyncSession,
+    package_hrefs: List[str],
+) -> UpdateinfoIndex:
+    index = UpdateinfoIndex()
+    package_hrefs = list(set(package_hrefs))
+    if not package_hrefs:
+        return index
+    artifacts_options = selectinload(
+        models.BuildTaskArtifact.build_task
+    ).selectinload(models.BuildTask.rpm_modules)
+    artifacts = (
+        (
+            await db.execute(
+                select(models.BuildTaskArtifact)
+                .where(models.BuildTaskArtifact.href.in_(package_hrefs))
+                .options(artifacts_options)
+            )
+        )
+        .scalars()
+        .all()
+    )
+    for artifact in artifacts:
+        index.artifacts[artifact.href].append(artifact)
+        index.artifacts_by_id[artifact.id] = artifact
+    errata_packages = (
+        (
+            await db.execute(
+                select(models.NewErrataToALBSPackage)
+                .where(
+                    or_(
+                        models.NewErrataToALBSPackage.albs_artifact_id.in_(
+                            list(index.artifacts_by_id)
+                        ),
+                        models.NewErrataToALBSPackage.pulp_href.in_(
+                            package_hrefs
+                        ),
+                    )
+                )
+                .options(
+                    selectinload(models.NewErrataToALBSPackage.errata_package),
+                    selectinload(models.NewErrataToALBSPackage.build_artifact),
+                )
+            )
+        )
+        .scalars()
+        .all()
+    )
+    index.add_errata_packages(errata_packages)
+    missing_artifact_ids = {
+        errata_pkg.albs_artifact_id
+        for errata_pkg in index.errata_packages
+        if errata_pkg.albs_artifact_id is not None
+        and errata_pkg.albs_artifact_id not in index.artifacts_by_id
+    }
+    if missing_artifact_ids:
+        artifacts = (
+            (
+                await db.execute(
+                    select(models.BuildTaskArtifact)
+                    .where(
+                        models.BuildTaskArtifact.id.in_(missing_artifact_ids)
+                    )
+                    .options(artifacts_options)
+                )
+            )
+            .scalars()
+            .all()
+        )
+        for artifact in artifacts:
+            index.artifacts_by_id[artifact.id] = artifact
+    pulp_pkgs = get_rpm_packages_by_ids(
+        [get_uuid_from_pulp_href(pkg_href) for pkg_href in package_hrefs],
+        [getattr(RpmPackage, attr) for attr in UPDATEINFO_PACKAGE_FIELDS],
+    )
+    for pkg_href, pulp_pkg in pulp_pkgs.items():
+        pkg_info = {
+            attr: getattr(pulp_pkg, attr) for attr in UPDATEINFO_PACKAGE_FIELDS
+        }
+        pkg_info["sha256"] = pulp_pkg.sha256
+        index.pulp_packages[pkg_href] = pkg_info
+    return index
+
+
 async def release_errata_packages(
     session: AsyncSession,
     pulp_client: PulpClient,
@@ -1509,7 +1707,12 @@ async def release_errata_packages(
     platform: models.Platform,
     repo_href: str,
     publish: bool = True,
+    updateinfo_index: Optional[UpdateinfoIndex] = None,
 ):
+    if updateinfo_index is None:
+        updateinfo_index = await prepare_updateinfo_index(
+            session, [errata_pkg.get_pulp_href() for errata_pkg in packages]
+        )
     repo = await pulp_client.get_by_href(repo_href)
     released_record = await pulp_client.list_updateinfo_records(
         id__in=[record.id],
@@ -1527,7 +1730,7 @@ async def release_errata_packages(
     dict_packages = []
     released_pkgs = set()
     for errata_pkg in packages:
-        pulp_pkg = await pulp_client.get_by_href(errata_pkg.get_pulp_href())
+        pulp_pkg = updateinfo_index.pulp_packages[errata_pkg.get_pulp_href()]
         pkg_name_arch = "_".join([pulp_pkg["name"], pulp_pkg["arch"]])
         if errata_pkg.errata_package.reboot_suggested:
             reboot_suggested = True
@@ -1548,19 +1751,7 @@ async def release_errata_packages(
         })
         if rpm_module or ".module_el" not in pulp_pkg["release"]:
             continue
-        query = models.BuildTaskArtifact.href == errata_pkg.pulp_href
-        if errata_pkg.albs_artifact_id is not None:
-            query = models.BuildTaskArtifact.id == errata_pkg.albs_artifact_id
-        db_pkg = await session.execute(
-            select(models.BuildTaskArtifact)
-            .where(query)
-            .options(
-                selectinload(models.BuildTaskArtifact.build_task).selectinload(
-                    models.BuildTask.rpm_modules
-                )
-            )
-        )
-        db_pkg = db_pkg.scalars().first()
+        db_pkg = updateinfo_index.get_artifact(errata_pkg)
         if not db_pkg:
             continue
         db_module = next(
@@ -1634,72 +1825,6 @@ async def release_errata_packages(
         await pulp_client.create_rpm_publication(repo_href)
 
 
-async def prepare_updateinfo_mapping(
-    db: AsyncSession,
-    pulp: PulpClient,
-    package_hrefs: List[str],
-    blacklist_updateinfo: List[str],
-) -> DefaultDict[
-    str,
-    List[Tuple[models.BuildTaskArtifact, dict, models.NewErrataToALBSPackage]],
-]:
-    updateinfo_mapping = collections.defaultdict(list)
-    for pkg_href in set(package_hrefs):
-        db_pkg_list = (
-            (
-                await db.execute(
-                    select(models.BuildTaskArtifact)
-                    .where(
-                        models.BuildTaskArtifact.href == pkg_href,
-                    )
-                    .options(
-                        selectinload(
-                            models.BuildTaskArtifact.build_task
-                        ).selectinload(models.BuildTask.rpm_modules)
-                    )
-                )
-            )
-            .scalars()
-            .all()
-        )
-        for db_pkg in db_pkg_list:
-            errata_pkgs = await db.execute(
-                select(models.NewErrataToALBSPackage)
-                .where(
-                    or_(
-                        models.NewErrataToALBSPackage.albs_artifact_id
-                        == db_pkg.id,
-                        models.NewErrataToALBSPackage.pulp_href == pkg_href,
-                    )
-                )
-                .options(
-                    selectinload(models.NewErrataToALBSPackage.errata_package),
-                    selectinload(models.NewErrataToALBSPackage.build_artifact),
-                )
-            )
-            pulp_pkg = await pulp.get_rpm_package(
-                db_pkg.href,
-                include_fields=[
-                    "name",
-                    "version",
-                    "release",
-                    "epoch",
-                    "arch",
-                    "location_href",
-                    "sha256",
-                    "rpm_sourcerpm",
-                ],
-            )
-            for errata_pkg in errata_pkgs.scalars().all():
-                errata_id = errata_pkg.errata_package.errata_record_id
-                if errata_id in blacklist_updateinfo:
-                    continue
-                updateinfo_mapping[errata_id].append(
-                    (db_pkg, pulp_pkg, errata_pkg),
-                )
-    return updateinfo_mapping
-
-
 def append_update_packages_in_update_records(
     pulp_db: Session,
     errata_records: List[Dict[str, Any]],
@@ -1825,18 +1950,21 @@ async def process_errata_release_for_repos(
     publish: bool = True,
 ) -> Optional[List[Awaitable]]:
     release_tasks = []
-    publish_tasks = []
-    for repo_href, packages in repo_mapping.items():
-        pkg_hrefs = []
+    for packages in repo_mapping.values():
         for pkg in packages:
             pkg.status = ErrataPackageStatus.released
-            pkg_hrefs.append(pkg.get_pulp_href())
-        logging.info("Preparing udpateinfo mapping")
-        updateinfo_mapping = await prepare_updateinfo_mapping(
-            db=session,
-            pulp=pulp,
-            package_hrefs=pkg_hrefs,
-            blacklist_updateinfo=[],
+    logging.info("Preparing updateinfo index")
+    updateinfo_index = await prepare_updateinfo_index(
+        session,
+        [
+            pkg.get_pulp_href()
+            for packages in repo_mapping.values()
+            for pkg in packages
+        ],
+    )
+    for repo_href, packages in repo_mapping.items():
+        updateinfo_mapping = updateinfo_index.get_updateinfo_mapping(
+            [pkg.get_pulp_href() for pkg in packages]
         )
         latest_repo_version = await pulp.get_repo_latest_version(repo_href)
         if latest_repo_version:
@@ -1864,18 +1992,15 @@ async def process_errata_release_for_repos(
                 db_record.platform,
                 repo_href,
                 publish=False,
+                updateinfo_index=updateinfo_index,
             )
         )
-        if publish:
-            publish_tasks.append(
-                pulp.create_rpm_publication(repo_href, sleep_time=30.0)
-            )
     if not publish:
         return release_tasks
     logging.info("Releasing errata packages in async tasks")
     await asyncio.gather(*release_tasks)
-    logging.info("Publicating repositories in async tasks")
-    await asyncio.gather(*publish_tasks)
+    logging.info("Scheduling repositories publication")
+    await schedule_repositories_publication(pulp, repo_mapping.keys())
 
 
 def generate_query_for_release(records_ids: List[str]):
@@ -2013,29 +2138,43 @@ async def get_packages_for_oval(
 # At this moment we need this cache, but if we finally migrate old records to
 # new approach, we can get rid of this redis cache and directly retrieve this
 # info from db without passing through get_oval_xml method
-async def get_albs_oval_cache(
+async def get_albs_oval_registry(
     session: AsyncSession, platform_name: str
-) -> dict:
-    redis = aioredis.from_url(settings.redis_url)
-    cache_name = f"albs-oval-cache_{platform_name}"
-    cached_oval = await redis.get(cache_name)
-    if not cached_oval:
-        logging.info("Retrieving OVAL cache for %s", platform_name)
-        # TODO: uncomment only after production oval data is stored in db
-        # as described in https://github.com/AlmaLinux/build-system/issues/350
-        # Right now we're using a file for testing
-        xml_string = await get_new_oval_xml(session, platform_name, True)
-        oval = Composer.load_from_string(xml_string)
-        cached_oval = oval.as_dict()
-        del cached_oval["definitions"]
-        cached_oval = json.dumps(cached_oval)
-        await redis.set(cache_name, cached_oval, ex=3600)
-    return json.loads(cached_oval)
+) -> OvalRegistry:
+    oval_registry = OvalRegistry(platform_name)
+    if await oval_registry.load():
+        return oval_registry
+    logging.info("Building OVAL registry for %s", platform_name)
+    # Drop items left from the expired registry
+    await oval_registry.invalidate()
+    # Same items as in the released OVAL XML, but taken from OVAL data
+    # stored in records instead of generating and parsing the XML
+    query = (
+        select(
+            models.NewErrataRecord.criteria,
+            models.NewErrataRecord.objects,
+            models.NewErrataRecord.states,
+            models.NewErrataRecord.tests,
+        )
+        .join(models.NewErrataRecord.platform)
+        .where(
+            models.Platform.name == platform_name,
+            models.NewErrataRecord.release_status
+            == ErrataReleaseStatus.RELEASED,
+        )
+    )
+    for criteria, objects, states, tests in await session.execute(query):
+        if not criteria:
+            continue
+        oval_registry.add(objects, states, tests)
+    await oval_registry.save()
+    await oval_registry.mark_ready()
+    return oval_registry
 
 
 async def add_oval_data_to_errata_record(
     db_record: models.NewErrataRecord,
-    albs_oval_cache: dict,
+    oval_registry: OvalRegistry,
 ):
     oval_packages = await get_packages_for_oval(db_record.packages)
 
@@ -2048,9 +2187,9 @@ async def add_oval_data_to_errata_record(
             devel_module = Module(f"{module.name}-devel:{module.stream}")
 
     oval_ref_ids = {
-        "object": [ref["id"] for ref in albs_oval_cache["objects"]],
-        "state": [ref["id"] for ref in albs_oval_cache["states"]],
-        "test": [ref["id"] for ref in albs_oval_cache["tests"]],
+        "object": oval_registry.get_ids("objects"),
+        "state": oval_registry.get_ids("states"),
+        "test": oval_registry.get_ids("tests"),
     }
 
     data_generator = OvalDataGenerator(
@@ -2072,13 +2211,13 @@ async def add_oval_data_to_errata_record(
 
     # Right now, variables are not being generated, so it's a no-op
     # errata.variables = data_generator.generate_variables()
-    objects = data_generator.generate_objects(albs_oval_cache["objects"])
+    objects = data_generator.generate_objects(oval_registry.objects)
     db_record.objects = objects
 
-    states = data_generator.generate_states(albs_oval_cache["states"])
+    states = data_generator.generate_states(oval_registry.states)
     db_record.states = states
 
-    tests = data_generator.generate_tests(albs_oval_cache["tests"])
+    tests = data_generator.generate_tests(oval_registry.tests)
     db_record.tests = tests
 
     db_record.criteria = data_generator.generate_criteria()
@@ -2136,10 +2275,13 @@ async def release_new_errata_record(
         )
 
         logging.info("Generating OVAL data")
-        albs_oval_cache = await get_albs_oval_cache(
+        oval_registry = await get_albs_oval_registry(
             session, db_record.platform.name
         )
-        await add_oval_data_to_errata_record(db_record, albs_oval_cache)
+        objects, states, tests = await add_oval_data_to_errata_record(
+            db_record, oval_registry
+        )
+        oval_registry.add(objects, states, tests)
 
         db_record.release_status = ErrataReleaseStatus.RELEASED
         db_record.last_release_log = await get_release_logs(
@@ -2152,6 +2294,11 @@ async def release_new_errata_record(
             missing_pkg_names=missing_pkg_names,
         )
         await session.flush()
+        released_record = (
+            db_record.id,
+            db_record.platform_id,
+            db_record.updated_date,
+        )
         if settings.github_integration_enabled:
             try:
                 await close_issues(record_ids=[db_record.id])
@@ -2160,6 +2307,9 @@ async def release_new_errata_record(
                     "Cannot move issue to the Released section: %s",
                     err,
                 )
+    # The record is committed, so its OVAL items can be registered
+    await oval_registry.save()
+    await cache_updateinfo_xml([released_record])
     logging.info("Record %s successfully released", record_id)
 
 
@@ -2220,6 +2370,11 @@ async def release_errata_record(record_id: str, platform_id: int, force: bool):
             missing_pkg_names=missing_pkg_names,
         )
         await session.flush()
+        released_record = (
+            db_record.id,
+            db_record.platform_id,
+            db_record.updated_date,
+        )
         if settings.github_integration_enabled:
             try:
                 await close_issues(record_ids=[db_record.id])
@@ -2228,6 +2383,7 @@ async def release_errata_record(record_id: str, platform_id: int, force: bool):
                     "Cannot move issue to the Released section: %s",
                     err,
                 )
+    await cache_updateinfo_xml([released_record])
     logging.info("Record %s successfully released", record_id)
 
 
@@ -2240,6 +2396,7 @@ async def bulk_new_errata_records_release(
         settings.pulp_password,
     )
     released_record_ids = []
+    released_records = []
     release_tasks = []
     repos_to_publish = []
     async with open_async_session(key=get_async_db_key()) as session:
@@ -2262,9 +2419,9 @@ async def bulk_new_errata_records_release(
         )
 
         platforms = {rec.platform.name for rec in db_records}
-        albs_oval_cache = collections.defaultdict()
+        oval_registries = {}
         for platform in platforms:
-            albs_oval_cache[platform] = await get_albs_oval_cache(
+            oval_registries[platform] = await get_albs_oval_registry(
                 session, platform
             )
         for db_record in db_records:
@@ -2296,33 +2453,13 @@ async def bulk_new_errata_records_release(
             )
 
             logging.info("Generating OVAL data")
+            oval_registry = oval_registries[db_record.platform.name]
             objects, states, tests = await add_oval_data_to_errata_record(
-                db_record, albs_oval_cache[db_record.platform.name]
+                db_record, oval_registry
             )
-
             # This way we take into account already generated references
             # during bulk errata release
-            for obj in objects:
-                if (
-                    obj
-                    not in albs_oval_cache[db_record.platform.name]["objects"]
-                ):
-                    albs_oval_cache[db_record.platform.name]["objects"].append(
-                        obj
-                    )
-            for ste in states:
-                if (
-                    ste
-                    not in albs_oval_cache[db_record.platform.name]["states"]
-                ):
-                    albs_oval_cache[db_record.platform.name]["states"].append(
-                        ste
-                    )
-            for tst in tests:
-                if tst not in albs_oval_cache[db_record.platform.name]["tests"]:
-                    albs_oval_cache[db_record.platform.name]["tests"].append(
-                        tst
-                    )
+            oval_registry.add(objects, states, tests)
 
             db_record.release_status = ErrataReleaseStatus.RELEASED
             db_record.last_release_log = await get_release_logs(
@@ -2336,18 +2473,23 @@ async def bulk_new_errata_records_release(
             )
 
             released_record_ids.append(db_record.id)
+            released_records.append(
+                (db_record.id, db_record.platform_id, db_record.updated_date)
+            )
 
             if not tasks:
                 continue
             repos_to_publish.extend(repo_mapping.keys())
             release_tasks.extend(tasks)
 
+    # Records are committed, so their OVAL items can be registered
+    for oval_registry in oval_registries.values():
+        await oval_registry.save()
     logging.info("Executing release tasks")
     await asyncio.gather(*release_tasks)
-    logging.info("Executing publication tasks")
-    await asyncio.gather(
-        *(pulp.create_rpm_publication(href) for href in set(repos_to_publish))
-    )
+    logging.info("Scheduling repositories publication")
+    await schedule_repositories_publication(pulp, repos_to_publish)
+    await cache_updateinfo_xml(released_records)
 
     if settings.github_integration_enabled:
         try:
@@ -2370,6 +2512,7 @@ async def bulk_errata_records_release(
         settings.pulp_user,
         settings.pulp_password,
     )
+    released_records = []
     release_tasks = []
     repos_to_publish = []
     async with open_async_session(key=get_async_db_key()) as session:
@@ -2428,6 +2571,9 @@ async def bulk_errata_records_release(
                 missing_pkg_names=missing_pkg_names,
                 force_flag=False,
             )
+            released_records.append(
+                (db_record.id, db_record.platform_id, db_record.updated_date)
+            )
             if settings.github_integration_enabled:
                 try:
                     await close_issues(record_ids=[db_record.id])
@@ -2442,10 +2588,9 @@ async def bulk_errata_records_release(
             release_tasks.extend(tasks)
     logging.info("Executing release tasks")
     await asyncio.gather(*release_tasks)
-    logging.info("Executing publication tasks")
-    await asyncio.gather(
-        *(pulp.create_rpm_publication(href) for href in set(repos_to_publish))
-    )
+    logging.info("Scheduling repositories publication")
+    await schedule_repositories_publication(pulp, repos_to_publish)
+    await cache_updateinfo_xml(released_records)
     logging.info("Bulk errata release is finished")
 
 
@@ -2573,6 +2718,102 @@ async def get_updateinfo_xml_from_pulp(
     return cr_upd.xml_dump() if cr_upd.updates else None
 
 
+async def get_released_record_updated_date(
+    db: AsyncSession,
+    record_id: str,
+    platform_id: Optional[int],
+) -> Optional[datetime.datetime]:
+    """
+    Returns the latest updated_date of the record if it's released
+    for all requested platforms.
+    """
+    query = select(
+        models.NewErrataRecord.updated_date,
+        models.NewErrataRecord.release_status,
+    ).where(models.NewErrataRecord.id == record_id)
+    if platform_id:
+        query = query.where(models.NewErrataRecord.platform_id == platform_id)
+    rows = (await db.execute(query)).all()
+    if not rows or any(
+        release_status != ErrataReleaseStatus.RELEASED
+        for _, release_status in rows
+    ):
+        return
+    return max(updated_date for updated_date, _ in rows)
+
+
+async def get_updateinfo_xml(
+    db: AsyncSession,
+    record_id: str,
+    platform_id: Optional[int],
+) -> Optional[Tuple[str, str]]:
+    """
+    Returns updateinfo XML of the record with its ETag, XML of released
+    records is served from the cache.
+    """
+    updated_date = await get_released_record_updated_date(
+        db, record_id, platform_id
+    )
+    if updated_date is not None:
+        cached = await get_cached_updateinfo(
+            record_id, platform_id, updated_date
+        )
+        if cached:
+            return cached
+    updateinfo_xml = await get_updateinfo_xml_from_pulp(
+        db, record_id, platform_id
+    )
+    if updateinfo_xml is None:
+        return
+    if updated_date is None:
+        return updateinfo_xml, get_updateinfo_etag(updateinfo_xml)
+    etag = await store_updateinfo(
+        record_id, platform_id, updated_date, updateinfo_xml
+    )
+    return updateinfo_xml, etag
+
+
+async def cache_updateinfo_xml(
+    records: List[Tuple[str, int, datetime.datetime]],
+):
+    """
+    Precomputes updateinfo XML of released records given as
+    (record id, platform id, updated date). XML of records requested
+    without a platform is precomputed too, once they're released
+    for all their platforms.
+    """
+    if not records or settings.updateinfo_xml_cache_ttl <= 0:
+        return
+    record_ids = list(dict.fromkeys(record_id for record_id, _, _ in records))
+    try:
+        await invalidate_updateinfo(record_ids)
+    except Exception:
+        logging.exception("Cannot invalidate cached updateinfo XML")
+        return
+    async with open_async_session(key=get_async_db_key()) as session:
+        for record_id, platform_id, updated_date in records:
+            try:
+                updateinfo_xml = await get_updateinfo_xml_from_pulp(
+                    session, record_id, platform_id
+                )
+                if updateinfo_xml is None:
+                    continue
+                await store_updateinfo(
+                    record_id, platform_id, updated_date, updateinfo_xml
+                )
+            except Exception:
+                logging.exception(
+                    "Cannot cache updateinfo XML of %s", record_id
+                )
+        for record_id in record_ids:
+            try:
+                await get_updateinfo_xml(session, record_id, None)
+            except Exception:
+                logging.exception(
+                    "Cannot cache updateinfo XML of %s", record_id
+                )
+
+
 async def prepare_resetting(
     items_to_insert: List, record: models.NewErrataRecord, session: AsyncSession
 ):
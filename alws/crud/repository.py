@@ -1,14 +1,26 @@
+import asyncio
+import json
+import logging
 import typing
 
 import sqlalchemy
+from aiohttp.client_exceptions import ClientResponseError
+from fastapi import status
+from fastapi_sqla import open_async_session
 from sqlalchemy import delete
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session, selectinload
 
 from alws import models
 from alws.config import settings
+from alws.errors import DataNotFoundError
 from alws.schemas import remote_schema, repository_schema
 from alws.utils.pulp_client import PulpClient
+from alws.utils.pulp_utils import (
+    RepoVersionRef,
+    aiter_repo_content_diff,
+    get_uuid_from_pulp_href,
+)
 
 
 async def get_repositories(
@@ -297,9 +309,79 @@ async def sync_repo_from_remote(
     )
 
 
-async def remove_repos_from_pulp(repos: typing.List):
+async def remove_repos_from_pulp(repos: typing.List[str]) -> typing.List[str]:
+    """Delete repositories from Pulp, return the ones that couldn't be.
+
+    At most PULP_CLEANUP_CONCURRENCY repositories are removed at once,
+    failed removals are retried and already missing ones are skipped.
+    """
     pulp_client = PulpClient(
         settings.pulp_host, settings.pulp_user, settings.pulp_password
     )
-    for repo in repos:
-        await pulp_client.delete_by_href(repo, wait_for_result=True)
+    semaphore = asyncio.Semaphore(settings.pulp_cleanup_concurrency)
+
+    async def remove_repo(repo: str) -> typing.Optional[str]:
+        async with semaphore:
+            for attempt in range(1, settings.pulp_cleanup_retries + 1):
+                try:
+                    await pulp_client.delete_by_href(repo, wait_for_result=True)
+                    return
+                except ClientResponseError as exc:
+                    if exc.status == status.HTTP_404_NOT_FOUND:
+                        return
+                    error = exc
+                except Exception as exc:
+                    error = exc
+                logging.warning(
+                    "Attempt %d to delete %s from pulp failed: %s",
+                    attempt,
+                    repo,
+                    error,
+                )
+                if attempt < settings.pulp_cleanup_retries:
+                    await asyncio.sleep(2**attempt)
+            return repo
+
+    results = await asyncio.gather(*(remove_repo(repo) for repo in repos))
+    return [repo for repo in results if repo]
+
+
+async def get_repo_version_refs(
+    db: Session,
+    repository_ids: typing.List[int],
+    version: typing.Optional[int] = None,
+) -> typing.List[RepoVersionRef]:
+    repositories = (
+        (
+            await db.execute(
+                select(models.Repository).where(
+                    models.Repository.id.in_(repository_ids)
+                )
+            )
+        )
+        .scalars()
+        .all()
+    )
+    missing_ids = set(repository_ids) - {repo.id for repo in repositories}
+    if missing_ids:
+        raise DataNotFoundError(
+            f'Repositories with ids {sorted(missing_ids)} are not found'
+        )
+    return [
+        RepoVersionRef(get_uuid_from_pulp_href(repo.pulp_href), version)
+        for repo in repositories
+    ]
+
+
+async def iter_repos_content_diff(
+    left: typing.List[RepoVersionRef],
+    right: typing.List[RepoVersionRef],
+    statuses: typing.List[str],
+    arches: typing.Optional[typing.List[str]] = None,
+) -> typing.AsyncIterator[str]:
+    """Stream the packages diff of two repositories sets as JSON lines."""
+    async with open_async_session(key='pulp_async') as pulp_db:
+        async for diff in aiter_repo_content_diff(
+            pulp_db, left, right, statuses=statuses, arches=arches
+        ):
+            yield json.dumps({'nevra': diff.nevra, **diff._asdict()}) + '\n'
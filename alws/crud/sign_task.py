@@ -1,6 +1,7 @@
 import asyncio
 import datetime
 import logging
+import time
 import typing
 import urllib.parse
 from collections import defaultdict
@@ -30,6 +31,11 @@ from alws.pulp_models import RpmPackage
 from alws.schemas import sign_schema
 from alws.utils.copr import create_product_sign_key_repo
 from alws.utils.debuginfo import is_debuginfo_rpm
+from alws.utils.metrics import (
+    SIGN_PACKAGE_CONVERSION_DURATION,
+    SIGN_PACKAGES_PROCESSED,
+    SIGN_PACKAGES_THROUGHPUT,
+)
 from alws.utils.pulp_client import PulpClient
 from alws.utils.pulp_utils import get_rpm_packages_by_checksums
 
@@ -72,6 +78,89 @@ def __get_package_url(base_url: str, package_name: str) -> str:
     )
 
 
+async def __build_sign_task_manifest(
+    db: AsyncSession,
+    build_id: int,
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    build_src_rpms = await db.execute(
+        select(models.SourceRpm)
+        .where(models.SourceRpm.build_id == build_id)
+        .options(
+            selectinload(models.SourceRpm.artifact).selectinload(
+                models.BuildTaskArtifact.build_task,
+            )
+        )
+    )
+    build_src_rpms = build_src_rpms.scalars().all()
+    if not build_src_rpms:
+        return []
+    build_binary_rpms = await db.execute(
+        select(models.BinaryRpm)
+        .where(models.BinaryRpm.build_id == build_id)
+        .options(
+            selectinload(models.BinaryRpm.artifact).selectinload(
+                models.BuildTaskArtifact.build_task,
+            )
+        )
+    )
+    build_binary_rpms = build_binary_rpms.scalars().all()
+    if not build_binary_rpms:
+        return []
+    packages = []
+
+    repo_mapping = await __get_build_repos(db, build_id)
+    for src_rpm in build_src_rpms:
+        repo_unique_key = RepoUniqueKey(
+            arch='src',
+            debug=False,
+            platform_id=src_rpm.artifact.build_task.platform_id,
+        )
+        repo = repo_mapping[repo_unique_key]
+        packages.append({
+            "id": src_rpm.artifact.id,
+            "name": src_rpm.artifact.name,
+            "cas_hash": src_rpm.artifact.cas_hash,
+            "arch": "src",
+            "type": "rpm",
+            "download_url": __get_package_url(repo.url, src_rpm.artifact.name),
+            "repo_href": repo.pulp_href,
+        })
+
+    for binary_rpm in build_binary_rpms:
+        debug = is_debuginfo_rpm(binary_rpm.artifact.name)
+        repo_unique_key = RepoUniqueKey(
+            arch=binary_rpm.artifact.build_task.arch,
+            debug=debug,
+            platform_id=binary_rpm.artifact.build_task.platform_id,
+        )
+        repo = repo_mapping[repo_unique_key]
+        packages.append({
+            "id": binary_rpm.artifact.id,
+            "name": binary_rpm.artifact.name,
+            "cas_hash": binary_rpm.artifact.cas_hash,
+            "arch": binary_rpm.artifact.build_task.arch,
+            "type": "rpm",
+            "download_url": __get_package_url(
+                repo.url, binary_rpm.artifact.name
+            ),
+            "repo_href": repo.pulp_href,
+        })
+    return packages
+
+
+async def __get_sign_task_manifest(
+    db: AsyncSession,
+    sign_task: models.SignTask,
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    # Tasks created before manifests were introduced get theirs lazily
+    if sign_task.packages_manifest is None:
+        sign_task.packages_manifest = await __build_sign_task_manifest(
+            db, sign_task.build_id
+        )
+        db.add(sign_task)
+    return sign_task.packages_manifest
+
+
 async def get_sign_tasks(
     db: AsyncSession,
     build_id: typing.Optional[int] = None,
@@ -196,6 +285,9 @@ async def create_sign_task(
         status=SignStatus.IDLE,
         build_id=payload.build_id,
         sign_key_id=payload.sign_key_id,
+        packages_manifest=await __build_sign_task_manifest(
+            db, payload.build_id
+        ),
     )
     db.add(sign_task)
     await db.flush()
@@ -259,73 +351,15 @@ async def get_available_sign_task(
         .values(status=SignStatus.IN_PROGRESS)
     )
 
-    build_src_rpms = await db.execute(
-        select(models.SourceRpm)
-        .where(models.SourceRpm.build_id == sign_task.build_id)
-        .options(
-            selectinload(models.SourceRpm.artifact).selectinload(
-                models.BuildTaskArtifact.build_task,
-            )
-        )
-    )
-    build_src_rpms = build_src_rpms.scalars().all()
-    if not build_src_rpms:
-        return {}
-    build_binary_rpms = await db.execute(
-        select(models.BinaryRpm)
-        .where(models.BinaryRpm.build_id == sign_task.build_id)
-        .options(
-            selectinload(models.BinaryRpm.artifact).selectinload(
-                models.BuildTaskArtifact.build_task,
-            )
-        )
-    )
-    build_binary_rpms = build_binary_rpms.scalars().all()
-    if not build_binary_rpms:
-        return {}
     sign_task_payload = {
         "id": sign_task.id,
         "build_id": sign_task.build_id,
         "keyid": sign_task.sign_key.keyid,
         "sign_files": bool(sign_task.sign_key.add_files_signature),
     }
-    packages = []
-
-    repo_mapping = await __get_build_repos(db, sign_task.build_id)
-    for src_rpm in build_src_rpms:
-        repo_unique_key = RepoUniqueKey(
-            arch='src',
-            debug=False,
-            platform_id=src_rpm.artifact.build_task.platform_id,
-        )
-        repo = repo_mapping[repo_unique_key]
-        packages.append({
-            "id": src_rpm.artifact.id,
-            "name": src_rpm.artifact.name,
-            "cas_hash": src_rpm.artifact.cas_hash,
-            "arch": "src",
-            "type": "rpm",
-            "download_url": __get_package_url(repo.url, src_rpm.artifact.name),
-        })
-
-    for binary_rpm in build_binary_rpms:
-        debug = is_debuginfo_rpm(binary_rpm.artifact.name)
-        repo_unique_key = RepoUniqueKey(
-            arch=binary_rpm.artifact.build_task.arch,
-            debug=debug,
-            platform_id=binary_rpm.artifact.build_task.platform_id,
-        )
-        repo = repo_mapping[repo_unique_key]
-        packages.append({
-            "id": binary_rpm.artifact.id,
-            "name": binary_rpm.artifact.name,
-            "cas_hash": binary_rpm.artifact.cas_hash,
-            "arch": binary_rpm.artifact.build_task.arch,
-            "type": "rpm",
-            "download_url": __get_package_url(
-                repo.url, binary_rpm.artifact.name
-            ),
-        })
+    packages = await __get_sign_task_manifest(db, sign_task)
+    if not packages:
+        return {}
     sign_task_payload["packages"] = packages
     await db.flush()
     return sign_task_payload
@@ -435,12 +469,107 @@ async def complete_gen_key_task(
     return sign_key
 
 
-def _get_mapping_rpm_per_platform(
-    rpms: typing.List[typing.Union[models.SourceRpm, models.BinaryRpm]],
-) -> dict[str, int]:
-    return {
-        rpm.artifact.name: rpm.artifact.build_task.platform_id for rpm in rpms
-    }
+class RepoAdditionsBatcher:
+    """Add packages to Pulp repositories in batches, as they are converted.
+
+    A modification is sent as soon as ``batch_size`` packages are collected
+    for a repository, modifications of a single repository never overlap.
+    Versions of repositories before the first modification are remembered,
+    so the additions can be reverted if the sign task fails.
+    """
+
+    def __init__(self, pulp_client: PulpClient, batch_size: int):
+        self._pulp_client = pulp_client
+        self._batch_size = batch_size
+        self._pending = defaultdict(list)
+        self._locks = defaultdict(asyncio.Lock)
+        self._base_versions = {}
+        self._tasks = []
+
+    def add(self, repo_href: str, package_href: str):
+        self._pending[repo_href].append(package_href)
+        if len(self._pending[repo_href]) >= self._batch_size:
+            self._schedule(repo_href)
+
+    def _schedule(self, repo_href: str):
+        packages = self._pending.pop(repo_href)
+        self._tasks.append(
+            asyncio.create_task(self._modify(repo_href, packages))
+        )
+
+    async def _modify(self, repo_href: str, packages: typing.List[str]):
+        async with self._locks[repo_href]:
+            if repo_href not in self._base_versions:
+                self._base_versions[repo_href] = (
+                    await self._pulp_client.get_repo_latest_version(repo_href)
+                )
+            await self._pulp_client.modify_repository(repo_href, add=packages)
+
+    async def flush(self):
+        for repo_href in list(self._pending):
+            self._schedule(repo_href)
+        await asyncio.gather(*self._tasks)
+
+    async def rollback(self):
+        # Pending additions are dropped, the already sent ones are let
+        # finish and then reverted, as the packages shouldn't be visible
+        # in build repositories if the sign task failed
+        self._pending.clear()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        results = await asyncio.gather(
+            *(
+                self._pulp_client.revert_repository(repo_href, base_version)
+                for repo_href, base_version in self._base_versions.items()
+            ),
+            return_exceptions=True,
+        )
+        for repo_href, result in zip(self._base_versions, results):
+            if isinstance(result, Exception):
+                logging.error(
+                    "Cannot revert signed packages additions in %s: %s",
+                    repo_href,
+                    result,
+                )
+
+
+def __get_conversion_error(pkg_info: dict) -> typing.Optional[str]:
+    if not pkg_info["href"]:
+        return "href is missing"
+    if not pkg_info["sha256"]:
+        return "sha256 checksum is missing"
+    if pkg_info["sha256"] != pkg_info["original_sha256"]:
+        return "checksum differs"
+    return None
+
+
+def __get_manifest_error(
+    manifest: typing.List[dict],
+    artifacts_mapping: typing.Dict[int, models.BuildTaskArtifact],
+    repos_mapping: typing.Dict[typing.Tuple[str, str], str],
+    package_arches_mapping: typing.Dict[str, typing.Set[str]],
+) -> typing.Optional[str]:
+    missing_artifacts = sorted(
+        entry["id"]
+        for entry in manifest
+        if entry["id"] not in artifacts_mapping
+    )
+    if missing_artifacts:
+        return (
+            "Sign task manifest is outdated, artifacts are missing: "
+            + ", ".join(str(artifact_id) for artifact_id in missing_artifacts)
+        )
+    missing_repos = sorted(
+        f"{pkg_name}.{arch}"
+        for pkg_name, arches in package_arches_mapping.items()
+        for arch in arches
+        if (pkg_name, arch) not in repos_mapping
+    )
+    if missing_repos:
+        return (
+            "Sign task manifest has no repositories for packages: "
+            + ", ".join(missing_repos)
+        )
+    return None
 
 
 async def complete_sign_task(
@@ -502,50 +631,14 @@ async def complete_sign_task(
         stats = {}
 
     start_time = datetime.datetime.utcnow()
-    similar_rpms_mapping = defaultdict(list)
-    packages_to_add = defaultdict(list)
-    srpms_mapping = defaultdict(list)
 
     logging.info("Start processing task %s", sign_task_id)
     async with open_async_session(key=get_async_db_key()) as db:
         builds = await db.execute(
-            select(models.Build)
-            .where(models.Build.id == payload.build_id)
-            .options(selectinload(models.Build.repos))
+            select(models.Build).where(models.Build.id == payload.build_id)
         )
         build = builds.scalars().first()
-        source_rpms = await db.execute(
-            select(models.SourceRpm)
-            .where(models.SourceRpm.build_id == payload.build_id)
-            .options(
-                selectinload(models.SourceRpm.artifact).selectinload(
-                    models.BuildTaskArtifact.build_task,
-                )
-            )
-        )
-        source_rpms = source_rpms.scalars().all()
-        binary_rpms = await db.execute(
-            select(models.BinaryRpm)
-            .where(models.BinaryRpm.build_id == payload.build_id)
-            .options(
-                selectinload(models.BinaryRpm.artifact).selectinload(
-                    models.BuildTaskArtifact.build_task,
-                )
-            )
-        )
-        binary_rpms = binary_rpms.scalars().all()
-
-        for srpm in source_rpms:
-            srpms_mapping[srpm.artifact.href].append(srpm.artifact)
-
-        all_rpms = source_rpms + binary_rpms
-        rpms_per_platforms_mapping = _get_mapping_rpm_per_platform(all_rpms)
-        for rpm in all_rpms:
-            similar_rpms_mapping[rpm.artifact.name].append(rpm)
         modified_items = []
-        repo_mapping = await __get_build_repos(
-            db, payload.build_id, build=build
-        )
         pulp_client = PulpClient(
             settings.pulp_host, settings.pulp_user, settings.pulp_password
         )
@@ -585,6 +678,26 @@ async def complete_sign_task(
                 sign_task = await __failed_post_processing(sign_task, stats)
                 return sign_task
 
+            # Artifacts and target repositories are taken from the manifest
+            # prepared at sign task creation, no need to walk the whole build
+            manifest = await __get_sign_task_manifest(db, sign_task)
+            artifact_ids_mapping = defaultdict(list)
+            repos_mapping = {}
+            for entry in manifest:
+                artifact_ids_mapping[entry["name"]].append(entry["id"])
+                repos_mapping[(entry["name"], entry["arch"])] = entry[
+                    "repo_href"
+                ]
+            artifacts = await db.execute(
+                select(models.BuildTaskArtifact).where(
+                    models.BuildTaskArtifact.id.in_(
+                        [entry["id"] for entry in manifest]
+                    )
+                )
+            )
+            artifacts_mapping = {
+                artifact.id: artifact for artifact in artifacts.scalars().all()
+            }
             # Map packages to architectures to add them into proper repositories
             package_arches_mapping = defaultdict(set)
             # Make mapping for conversion (name-href mapping)
@@ -593,72 +706,118 @@ async def complete_sign_task(
                 package_arches_mapping[package.name].add(package.arch)
                 if package.name not in packages_to_convert:
                     packages_to_convert[package.name] = package
+            # Manifest can be stale, e.g. if build task was restarted and
+            # its artifacts were recreated after the sign task creation
+            manifest_error = __get_manifest_error(
+                manifest,
+                artifacts_mapping,
+                repos_mapping,
+                package_arches_mapping,
+            )
+            if manifest_error:
+                logging.error("Sign task %s: %s", sign_task_id, manifest_error)
+                sign_task.error_message = manifest_error
+                sign_task = await __failed_post_processing(sign_task, stats)
+                return sign_task
             pulp_db_packages = get_rpm_packages_by_checksums(
                 [pkg.sha256 for pkg in packages_to_convert.values()],
             )
             logging.info("Start processing packages for task %s", sign_task_id)
-            results = await asyncio.gather(*(
-                __process_single_package(package, pulp_db_packages)
-                for package in packages_to_convert.values()
-            ))
-            converted_packages = dict(results)
-            logging.info("Finish processing packages for task %s", sign_task_id)
-            logging.info(
-                "Updating href and add sign key for every srpm in project"
+            conversion_start = time.perf_counter()
+            repo_batcher = RepoAdditionsBatcher(
+                pulp_client, settings.sign_task_repo_batch_size
             )
-            for pkg_name, pkg_info in converted_packages.items():
-                new_href = pkg_info["href"]
-                if not pkg_info["href"]:
-                    logging.error("Package %s href is missing", pkg_name)
-                    sign_failed = True
-                    break
-                if not pkg_info["sha256"]:
-                    logging.error(
-                        "Package %s sha256 checksum is missing", pkg_name
+            packages_queue = asyncio.Queue()
+            for package in packages_to_convert.values():
+                packages_queue.put_nowait(package)
+
+            async def __conversion_worker():
+                nonlocal sign_failed
+                while not sign_failed and not packages_queue.empty():
+                    package = packages_queue.get_nowait()
+                    package_start = time.perf_counter()
+                    pkg_name, pkg_info = await __process_single_package(
+                        package, pulp_db_packages
                     )
-                    sign_failed = True
-                    break
-                if pkg_info["sha256"] != pkg_info["original_sha256"]:
-                    logging.error("Package %s checksum differs", pkg_name)
-                    sign_failed = True
-                    break
-
-                debug = is_debuginfo_rpm(pkg_name)
-
-                for db_pkg in similar_rpms_mapping.get(pkg_name, []):
-                    # we should update href and add sign key
-                    # for every srpm in project
-                    db_sprms = srpms_mapping.get(db_pkg.artifact.href, [])
-                    for db_sprm in db_sprms:
-                        db_sprm.href = new_href
-                        db_sprm.sign_key = sign_task.sign_key
-                        db_sprm.cas_hash = pkg_info["cas_hash"]
-                        modified_items.append(db_sprm)
-
-                    db_pkg.artifact.href = new_href
-                    db_pkg.artifact.sign_key = sign_task.sign_key
-                    db_pkg.artifact.cas_hash = pkg_info["cas_hash"]
-                    modified_items.append(db_pkg)
-                    modified_items.append(db_pkg.artifact)
-
-                for arch in package_arches_mapping.get(pkg_name, []):
-                    repo_unique_key = RepoUniqueKey(
-                        arch=arch,
-                        debug=debug,
-                        platform_id=rpms_per_platforms_mapping[pkg_name],
+                    SIGN_PACKAGE_CONVERSION_DURATION.observe(
+                        time.perf_counter() - package_start
                     )
-                    repo = repo_mapping[repo_unique_key]
-                    packages_to_add[repo.pulp_href].append(new_href)
+                    error = __get_conversion_error(pkg_info)
+                    if error:
+                        SIGN_PACKAGES_PROCESSED.labels("failed").inc()
+                        logging.error("Package %s %s", pkg_name, error)
+                        sign_failed = True
+                        return
+                    SIGN_PACKAGES_PROCESSED.labels("converted").inc()
+                    if sign_failed:
+                        return
+                    converted_packages[pkg_name] = pkg_info
+                    for arch in package_arches_mapping.get(pkg_name, []):
+                        repo_batcher.add(
+                            repos_mapping[(pkg_name, arch)], pkg_info["href"]
+                        )
+
+            converted_packages = {}
+            workers_count = min(
+                settings.sign_task_conversion_concurrency,
+                len(packages_to_convert),
+            )
+            workers = [
+                asyncio.create_task(__conversion_worker())
+                for _ in range(workers_count)
+            ]
+            # The first failed worker stops the others, so they don't
+            # schedule repository modifications for a failed sign task
+            done, pending = await asyncio.wait(
+                workers, return_when=asyncio.FIRST_EXCEPTION
+            )
+            for worker in pending:
+                worker.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            worker_error = next(
+                (
+                    worker.exception()
+                    for worker in done
+                    if worker.exception() is not None
+                ),
+                None,
+            )
+            conversion_time = time.perf_counter() - conversion_start
+            stats["packages_conversion_time"] = round(conversion_time, 3)
+            if conversion_time:
+                SIGN_PACKAGES_THROUGHPUT.observe(
+                    len(packages_to_convert) / conversion_time
+                )
+            logging.info("Finish processing packages for task %s", sign_task_id)
 
+            if worker_error is None and not sign_failed:
+                logging.info(
+                    "Start modify repository for task %s", sign_task_id
+                )
+                try:
+                    await repo_batcher.flush()
+                except Exception as exc:
+                    worker_error = exc
+                logging.info(
+                    "Finish modify repository for task %s", sign_task_id
+                )
+            if worker_error is not None or sign_failed:
+                # Signed packages shouldn't stay in build repositories
+                # of a failed sign task
+                await repo_batcher.rollback()
+            if worker_error is not None:
+                raise worker_error
             if sign_failed:
                 sign_task = await __failed_post_processing(sign_task, stats)
                 return sign_task
-            logging.info("Start modify repository for task %s", sign_task_id)
-            await asyncio.gather(*(
-                pulp_client.modify_repository(repo_href, add=packages)
-                for repo_href, packages in packages_to_add.items()
-            ))
-            logging.info("Finish modify repository for task %s", sign_task_id)
+
+            for pkg_name, pkg_info in converted_packages.items():
+                for artifact_id in artifact_ids_mapping.get(pkg_name, []):
+                    artifact = artifacts_mapping[artifact_id]
+                    artifact.href = pkg_info["href"]
+                    artifact.sign_key = sign_task.sign_key
+                    artifact.cas_hash = pkg_info["cas_hash"]
+                    modified_items.append(artifact)
 
         if payload.success and not sign_failed:
             sign_task.status = SignStatus.COMPLETED
@@ -18,6 +18,7 @@ import dramatiq
 from dramatiq.brokers.rabbitmq import RabbitmqBroker
 
 from alws.config import settings
+from alws.utils.query_metrics import QueryMetricsMiddleware
 
 rabbitmq_broker = RabbitmqBroker(
     url=f"amqp://"
@@ -30,20 +31,25 @@ rabbitmq_broker = RabbitmqBroker(
 # are provided automatically by the dramatiq worker CLI's default Prometheus
 # middleware whenever prometheus_client is installed — we do NOT add it here,
 # since a second explicit registration duplicates the collectors and conflicts.
+if settings.db_query_metrics_enabled:
+    rabbitmq_broker.add_middleware(QueryMetricsMiddleware())
 dramatiq.set_broker(rabbitmq_broker)
 event_loop = asyncio.get_event_loop()
 
 # Tasks import started from here
 from alws.dramatiq.build import (
     build_done,
+    refill_build_repos_pool,
     sources_build_done,
     start_build,
 )
+from alws.dramatiq.build_removal import delete_build
 from alws.dramatiq.errata import (
     bulk_errata_release,
     bulk_new_errata_release,
     create_errata,
     create_new_errata,
+    publish_errata_repositories,
     release_errata,
     release_new_errata,
     reset_records_threshold,
@@ -19,7 +19,7 @@ from alws.constants import (
     GitHubIssueStatus,
 )
 from alws.crud import build_node as build_node_crud
-from alws.crud import test
+from alws.crud import build_repos_pool, test
 from alws.dependencies import get_async_db_key
 from alws.dramatiq import event_loop
 from alws.errors import (
@@ -38,10 +38,10 @@ from alws.utils.github_integration_helper import (
     move_issues,
     set_build_id_to_issues,
 )
+from alws.utils.pulp_client import get_pulp_client
 from alws.utils.sentry import sentry_init
 
-
-__all__ = ['start_build', 'build_done']
+__all__ = ['start_build', 'build_done', 'refill_build_repos_pool']
 
 logger = logging.getLogger(__name__)
 
@@ -126,6 +126,10 @@ async def _start_build(build_id: int, build_request: build_schema.BuildCreate):
         await db.flush()
         await planner.init_build_repos()
 
+    # Also seeds an empty pool, refill is a no-op when the pool is full
+    if settings.build_repos_pool_size > 0:
+        refill_build_repos_pool.send()
+
     if settings.github_integration_enabled:
         try:
             github_client = await get_github_client()
@@ -336,3 +340,18 @@ def sources_build_done(request: Dict[str, Any]):
     parsed_build = build_node_schema.BuildDone(**request)
     event_loop.run_until_complete(setup_all())
     event_loop.run_until_complete(_build_done(parsed_build))
+
+
+async def _refill_build_repos_pool():
+    await build_repos_pool.refill_build_repos_pool(get_pulp_client())
+
+
+@dramatiq.actor(
+    max_retries=0,
+    priority=10,
+    queue_name='builds',
+    time_limit=DRAMATIQ_TASK_TIMEOUT,
+)
+def refill_build_repos_pool():
+    event_loop.run_until_complete(setup_all())
+    event_loop.run_until_complete(_refill_build_repos_pool())
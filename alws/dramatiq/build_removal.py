@@ -0,0 +1,23 @@
+import dramatiq
+
+from alws.constants import DRAMATIQ_TASK_TIMEOUT
+from alws.crud import build as build_crud
+from alws.dramatiq import event_loop
+from alws.utils.fastapi_sqla_setup import setup_all
+from alws.utils.sentry import sentry_init
+
+__all__ = ['delete_build']
+
+
+sentry_init()
+
+
+@dramatiq.actor(
+    max_retries=3,
+    priority=10,
+    queue_name='builds',
+    time_limit=DRAMATIQ_TASK_TIMEOUT,
+)
+def delete_build(build_id: int):
+    event_loop.run_until_complete(setup_all())
+    event_loop.run_until_complete(build_crud.remove_build_data(build_id))
@@ -1,19 +1,26 @@
+import logging
 import typing
 
 import dramatiq
 
+from alws.config import settings
 from alws.constants import DRAMATIQ_TASK_TIMEOUT
 from alws.crud.errata import (
     bulk_errata_records_release,
     bulk_new_errata_records_release,
-    create_new_errata_record,
     create_errata_record,
+    create_new_errata_record,
     release_errata_record,
     release_new_errata_record,
     reset_matched_erratas_packages_threshold,
 )
 from alws.dramatiq import event_loop
 from alws.utils.fastapi_sqla_setup import setup_all
+from alws.utils.publication_scheduler import (
+    get_publication_retry_delay,
+    publish_dirty_repositories,
+)
+from alws.utils.pulp_client import PulpClient
 from alws.utils.sentry import sentry_init
 
 __all__ = ["release_errata"]
@@ -60,6 +67,15 @@ async def _bulk_new_errata_records_release(
     await bulk_new_errata_records_release(records_ids, force)
 
 
+async def _publish_dirty_repositories():
+    pulp_client = PulpClient(
+        settings.pulp_host,
+        settings.pulp_user,
+        settings.pulp_password,
+    )
+    return await publish_dirty_repositories(pulp_client)
+
+
 async def _reset_matched_erratas_packages_threshold(issued_date: str):
     await reset_matched_erratas_packages_threshold(issued_date)
 
@@ -161,3 +177,27 @@ def reset_records_threshold(issued_date: str):
     event_loop.run_until_complete(
         _reset_matched_erratas_packages_threshold(issued_date)
     )
+
+
+@dramatiq.actor(
+    max_retries=0,
+    priority=0,
+    queue_name="errata",
+    time_limit=DRAMATIQ_TASK_TIMEOUT,
+)
+def publish_errata_repositories(attempt: int = 0):
+    has_failed = event_loop.run_until_complete(_publish_dirty_repositories())
+    if not has_failed:
+        return
+    delay = get_publication_retry_delay(attempt + 1)
+    if delay is None:
+        logging.error(
+            "Repositories are not published after %d retries, "
+            "they will be published after the next release",
+            attempt,
+        )
+        return
+    publish_errata_repositories.send_with_options(
+        args=(attempt + 1,),
+        delay=delay,
+    )
@@ -35,6 +35,12 @@ async def _perform_user_removal(user_id: int):
 
         for build_id in build_ids:
             await build_crud.remove_build_job(db, build_id)
+        # remove_build_data uses its own sessions, the builds must be
+        # marked for removal before it runs
+        await db.commit()
+
+        for build_id in build_ids:
+            await build_crud.remove_build_data(build_id)
 
         await db.execute(delete(models.User).where(models.User.id == user_id))
 
@@ -117,3 +117,9 @@ class PlatformNotFoundError(Exception):
 
 class RepositoriesNotFoundError(Exception):
     pass
+
+
+class PulpTransactionError(Exception):
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
@@ -29,6 +29,7 @@ from sqlalchemy.sql import func
 
 from alws.config import settings
 from alws.constants import (
+    BuildTaskStatus,
     ErrataPackageStatus,
     ErrataReferenceType,
     ErrataReleaseStatus,
@@ -375,6 +376,33 @@ class Repository(CustomRepoRepr, PermissionsMixin):
     platform: Mapped["Platform"] = relationship("Platform")
 
 
+class BuildRepoPoolEntry(Base):
+    """Pre-created build repository waiting to be claimed by a new build."""
+
+    __tablename__ = "build_repos_pool"
+
+    id: Mapped[int] = mapped_column(sqlalchemy.Integer, primary_key=True)
+    platform_id: Mapped[int] = mapped_column(
+        sqlalchemy.Integer,
+        sqlalchemy.ForeignKey("platforms.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    arch: Mapped[str] = mapped_column(sqlalchemy.Text, nullable=False)
+    debug: Mapped[bool] = mapped_column(
+        sqlalchemy.Boolean, default=False, nullable=False
+    )
+    name: Mapped[str] = mapped_column(
+        sqlalchemy.Text, nullable=False, unique=True
+    )
+    pulp_href: Mapped[str] = mapped_column(sqlalchemy.Text, nullable=False)
+    distro_href: Mapped[str] = mapped_column(sqlalchemy.Text, nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        sqlalchemy.DateTime,
+        nullable=False,
+        default=datetime.datetime.utcnow,
+    )
+
+
 class RepositoryRemote(CustomRepoRepr):
     __tablename__ = "repository_remotes"
     __tableargs__ = [
@@ -491,6 +519,13 @@ class Build(PermissionsMixin, TeamMixin, Base):
     cancel_testing: Mapped[bool] = mapped_column(
         sqlalchemy.Boolean, default=False, nullable=False
     )
+    # Set when the build removal is scheduled, its data is being deleted
+    deleting: Mapped[bool] = mapped_column(
+        sqlalchemy.Boolean,
+        default=False,
+        server_default=sqlalchemy.false(),
+        nullable=False,
+    )
 
 
 BuildTaskDependency = sqlalchemy.Table(
@@ -613,6 +648,14 @@ class BuildTask(TimeMixin, Base):
     error: Mapped[Optional[str]] = mapped_column(
         sqlalchemy.Text, nullable=True, default=None
     )
+    # Number of build_task_dependency rows of this task, a task is ready
+    # to be dispatched when it reaches zero
+    pending_dependencies: Mapped[int] = mapped_column(
+        sqlalchemy.Integer,
+        default=0,
+        server_default="0",
+        nullable=False,
+    )
 
 
 class BuildTaskRef(Base):
@@ -1417,6 +1460,11 @@ class SignTask(TimeMixin, Base):
     stats: Mapped[Optional[Dict[str, Any]]] = mapped_column(
         JSONB, nullable=True
     )
+    # Packages to sign along with their download urls and target repositories,
+    # computed once when the task is created
+    packages_manifest: Mapped[Optional[List[Dict[str, Any]]]] = mapped_column(
+        JSONB, nullable=True
+    )
 
 
 class ExportTask(Base):
@@ -2121,6 +2169,12 @@ class PerformanceStats(Base):
     )
 
 
+idx_build_repos_pool_platform_arch_debug = sqlalchemy.Index(
+    "idx_build_repos_pool_platform_arch_debug",
+    BuildRepoPoolEntry.platform_id,
+    BuildRepoPoolEntry.arch,
+    BuildRepoPoolEntry.debug,
+)
 idx_build_tasks_status_arch_ts = sqlalchemy.Index(
     "idx_build_tasks_status_arch_ts",
     BuildTask.status,
@@ -2143,6 +2197,15 @@ idx_build_tasks_build_id_status = sqlalchemy.Index(
     BuildTask.build_id,
     BuildTask.status,
 )
+idx_build_tasks_ready = sqlalchemy.Index(
+    "idx_build_tasks_ready",
+    BuildTask.arch,
+    BuildTask.id,
+    postgresql_where=sqlalchemy.and_(
+        BuildTask.pending_dependencies == 0,
+        BuildTask.status < BuildTaskStatus.COMPLETED,
+    ),
+)
 idx_test_tasks_build_task_id_revision = sqlalchemy.Index(
     "idx_test_tasks_build_task_id_revision",
     TestTask.build_task_id,
@@ -354,12 +354,14 @@ class BaseReleasePlanner(metaclass=ABCMeta):
                             artifact_platform=build_repo.platform,
                         )
                     )
-                    template = await self.pulp_client.get_repo_modules_yaml(
-                        module_repo.url
+                    repo_modules = (
+                        await self.pulp_client.fetch_repo_modules_yaml(
+                            module_repo.url
+                        )
                     )
                     module_index = IndexWrapper()
-                    if template:
-                        module_index = IndexWrapper.from_template(template)
+                    if repo_modules:
+                        module_index = repo_modules.index
                     for module in module_index.iter_modules():
                         key = (
                             module.name,
@@ -856,12 +858,12 @@ class CommunityReleasePlanner(BaseReleasePlanner):
                     repo_url = db_repo["url"]
                 repo_module_index = prod_repo_modules_cache.get(repo_url)
                 if repo_module_index is None:
-                    template = await self.pulp_client.get_repo_modules_yaml(
-                        repo_url
+                    repo_modules = (
+                        await self.pulp_client.fetch_repo_modules_yaml(repo_url)
                     )
                     repo_module_index = IndexWrapper()
-                    if template:
-                        repo_module_index = IndexWrapper.from_template(template)
+                    if repo_modules:
+                        repo_module_index = repo_modules.index
                     prod_repo_modules_cache[repo_url] = repo_module_index
                 module_info = module["module"]
                 release_module = ModuleWrapper.from_template(
@@ -1736,12 +1738,12 @@ class AlmaLinuxReleasePlanner(BaseReleasePlanner):
                     )
                 repo_module_index = prod_repo_modules_cache.get(repo_url)
                 if repo_module_index is None:
-                    template = await self.pulp_client.get_repo_modules_yaml(
-                        repo_url
+                    repo_modules = (
+                        await self.pulp_client.fetch_repo_modules_yaml(repo_url)
                     )
                     repo_module_index = IndexWrapper()
-                    if template:
-                        repo_module_index = IndexWrapper.from_template(template)
+                    if repo_modules:
+                        repo_module_index = repo_modules.index
                     prod_repo_modules_cache[repo_url] = repo_module_index
                 if repo_name not in packages_to_repo_layout:
                     packages_to_repo_layout[repo_name] = {}
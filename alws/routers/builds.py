@@ -5,7 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi_sqla import AsyncSessionDependency
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from alws import models
+from alws import dramatiq, models
 from alws.auth import get_current_user
 from alws.crud import build as build_crud
 from alws.crud import build_node
@@ -163,3 +163,7 @@ async def remove_build(
             status_code=status.HTTP_409_CONFLICT,
             detail=str(exc),
         )
+    # The worker must see the deleting flag, so it's committed before
+    # the removal message is sent
+    await db.commit()
+    dramatiq.build_removal.delete_build.send(build_id)
@@ -1,6 +1,14 @@
 from typing import Annotated, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    status,
+)
 from fastapi.responses import PlainTextResponse
 from fastapi_sqla import AsyncSessionDependency
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -152,12 +160,11 @@ async def list_errata_records(
 async def get_updateinfo_xml(
     record_id: str,
     platform_id: Optional[int] = None,
+    if_none_match: Annotated[Optional[str], Header()] = None,
     db: AsyncSession = Depends(AsyncSessionDependency(get_async_db_key())),
 ):
-    updateinfo_xml = await errata_crud.get_updateinfo_xml_from_pulp(
-        db, record_id, platform_id
-    )
-    if updateinfo_xml is None:
+    result = await errata_crud.get_updateinfo_xml(db, record_id, platform_id)
+    if result is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=(
@@ -165,7 +172,17 @@ async def get_updateinfo_xml(
                 f"{platform_id=} in pulp"
             ),
         )
-    return updateinfo_xml
+    updateinfo_xml, etag = result
+    headers = {"ETag": etag}
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in (tag.strip() for tag in if_none_match.split(","))
+    ):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers=headers,
+        )
+    return PlainTextResponse(updateinfo_xml, headers=headers)
 
 
 @router.post("/update/", response_model=errata_schema.ErrataRecord)
@@ -1,12 +1,14 @@
 import typing
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from fastapi_sqla import AsyncSessionDependency
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from alws.auth import get_current_user
+from alws.auth import get_current_superuser, get_current_user
 from alws.crud import repository
 from alws.dependencies import get_async_db_key
+from alws.errors import DataNotFoundError
 from alws.schemas import repository_schema
 from alws.utils.exporter import fs_export_repository
 
@@ -24,6 +26,54 @@ async def get_repositories(
     return await repository.get_repositories(db)
 
 
+@router.get(
+    '/diff/',
+    dependencies=[Depends(get_current_superuser)],
+    response_class=StreamingResponse,
+)
+async def get_repositories_content_diff(
+    left: typing.List[int] = Query(),
+    right: typing.List[int] = Query(),
+    left_version: typing.Optional[int] = None,
+    right_version: typing.Optional[int] = None,
+    statuses: typing.List[
+        typing.Literal['added', 'removed', 'changed', 'same']
+    ] = Query(['added', 'removed', 'changed']),
+    arches: typing.Optional[typing.List[str]] = Query(None),
+    db: AsyncSession = Depends(AsyncSessionDependency(key=get_async_db_key())),
+):
+    """Stream RPM packages that differ between two sets of repositories.
+
+    Each line is a JSON object keyed by NEVRA, versions can be pinned
+    when a side consists of a single repository.
+    """
+    if (left_version is not None and len(left) > 1) or (
+        right_version is not None and len(right) > 1
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Versions can be set only for a single repository',
+        )
+    try:
+        left_refs = await repository.get_repo_version_refs(
+            db, left, version=left_version
+        )
+        right_refs = await repository.get_repo_version_refs(
+            db, right, version=right_version
+        )
+    except DataNotFoundError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(exc),
+        )
+    return StreamingResponse(
+        repository.iter_repos_content_diff(
+            left_refs, right_refs, statuses, arches=arches
+        ),
+        media_type='application/x-ndjson',
+    )
+
+
 @router.get(
     '/{repository_id}/',
     response_model=typing.Union[None, repository_schema.Repository],
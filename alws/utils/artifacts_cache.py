@@ -0,0 +1,115 @@
+"""
+Cache of Pulp artifact hrefs by sha256 checksum.
+
+Uploads check whether an artifact with the same checksum already exists in
+Pulp, the cache lets repeated uploads of the same content (identical logs,
+re-signed packages) skip that request. Entries live in a bounded in-process
+LRU and, if ``PULP_ARTIFACTS_CACHE_REDIS_ENABLED`` is set, in Redis so that
+workers share them. Only existing artifacts are cached and entries expire
+after ``PULP_ARTIFACTS_CACHE_TTL`` seconds, since Pulp can remove orphans.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from alws.config import settings
+
+__all__ = [
+    'ArtifactsCache',
+    'artifacts_cache',
+]
+
+_REDIS_KEY_PREFIX = 'pulp_artifact:'
+
+
+class ArtifactsCache:
+    def __init__(self, maxsize: int, ttl: int, redis_enabled: bool = False):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._redis_enabled = redis_enabled
+        self._redis: Optional[aioredis.Redis] = None
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def _get_redis(self) -> Optional[aioredis.Redis]:
+        if not self._redis_enabled:
+            return None
+        if self._redis is None:
+            self._redis = aioredis.from_url(settings.redis_url)
+        return self._redis
+
+    def _get_local(self, sha256: str) -> Optional[str]:
+        entry = self._entries.get(sha256)
+        if entry is None:
+            return None
+        href, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[sha256]
+            return None
+        self._entries.move_to_end(sha256)
+        return href
+
+    def _set_local(self, sha256: str, href: str):
+        self._entries[sha256] = (href, time.monotonic() + self._ttl)
+        self._entries.move_to_end(sha256)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    async def get_many(self, checksums: Iterable[str]) -> Dict[str, str]:
+        found = {}
+        missing = []
+        for sha256 in checksums:
+            href = self._get_local(sha256)
+            if href:
+                found[sha256] = href
+            else:
+                missing.append(sha256)
+        redis = self._get_redis()
+        if not missing or redis is None:
+            return found
+        try:
+            hrefs = await redis.mget(
+                [f'{_REDIS_KEY_PREFIX}{sha256}' for sha256 in missing]
+            )
+        except Exception:
+            logging.exception('Cannot get artifacts from redis cache')
+            return found
+        for sha256, href in zip(missing, hrefs):
+            if href:
+                href = href.decode()
+                self._set_local(sha256, href)
+                found[sha256] = href
+        return found
+
+    async def get(self, sha256: str) -> Optional[str]:
+        return (await self.get_many([sha256])).get(sha256)
+
+    async def set_many(self, hrefs: Dict[str, str]):
+        for sha256, href in hrefs.items():
+            self._set_local(sha256, href)
+        redis = self._get_redis()
+        if not hrefs or redis is None:
+            return
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                for sha256, href in hrefs.items():
+                    pipe.set(f'{_REDIS_KEY_PREFIX}{sha256}', href, ex=self._ttl)
+                await pipe.execute()
+        except Exception:
+            logging.exception('Cannot store artifacts in redis cache')
+
+    async def set(self, sha256: str, href: str):
+        await self.set_many({sha256: href})
+
+    def clear(self):
+        self._entries.clear()
+
+
+artifacts_cache = ArtifactsCache(
+    maxsize=settings.pulp_artifacts_cache_size,
+    ttl=settings.pulp_artifacts_cache_ttl,
+    redis_enabled=settings.pulp_artifacts_cache_redis_enabled,
+)
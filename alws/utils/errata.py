@@ -1,8 +1,10 @@
 import copy
+import functools
 import itertools
 import os
 import pathlib
 import re
+import threading
 from typing import List, Union
 
 import createrepo_c as cr
@@ -280,92 +282,123 @@ def extract_errata_metadata_modern(update):
     return {"schema_version": SCHEMA_VERSION, "data": [record]}
 
 
+class ErrataRecordsIndex:
+    """
+    Errata records collected from several updateinfo files, deduplicated
+    by their ids. Packages, references and modules of the records with
+    the same id are merged into the first added record.
+
+    Records can be added from several threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}
+        self._packages = {}
+        self._modern_records = {}
+        self._modern_packages = {}
+        self._modern_modules = {}
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def records(self) -> List[dict]:
+        return list(self._records.values())
+
+    @property
+    def modern_records(self) -> dict:
+        return {
+            "schema_version": SCHEMA_VERSION,
+            "data": list(self._modern_records.values()),
+        }
+
+    def add_record(self, record: dict):
+        with self._lock:
+            record_id = record["updateinfo_id"]
+            result_record = self._records.get(record_id)
+            if result_record is None:
+                self._records[record_id] = record
+                self._packages[record_id] = {
+                    pkg["sum"] for pkg in record["pkglist"]["packages"]
+                }
+                return
+            processed_packages = self._packages[record_id]
+            for pkg in record["pkglist"]["packages"]:
+                if pkg["sum"] in processed_packages:
+                    continue
+                processed_packages.add(pkg["sum"])
+                result_record["pkglist"]["packages"].append(pkg)
+            for ref in record["references"]:
+                if ref in result_record["references"]:
+                    continue
+                result_record["references"].append(ref)
+            # we need this for avoiding unneeded changes in OSV data
+            if record["updated_date"] > result_record["updated_date"]:
+                result_record["updated_date"] = record["updated_date"]
+            if record["issued_date"] < result_record["issued_date"]:
+                result_record["issued_date"] = record["issued_date"]
+            result_record["references"].sort(key=lambda x: x["type"])
+            result_record["pkglist"]["packages"].sort(key=lambda x: x["sum"])
+
+    def add_modern_record(self, record: dict):
+        with self._lock:
+            record_id = record["id"]
+            result_record = self._modern_records.get(record_id)
+            if result_record is None:
+                self._modern_records[record_id] = record
+                self._modern_packages[record_id] = {
+                    pkg["checksum"] for pkg in record["packages"]
+                }
+                self._modern_modules[record_id] = {
+                    _get_module_nsvca(module) for module in record["modules"]
+                }
+                return
+            processed_packages = self._modern_packages[record_id]
+            for pkg in record["packages"]:
+                if pkg["checksum"] in processed_packages:
+                    continue
+                processed_packages.add(pkg["checksum"])
+                result_record["packages"].append(pkg)
+            for ref in record["references"]:
+                if ref in result_record["references"]:
+                    continue
+                result_record["references"].append(ref)
+            processed_modules = self._modern_modules[record_id]
+            for module in record["modules"]:
+                nsvca = _get_module_nsvca(module)
+                if nsvca in processed_modules:
+                    continue
+                processed_modules.add(nsvca)
+                result_record["modules"].append(module)
+
+
 def merge_errata_records(a, b):
-    processed_records = {}
-    result = []
+    index = ErrataRecordsIndex()
     for record in itertools.chain(a, b):
-        if record["updateinfo_id"] not in processed_records:
-            new_record = copy.deepcopy(record)
-            processed_records[new_record["updateinfo_id"]] = new_record
-            result.append(new_record)
-            continue
-        processed_packages = set()
-        result_record = processed_records[record["updateinfo_id"]]
-        for pkg in result_record["pkglist"]["packages"]:
-            processed_packages.add(pkg["sum"])
-        for pkg in record["pkglist"]["packages"]:
-            if pkg["sum"] in processed_packages:
-                continue
-            processed_packages.add(pkg["sum"])
-            result_record["pkglist"]["packages"].append(pkg)
-        processed_references = []
-        for ref in result_record["references"]:
-            processed_references.append(ref)
-        for ref in record["references"]:
-            if ref in processed_references:
-                continue
-            result_record["references"].append(ref)
-        # we need this for avoiding unneeded changes in OSV data
-        if record["updated_date"] > result_record["updated_date"]:
-            result_record["updated_date"] = record["updated_date"]
-        if record["issued_date"] < result_record["issued_date"]:
-            result_record["issued_date"] = record["issued_date"]
-        result_record["references"] = sorted(
-            result_record["references"],
-            key=lambda x: x["type"],
-        )
-        result_record["pkglist"]["packages"] = sorted(
-            result_record["pkglist"]["packages"],
-            key=lambda x: x["sum"],
-        )
-    return result
+        index.add_record(copy.deepcopy(record))
+    return index.records
 
 
 def merge_errata_records_modern(a, b):
-    processed_records = {}
-    result = []
+    index = ErrataRecordsIndex()
     for record in itertools.chain(a["data"], b["data"]):
-        if record["id"] not in processed_records:
-            new_record = copy.deepcopy(record)
-            processed_records[new_record["id"]] = new_record
-            result.append(new_record)
-            continue
-        processed_packages = set()
-        result_record = processed_records[record["id"]]
-        for pkg in result_record["packages"]:
-            processed_packages.add(pkg["checksum"])
-        for pkg in record["packages"]:
-            if pkg["checksum"] in processed_packages:
-                continue
-            processed_packages.add(pkg["checksum"])
-            result_record["packages"].append(pkg)
-        processed_references = []
-        for ref in result_record["references"]:
-            processed_references.append(ref)
-        for ref in record["references"]:
-            if ref in processed_references:
-                continue
-            result_record["references"].append(ref)
-        processed_modules = set()
-        for module in result_record["modules"]:
-            processed_modules.add(_get_module_nsvca(module))
-        for module in record["modules"]:
-            nsvca = _get_module_nsvca(module)
-            if nsvca in processed_modules:
-                continue
-            processed_modules.add(nsvca)
-            result_record["modules"].append(module)
-    return {"schema_version": SCHEMA_VERSION, "data": result}
+        index.add_modern_record(copy.deepcopy(record))
+    return index.modern_records
+
+
+@functools.lru_cache(maxsize=1)
+def _get_errata_page_template() -> jinja2.Template:
+    template_dir = pathlib.Path(__file__).absolute().parent / "templates"
+    template = (template_dir / "errata_alma_page.j2").read_text()
+    return jinja2.Template(template)
 
 
 def dump_errata_to_html(errata):
     # sort package list by arch
     packages = errata["pkglist"]["packages"]
     errata["pkglist"]["packages"] = sorted(packages, key=lambda x: x["arch"])
-
-    template_dir = pathlib.Path(__file__).absolute().parent / "templates"
-    template = (template_dir / "errata_alma_page.j2").read_text()
-    return jinja2.Template(template).render(errata=errata)
+    return _get_errata_page_template().render(errata=errata)
 
 
 def generate_errata_page(errata, errata_dir):
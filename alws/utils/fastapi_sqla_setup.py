@@ -6,6 +6,9 @@ from fastapi_sqla.async_sqla import (
 )
 from fastapi_sqla.sqla import _DEFAULT_SESSION_KEY, _session_factories, startup
 
+from alws.config import settings
+from alws.utils.query_metrics import instrument_engine
+
 app = FastAPI()
 setup(app)
 
@@ -16,6 +19,7 @@ async_keys = ['async', 'pulp_async']
 async def setup_all():
     sync_setup()
     await async_setup()
+    instrument_engines()
 
 
 async def async_setup():
@@ -28,3 +32,16 @@ def sync_setup():
     for key in sync_keys:
         if key not in _session_factories:
             startup(key)
+
+
+def instrument_engines():
+    if not settings.db_query_metrics_enabled:
+        return
+    for key in sync_keys:
+        factory = _session_factories.get(key)
+        if factory is not None:
+            instrument_engine(factory.kw['bind'], key)
+    for key in async_keys:
+        factory = _async_session_factories.get(key)
+        if factory is not None:
+            instrument_engine(factory.kw['bind'].sync_engine, key)
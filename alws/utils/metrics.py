@@ -2,9 +2,15 @@
 Prometheus metrics for albs-web-server.
 
 This module owns the metric definitions, the ASGI app exposed at ``/metrics``,
-the HTTP middleware that times every request, and a generic ``track_time``
+the HTTP middleware that times every request (and attributes SQL statements
+to its route, see ``alws.utils.query_metrics``), and a generic ``track_time``
 decorator for instrumenting arbitrary sync/async functions.
 
+The HTTP middleware is a pure ASGI middleware rather than a
+``BaseHTTPMiddleware`` subclass: it neither re-wraps the response body stream
+nor adds an extra task hop per request, it only peeks at the ASGI messages
+passing through.
+
 Dramatiq workers run in separate processes and are instrumented separately by
 the dramatiq worker CLI's built-in Prometheus middleware; they do not go
 through this middleware.
@@ -14,20 +20,25 @@ import asyncio
 import functools
 import os
 import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
 from prometheus_client import (
     CollectorRegistry,
     Counter,
+    Gauge,
     Histogram,
     make_asgi_app,
     multiprocess,
 )
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.routing import Match
+from starlette.routing import BaseRoute, Match, get_route_path
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from alws.utils.query_metrics import track_queries
 
 __all__ = [
     "PrometheusMiddleware",
+    "RouteTemplateLookup",
     "metrics_app",
     "track_time",
 ]
@@ -35,6 +46,9 @@ __all__ = [
 _HTTP_BUCKETS = (
     0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
 )
+_SIZE_BUCKETS = (
+    100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000,
+)
 _FUNC_BUCKETS = (
     0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600,
 )
@@ -50,6 +64,89 @@ HTTP_REQUEST_TOTAL = Counter(
     "Total HTTP requests",
     labelnames=("method", "endpoint", "status"),
 )
+HTTP_REQUEST_SIZE = Histogram(
+    "http_request_size_bytes",
+    "HTTP request body size in bytes",
+    labelnames=("method", "endpoint"),
+    buckets=_SIZE_BUCKETS,
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "HTTP response body size in bytes",
+    labelnames=("method", "endpoint", "status"),
+    buckets=_SIZE_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being processed",
+    labelnames=("method", "endpoint"),
+    multiprocess_mode="livesum",
+)
+PULP_REQUEST_DURATION = Histogram(
+    "pulp_request_duration_seconds",
+    "Pulp API request latency in seconds, semaphore wait excluded",
+    labelnames=("method", "endpoint", "status"),
+    buckets=_HTTP_BUCKETS,
+)
+PULP_REQUEST_RETRIES = Counter(
+    "pulp_request_retries_total",
+    "Pulp API request attempts retried by the retry client",
+    labelnames=("method", "endpoint"),
+)
+PULP_REQUEST_ERRORS = Counter(
+    "pulp_request_errors_total",
+    "Pulp API requests answered with a 4xx/5xx status",
+    labelnames=("method", "endpoint", "status_class"),
+)
+PULP_SEMAPHORE_WAIT = Histogram(
+    "pulp_semaphore_wait_seconds",
+    "Time spent waiting for the Pulp client semaphore",
+    buckets=_HTTP_BUCKETS,
+)
+PULP_TASK_DURATION = Histogram(
+    "pulp_task_duration_seconds",
+    "Pulp task timings: queued (created to started), running (started to "
+    "finished) and waited (time spent in wait_for_task)",
+    labelnames=("task", "phase", "state"),
+    buckets=_FUNC_BUCKETS,
+)
+ERRATA_PUBLICATION_LAG = Histogram(
+    "errata_publication_lag_seconds",
+    "Time from the first errata release into a repository to its "
+    "deferred publication",
+    buckets=_FUNC_BUCKETS,
+)
+SIGN_PACKAGES_PROCESSED = Counter(
+    "sign_packages_processed_total",
+    "Signed packages processed on sign task completion",
+    labelnames=("result",),
+)
+SIGN_PACKAGE_CONVERSION_DURATION = Histogram(
+    "sign_package_conversion_duration_seconds",
+    "Time to turn a signed artifact into a Pulp RPM package",
+    buckets=_FUNC_BUCKETS,
+)
+SIGN_PACKAGES_THROUGHPUT = Histogram(
+    "sign_packages_throughput",
+    "Packages converted per second by a sign task completion",
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 20, 50, 100),
+)
+BUILD_REPOS_POOL_CLAIMS = Counter(
+    "build_repos_pool_claims_total",
+    "Build repositories requested from the pool, by hit or miss",
+    labelnames=("platform", "result"),
+)
+BUILD_REPOS_POOL_CREATED = Counter(
+    "build_repos_pool_created_total",
+    "Build repositories created to refill the pool",
+    labelnames=("platform",),
+)
+BUILD_REPOS_POOL_AVAILABLE = Gauge(
+    "build_repos_pool_available",
+    "Pooled build repositories available after the last refill",
+    labelnames=("platform", "arch", "debug"),
+    multiprocess_mode="mostrecent",
+)
 FUNCTION_DURATION = Histogram(
     "function_duration_seconds",
     "Runtime of instrumented functions/methods in seconds",
@@ -58,7 +155,7 @@ FUNCTION_DURATION = Histogram(
 )
 
 # Endpoints we never want to instrument (avoid scrape self-noise).
-_EXCLUDED_PATHS = frozenset({"/metrics"})
+_EXCLUDED_PATHS = frozenset({"/metrics", "/metrics/"})
 
 
 def metrics_app():
@@ -75,43 +172,131 @@ def metrics_app():
     return make_asgi_app()
 
 
-def _endpoint_label(request: Request) -> str:
-    """Use the matched route template, never the raw path.
+_UNMATCHED = "__unmatched__"
+
+
+class RouteTemplateLookup:
+    """Map a request's method and path to its route template.
 
     Labelling by raw path turns every path parameter (e.g. each build id) into
-    a distinct time series and blows up Prometheus cardinality.
+    a distinct time series and blows up Prometheus cardinality, so requests
+    are labelled by the template of the route they match.
 
-    ``scope["route"]`` is a fast path for frameworks that populate it; plain
-    Starlette does not, so we fall back to matching against the app's routes.
+    Routes without path parameters are indexed by their literal path, so the
+    hot build-node/sign-node polling endpoints resolve with a dict lookup.
+    Only parametrized routes are matched one by one, and their results are
+    kept in a bounded LRU cache keyed by ``(method, path)``.
     """
-    route = request.scope.get("route")
-    path = getattr(route, "path", None)
-    if path:
-        return path
-    for candidate in request.app.routes:
-        if candidate.matches(request.scope)[0] == Match.FULL:
-            return getattr(candidate, "path", None) or "__unmatched__"
-    return "__unmatched__"
 
+    def __init__(self, routes: List[BaseRoute], maxsize: int = 2048):
+        self._routes_count = len(routes)
+        self._static: Dict[str, List[BaseRoute]] = {}
+        self._dynamic: List[BaseRoute] = []
+        self._cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._maxsize = maxsize
+        for route in routes:
+            path = getattr(route, "path", None)
+            methods = getattr(route, "methods", None)
+            if (
+                path
+                and methods is not None
+                and not getattr(route, "param_convertors", None)
+            ):
+                self._static.setdefault(path, []).append(route)
+            else:
+                self._dynamic.append(route)
 
-class PrometheusMiddleware(BaseHTTPMiddleware):
-    """Record latency and count for every HTTP request."""
+    def is_stale(self, routes: List[BaseRoute]) -> bool:
+        return len(routes) != self._routes_count
 
-    async def dispatch(self, request: Request, call_next):
-        if request.url.path in _EXCLUDED_PATHS:
-            return await call_next(request)
+    def lookup(self, scope: Scope) -> str:
+        method = scope["method"]
+        path = get_route_path(scope)
+        for route in self._static.get(path, ()):
+            if method in route.methods:
+                return route.path
+        key = (method, path)
+        template = self._cache.get(key)
+        if template is not None:
+            self._cache.move_to_end(key)
+            return template
+        template = _UNMATCHED
+        for route in self._dynamic:
+            if route.matches(scope)[0] == Match.FULL:
+                template = getattr(route, "path", None) or _UNMATCHED
+                break
+        self._cache[key] = template
+        if len(self._cache) > self._maxsize:
+            self._cache.popitem(last=False)
+        return template
 
-        start = time.perf_counter()
+
+class PrometheusMiddleware:
+    """Record latency, count, body sizes and concurrency of HTTP requests.
+
+    The endpoint label is resolved before the request is handled (the
+    in-flight gauge needs it), using a ``RouteTemplateLookup`` built from the
+    app's routes. Once routing is done, the route FastAPI stores in
+    ``scope["route"]`` takes precedence for the remaining metrics.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._lookup: Optional[RouteTemplateLookup] = None
+
+    def _endpoint_label(self, scope: Scope) -> str:
+        app = scope.get("app")
+        routes = getattr(app, "routes", None)
+        if routes is None:
+            return _UNMATCHED
+        if self._lookup is None or self._lookup.is_stale(routes):
+            self._lookup = RouteTemplateLookup(routes)
+        return self._lookup.lookup(scope)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in _EXCLUDED_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        endpoint = self._endpoint_label(scope)
         status = 500
-        try:
-            response = await call_next(request)
-            status = response.status_code
-            return response
-        finally:
-            elapsed = time.perf_counter() - start
-            labels = (request.method, _endpoint_label(request), str(status))
-            HTTP_REQUEST_DURATION.labels(*labels).observe(elapsed)
-            HTTP_REQUEST_TOTAL.labels(*labels).inc()
+        request_size = 0
+        response_size = 0
+
+        async def receive_wrapper() -> Message:
+            nonlocal request_size
+            message = await receive()
+            if message["type"] == "http.request":
+                request_size += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message: Message):
+            nonlocal status, response_size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method, endpoint)
+        in_progress.inc()
+        start = time.perf_counter()
+        with track_queries("route", endpoint) as query_stats:
+            try:
+                await self.app(scope, receive_wrapper, send_wrapper)
+            finally:
+                elapsed = time.perf_counter() - start
+                in_progress.dec()
+                route_path = getattr(scope.get("route"), "path", None)
+                if route_path:
+                    endpoint = route_path
+                query_stats.name = endpoint
+                labels = (method, endpoint, str(status))
+                HTTP_REQUEST_DURATION.labels(*labels).observe(elapsed)
+                HTTP_REQUEST_TOTAL.labels(*labels).inc()
+                HTTP_REQUEST_SIZE.labels(method, endpoint).observe(request_size)
+                HTTP_RESPONSE_SIZE.labels(*labels).observe(response_size)
 
 
 def track_time(name: str):
@@ -1,22 +1,25 @@
 import collections
 import datetime
+import gzip
 import hashlib
 import json
 import logging
+import lzma
 import re
 import typing
 import urllib.parse
+from xml.etree import ElementTree
 
 import aiohttp
 import gi
 import redis.asyncio as aioredis
-import requests
 import yaml
 from pydantic import BaseModel
 
 gi.require_version("Modulemd", "2.0")
 from gi.repository import Modulemd
 
+from alws.config import settings
 from alws.scripts.git_cacher.git_cacher import Config as GitCacherConfig
 from alws.scripts.git_cacher.git_cacher import load_redis_cache
 
@@ -52,31 +55,110 @@ async def get_modified_refs_list(
     return package_list
 
 
-def get_modules_yaml_from_repo(repo_name: str):
-    base_url = "https://build.almalinux.org/pulp/content/prod/"
-    repo_url = urllib.parse.urljoin(base_url, f"{repo_name}/repodata/")
-    response = requests.get(repo_url)
-    try:
-        response.raise_for_status()
-    except Exception as exc:
-        raise (exc)
-    template_href = next(
-        (
-            line.strip()
-            for line in response.text.splitlines()
-            if line and "modules" in line
-        ),
-        None,
-    )
-    if not template_href:
-        return
-    template_href = re.search(
-        r'href="(.+-modules.yaml)"',
-        template_href,
-    ).group(1)
-    response = requests.get(urllib.parse.urljoin(repo_url, template_href))
-    response.raise_for_status()
-    return response.text
+REPOMD_NAMESPACES = {"repo": "http://linux.duke.edu/metadata/repo"}
+PRODUCTION_REPOS_BASE_URL = "https://build.almalinux.org/pulp/content/prod/"
+
+
+def parse_repomd_modules_record(
+    repomd_xml: str,
+) -> typing.Optional[typing.Tuple[str, str]]:
+    """Returns location href and checksum of modules.yaml from repomd.xml."""
+    root = ElementTree.fromstring(repomd_xml)
+    for data in root.findall("repo:data", REPOMD_NAMESPACES):
+        if data.get("type") != "modules":
+            continue
+        location = data.find("repo:location", REPOMD_NAMESPACES)
+        checksum = data.find("repo:checksum", REPOMD_NAMESPACES)
+        if location is None or checksum is None:
+            return None
+        return location.get("href"), checksum.text.strip()
+    return None
+
+
+class RepoModulesYaml:
+    def __init__(self, template: str):
+        self.template = template
+        self._index = None
+
+    @property
+    def index(self) -> "IndexWrapper":
+        # Parsed index is shared between callers, use copy() to modify it
+        if self._index is None:
+            self._index = IndexWrapper.from_template(self.template)
+        return self._index
+
+
+class _ModulesYamlCache:
+    def __init__(self, maxsize: int):
+        self._maxsize = maxsize
+        self._entries: "collections.OrderedDict[str, RepoModulesYaml]" = (
+            collections.OrderedDict()
+        )
+
+    def get(self, checksum: str) -> typing.Optional[RepoModulesYaml]:
+        entry = self._entries.get(checksum)
+        if entry is not None:
+            self._entries.move_to_end(checksum)
+        return entry
+
+    def set(self, checksum: str, entry: RepoModulesYaml):
+        self._entries[checksum] = entry
+        self._entries.move_to_end(checksum)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+modules_yaml_cache = _ModulesYamlCache(settings.modules_yaml_cache_size)
+
+
+def _decompress_modules_yaml(href: str, content: bytes) -> str:
+    if href.endswith(".gz"):
+        content = gzip.decompress(content)
+    elif href.endswith(".xz"):
+        content = lzma.decompress(content)
+    return content.decode()
+
+
+async def fetch_repo_modules_yaml(
+    repo_url: str,
+    auth: typing.Optional[aiohttp.BasicAuth] = None,
+) -> typing.Optional[RepoModulesYaml]:
+    """
+    Fetches modules.yaml of the repository, repomd.xml is requested on
+    every call while modules.yaml is downloaded only if its checksum
+    isn't cached yet.
+    """
+    if not repo_url.endswith("/"):
+        repo_url += "/"
+    async with aiohttp.ClientSession(
+        auth=auth, raise_for_status=True
+    ) as session:
+        repomd_url = urllib.parse.urljoin(repo_url, "repodata/repomd.xml")
+        async with session.get(repomd_url) as response:
+            repomd_xml = await response.text()
+        record = parse_repomd_modules_record(repomd_xml)
+        if not record:
+            return None
+        href, checksum = record
+        entry = modules_yaml_cache.get(checksum)
+        if entry is not None:
+            return entry
+        modules_url = urllib.parse.urljoin(repo_url, href)
+        async with session.get(modules_url) as response:
+            content = await response.read()
+    entry = RepoModulesYaml(_decompress_modules_yaml(href, content))
+    modules_yaml_cache.set(checksum, entry)
+    return entry
+
+
+async def get_modules_yaml_from_repo(
+    repo_name: str,
+) -> typing.Optional[RepoModulesYaml]:
+    repo_url = urllib.parse.urljoin(PRODUCTION_REPOS_BASE_URL, f"{repo_name}/")
+    return await fetch_repo_modules_yaml(repo_url)
 
 
 class RpmArtifact(BaseModel):
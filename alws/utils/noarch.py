@@ -1,5 +1,4 @@
 import asyncio
-import copy
 import logging
 import typing
 
@@ -7,6 +6,7 @@ import sqlalchemy
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from alws import models
 from alws.constants import BuildTaskStatus
@@ -17,6 +17,9 @@ __all__ = [
     'save_noarch_packages',
 ]
 
+# Rows per UPDATE, keeps the statement below the asyncpg parameters limit
+NOARCH_UPDATE_BATCH_SIZE = 5000
+
 
 async def get_noarch_packages(
     db: AsyncSession, build_task_ids: typing.List[int]
@@ -44,11 +47,59 @@ async def get_noarch_packages(
     return noarch_packages, debug_noarch_packages
 
 
+def _get_noarch_repos(
+    build_task: models.BuildTask,
+) -> typing.Dict[typing.Tuple[str, bool], str]:
+    return {
+        (repo.arch, bool(repo.debug)): repo.pulp_href
+        for repo in build_task.build.repos
+        if repo.arch != 'src'
+        and repo.type == 'rpm'
+        and repo.platform_id == build_task.platform_id
+    }
+
+
+async def _replace_artifacts_hrefs(
+    db: AsyncSession,
+    replacements: typing.List[
+        typing.Tuple[models.BuildTaskArtifact, str, typing.Optional[str]]
+    ],
+):
+    for start in range(0, len(replacements), NOARCH_UPDATE_BATCH_SIZE):
+        batch = replacements[start : start + NOARCH_UPDATE_BATCH_SIZE]
+        values = sqlalchemy.values(
+            sqlalchemy.column('id', sqlalchemy.Integer),
+            sqlalchemy.column('href', sqlalchemy.Text),
+            sqlalchemy.column('cas_hash', sqlalchemy.Text),
+            name='noarch_replacements',
+        ).data([
+            (artifact.id, href, cas_hash) for artifact, href, cas_hash in batch
+        ])
+        await db.execute(
+            sqlalchemy.update(models.BuildTaskArtifact)
+            .where(models.BuildTaskArtifact.id == values.c.id)
+            .values(href=values.c.href, cas_hash=values.c.cas_hash)
+            .execution_options(synchronize_session=False)
+        )
+    # keep already loaded artifacts in sync without marking them dirty
+    for artifact, href, cas_hash in replacements:
+        set_committed_value(artifact, 'href', href)
+        set_committed_value(artifact, 'cas_hash', cas_hash)
+
+
 async def save_noarch_packages(
     db: AsyncSession,
     pulp_client: PulpClient,
     build_task: models.BuildTask,
+    stats: typing.Optional[dict] = None,
 ):
+    """Propagate noarch packages of a finished build index to every arch.
+
+    Runs once all sibling tasks are finished: the canonical noarch set is
+    computed once, the artifacts of every arch pointing to other hrefs are
+    replaced in bulk, missing artifacts are created and each build repo
+    gets a single modification. Counters are stored in ``stats`` if given.
+    """
     if build_task.arch == 'src':
         return []
 
@@ -85,10 +136,15 @@ async def save_noarch_packages(
         logging.info("Noarch packages doesn't found")
         return new_binary_rpms
 
+    canonical_packages = {**noarch_packages, **debug_noarch_packages}
+    hrefs_to_add = {
+        False: [href for href, _ in noarch_packages.values()],
+        True: [href for href, _ in debug_noarch_packages.values()],
+    }
+    noarch_repos = _get_noarch_repos(build_task)
     repos_to_update = {}
+    replacements = []
     new_noarch_artifacts = []
-    hrefs_to_add = [href for href, _ in noarch_packages.values()]
-    debug_hrefs_to_add = [href for href, _ in debug_noarch_packages.values()]
 
     for task in build_tasks:
         if (
@@ -96,28 +152,25 @@ async def save_noarch_packages(
             or task.arch == 'src'
         ):
             continue
-        noarch = copy.deepcopy(noarch_packages)
-        debug_noarch = copy.deepcopy(debug_noarch_packages)
-        hrefs_to_delete = []
-        debug_hrefs_to_delete = []
+        hrefs_to_delete = {False: [], True: []}
+        existing_names = set()
 
         # replace hrefs for existing artifacts in database
         # and create new artifacts if they doesn't exist
         for artifact in task.artifacts:
-            if artifact.name in noarch:
-                hrefs_to_delete.append(artifact.href)
-                href, cas_hash = noarch.pop(artifact.name)
-                artifact.href = href
-                artifact.cas_hash = cas_hash
-            if artifact.name in debug_noarch:
-                debug_hrefs_to_delete.append(artifact.href)
-                href, cas_hash = debug_noarch.pop(artifact.name)
-                artifact.href = href
-                artifact.cas_hash = cas_hash
-
-        artifacts_to_create = {**noarch, **debug_noarch}
-        for name, values in artifacts_to_create.items():
+            values = canonical_packages.get(artifact.name)
+            if values is None or artifact.name in existing_names:
+                continue
+            existing_names.add(artifact.name)
             href, cas_hash = values
+            if artifact.href == href:
+                continue
+            is_debug = artifact.name in debug_noarch_packages
+            hrefs_to_delete[is_debug].append(artifact.href)
+            replacements.append((artifact, href, cas_hash))
+
+        for name in canonical_packages.keys() - existing_names:
+            href, cas_hash = canonical_packages[name]
             artifact = models.BuildTaskArtifact(
                 build_task_id=task.id,
                 name=name,
@@ -132,38 +185,35 @@ async def save_noarch_packages(
                 binary_rpm.build = build_task.build
                 new_binary_rpms.append(binary_rpm)
 
-        for repo in build_task.build.repos:
-            if (
-                repo.arch == 'src'
-                or repo.type != 'rpm'
-                or repo.arch != task.arch
-                or repo.platform_id != task.platform_id
-            ):
+        for is_debug in (False, True):
+            repo_href = noarch_repos.get((task.arch, is_debug))
+            if repo_href is None:
                 continue
-            repo_href = repo.pulp_href
-            add_content = hrefs_to_add
-            remove_content = hrefs_to_delete
-            if repo.debug:
-                add_content = debug_hrefs_to_add
-                remove_content = debug_hrefs_to_delete
             repos_to_update[repo_href] = {
-                'add': add_content,
-                'remove': remove_content,
+                'add': hrefs_to_add[is_debug],
+                'remove': hrefs_to_delete[is_debug],
             }
 
+    if replacements:
+        await _replace_artifacts_hrefs(db, replacements)
     db.add_all(new_noarch_artifacts)
     await db.flush()
 
-    await asyncio.gather(
-        *(
-            pulp_client.modify_repository(
-                repo_href,
-                add=content_dict['add'],
-                remove=content_dict['remove'],
-            )
-            for repo_href, content_dict in repos_to_update.items()
+    await asyncio.gather(*(
+        pulp_client.modify_repository(
+            repo_href,
+            add=content_dict['add'],
+            remove=content_dict['remove'],
         )
-    )
+        for repo_href, content_dict in repos_to_update.items()
+    ))
+    if stats is not None:
+        stats.update({
+            'noarch_packages': len(canonical_packages),
+            'replaced_artifacts': len(replacements),
+            'created_artifacts': len(new_noarch_artifacts),
+            'modified_repos': len(repos_to_update),
+        })
 
     logging.info("Noarch packages processing is finished")
     return new_binary_rpms
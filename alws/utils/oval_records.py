@@ -0,0 +1,92 @@
+"""
+Compact errata records used for OVAL composition.
+
+OVAL XML of a platform is built from tens of thousands of records. Keeping
+ORM objects (with their state, unused JSON columns and relationships) for
+all of them during composition costs gigabytes, so records are converted
+into these slotted objects holding only what the OVAL needs.
+"""
+
+from typing import Dict, Optional, Tuple
+
+__all__ = [
+    'OVAL_RECORD_COLUMNS',
+    'OVAL_RECORDS_CHUNK_SIZE',
+    'OvalCve',
+    'OvalRecord',
+    'OvalReference',
+]
+
+# Number of records fetched from the database at once
+OVAL_RECORDS_CHUNK_SIZE = 500
+# NewErrataRecord columns used for the OVAL composition
+OVAL_RECORD_COLUMNS = (
+    'id',
+    'platform_id',
+    'definition_id',
+    'definition_version',
+    'definition_class',
+    'oval_title',
+    'description',
+    'original_description',
+    'contact_mail',
+    'severity',
+    'rights',
+    'issued_date',
+    'updated_date',
+    'affected_cpe',
+    'criteria',
+    'tests',
+    'objects',
+    'states',
+    'variables',
+)
+
+
+class OvalCve:
+    __slots__ = ('id', 'public', 'impact', 'cwe', 'cvss3')
+
+    def __init__(self, cve):
+        for attr in self.__slots__:
+            setattr(self, attr, getattr(cve, attr))
+
+
+class OvalReference:
+    __slots__ = ('ref_id', 'ref_type', 'href', 'title', 'cve')
+
+    def __init__(self, reference, cve: Optional[OvalCve]):
+        self.ref_id = reference.ref_id
+        self.ref_type = reference.ref_type
+        self.href = reference.href
+        self.title = reference.title
+        self.cve = cve
+
+
+class OvalRecord:
+    __slots__ = OVAL_RECORD_COLUMNS + ('references',)
+
+    references: Tuple[OvalReference, ...]
+
+    @classmethod
+    def from_model(
+        cls,
+        record,
+        cves: Dict[str, OvalCve],
+    ) -> 'OvalRecord':
+        """
+        Converts NewErrataRecord, CVEs shared between records are
+        converted once and kept in cves.
+        """
+        oval_record = cls()
+        for attr in OVAL_RECORD_COLUMNS:
+            setattr(oval_record, attr, getattr(record, attr))
+        references = []
+        for reference in record.references:
+            cve = None
+            if reference.cve:
+                cve = cves.get(reference.cve.id)
+                if cve is None:
+                    cve = cves[reference.cve.id] = OvalCve(reference.cve)
+            references.append(OvalReference(reference, cve))
+        oval_record.references = tuple(references)
+        return oval_record
@@ -0,0 +1,160 @@
+"""
+Registry of OVAL objects, states and tests of released errata records.
+
+The registry of each platform is kept in Redis as hashes of items and
+their content hashes indexed by id. It is built from OVAL data already
+stored in released records and then updated incrementally once released
+records are committed, so it never requires generating the whole OVAL XML
+and lookups by id don't scan lists. The registry is rebuilt from the
+database after oval_registry_ttl seconds or once invalidated.
+"""
+
+import hashlib
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from alws.config import settings
+
+__all__ = ['OVAL_KINDS', 'OvalRegistry']
+
+OVAL_KINDS = ('objects', 'states', 'tests')
+KEY_PREFIX = 'albs-oval-registry'
+
+
+def get_oval_item_hash(item: dict) -> str:
+    content = {key: value for key, value in item.items() if key != 'id'}
+    return hashlib.sha256(
+        json.dumps(content, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+class OvalRegistry:
+    def __init__(
+        self,
+        platform_name: str,
+        redis: Optional[aioredis.Redis] = None,
+        ttl: Optional[int] = None,
+    ):
+        self.platform_name = platform_name
+        self.redis = redis or aioredis.from_url(settings.redis_url)
+        self.ttl = settings.oval_registry_ttl if ttl is None else ttl
+        self._hashes: Dict[str, Dict[str, str]] = {
+            kind: {} for kind in OVAL_KINDS
+        }
+        # Lists passed to the OVAL data generator, kept alongside
+        # the indexes to avoid rebuilding them for every record
+        self._lists: Dict[str, List[dict]] = {kind: [] for kind in OVAL_KINDS}
+        # Items added locally and not stored in Redis yet
+        self._pending: Dict[str, List[Tuple[dict, str]]] = {
+            kind: [] for kind in OVAL_KINDS
+        }
+
+    def _get_key(self, kind: str, suffix: str = 'items') -> str:
+        return f'{KEY_PREFIX}:{self.platform_name}:{kind}:{suffix}'
+
+    @property
+    def _ready_key(self) -> str:
+        return f'{KEY_PREFIX}:{self.platform_name}:ready'
+
+    @property
+    def objects(self) -> List[dict]:
+        return self._lists['objects']
+
+    @property
+    def states(self) -> List[dict]:
+        return self._lists['states']
+
+    @property
+    def tests(self) -> List[dict]:
+        return self._lists['tests']
+
+    def get_ids(self, kind: str) -> List[str]:
+        return list(self._hashes[kind])
+
+    def _add_local(self, kind: str, item: dict, item_hash: str) -> bool:
+        item_id = item['id']
+        known_hash = self._hashes[kind].get(item_id)
+        if known_hash is not None:
+            if known_hash != item_hash:
+                logging.warning(
+                    'OVAL %s %s of %s has different content, keeping '
+                    'the registered one',
+                    kind[:-1],
+                    item_id,
+                    self.platform_name,
+                )
+            return False
+        self._hashes[kind][item_id] = item_hash
+        self._lists[kind].append(item)
+        return True
+
+    async def load(self) -> bool:
+        """Loads the registry from Redis, returns False if it's absent."""
+        if not await self.redis.exists(self._ready_key):
+            return False
+        for kind in OVAL_KINDS:
+            items = await self.redis.hgetall(self._get_key(kind))
+            hashes = await self.redis.hgetall(self._get_key(kind, 'hashes'))
+            for item_id, item in items.items():
+                item_hash = hashes.get(item_id)
+                self._add_local(
+                    kind,
+                    json.loads(item),
+                    item_hash.decode() if item_hash else '',
+                )
+        return True
+
+    def add(
+        self,
+        objects: Optional[Iterable[dict]] = None,
+        states: Optional[Iterable[dict]] = None,
+        tests: Optional[Iterable[dict]] = None,
+    ):
+        """
+        Registers new items locally, items with known ids are skipped.
+        Items are stored in Redis by save().
+        """
+        for kind, items in zip(OVAL_KINDS, (objects, states, tests)):
+            for item in items or []:
+                item_hash = get_oval_item_hash(item)
+                if self._add_local(kind, item, item_hash):
+                    self._pending[kind].append((item, item_hash))
+
+    async def save(self):
+        """
+        Stores items added since the last save. It should be called only
+        after records the items belong to are committed, so items of
+        failed releases never get into Redis.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for kind, items in self._pending.items():
+                for item, item_hash in items:
+                    pipe.hsetnx(
+                        self._get_key(kind),
+                        item['id'],
+                        json.dumps(item, default=str),
+                    )
+                    pipe.hsetnx(
+                        self._get_key(kind, 'hashes'),
+                        item['id'],
+                        item_hash,
+                    )
+                items.clear()
+            await pipe.execute()
+
+    async def mark_ready(self):
+        await self.redis.set(self._ready_key, 1, ex=self.ttl or None)
+
+    async def invalidate(self):
+        """Drops the stored registry, it's rebuilt on the next release."""
+        await self.redis.delete(
+            self._ready_key,
+            *(
+                self._get_key(kind, suffix)
+                for kind in OVAL_KINDS
+                for suffix in ('items', 'hashes')
+            ),
+        )
@@ -0,0 +1,135 @@
+"""
+Deferred publications of repositories modified by errata releases.
+
+Releases mark modified repositories as dirty in Redis instead of publishing
+them right away, so that every errata actor sees the same set. A repository
+is published once it wasn't modified for ``ERRATA_PUBLICATION_WINDOW``
+seconds: releasing a batch of records, or several releases running at once,
+results in a single publication of each repository. Failed publications
+are retried with doubling delays, at most ``ERRATA_PUBLICATION_MAX_RETRIES``
+times; the repositories stay dirty until the next release.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from alws.config import settings
+from alws.utils.metrics import ERRATA_PUBLICATION_LAG
+from alws.utils.pulp_client import PulpClient
+
+__all__ = [
+    'get_publication_retry_delay',
+    'publish_dirty_repositories',
+    'schedule_repositories_publication',
+]
+
+DIRTY_REPOS_KEY = 'errata_publications:dirty'
+DIRTY_SINCE_KEY = 'errata_publications:dirty_since'
+# Tolerance for clock differences between the hosts marking repositories
+# and the worker publishing them
+CLOCK_SKEW = 1.0
+
+# Atomically takes repositories not modified since the deadline together
+# with the time they became dirty
+_CLAIM_SCRIPT = """
+local hrefs = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local result = {}
+for _, href in ipairs(hrefs) do
+    redis.call('ZREM', KEYS[1], href)
+    table.insert(result, href)
+    table.insert(result, redis.call('HGET', KEYS[2], href) or '')
+    redis.call('HDEL', KEYS[2], href)
+end
+return result
+"""
+
+_redis: Optional[aioredis.Redis] = None
+
+
+def _get_redis() -> aioredis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = aioredis.from_url(settings.redis_url)
+    return _redis
+
+
+async def _mark_dirty(
+    repo_hrefs: Iterable[str],
+    since: Optional[float] = None,
+):
+    now = time.time()
+    async with _get_redis().pipeline(transaction=True) as pipe:
+        for href in repo_hrefs:
+            pipe.zadd(DIRTY_REPOS_KEY, {href: now})
+            pipe.hsetnx(DIRTY_SINCE_KEY, href, since or now)
+        await pipe.execute()
+
+
+async def _claim_ready_repositories() -> List[Tuple[str, Optional[float]]]:
+    deadline = time.time() - settings.errata_publication_window + CLOCK_SKEW
+    result = await _get_redis().eval(
+        _CLAIM_SCRIPT, 2, DIRTY_REPOS_KEY, DIRTY_SINCE_KEY, deadline
+    )
+    claimed = []
+    for href, since in zip(result[::2], result[1::2]):
+        since = since.decode()
+        claimed.append((href.decode(), float(since) if since else None))
+    return claimed
+
+
+async def schedule_repositories_publication(
+    pulp_client: PulpClient,
+    repo_hrefs: Iterable[str],
+):
+    repo_hrefs = set(repo_hrefs)
+    if not repo_hrefs:
+        return
+    if settings.errata_publication_window <= 0:
+        await asyncio.gather(
+            *(pulp_client.create_rpm_publication(href) for href in repo_hrefs)
+        )
+        return
+    await _mark_dirty(repo_hrefs)
+    from alws.dramatiq import publish_errata_repositories
+
+    publish_errata_repositories.send_with_options(
+        delay=settings.errata_publication_window * 1000,
+    )
+
+
+async def publish_dirty_repositories(pulp_client: PulpClient) -> bool:
+    """
+    Publishes repositories whose publication window has passed.
+
+    Repositories failed to publish are marked as dirty again, returns
+    True if there are such repositories.
+    """
+    claimed = await _claim_ready_repositories()
+    results = await asyncio.gather(
+        *(pulp_client.create_rpm_publication(href) for href, _ in claimed),
+        return_exceptions=True,
+    )
+    failed = False
+    for (href, since), result in zip(claimed, results):
+        if isinstance(result, Exception):
+            logging.error('Cannot publish repository %s: %s', href, result)
+            await _mark_dirty([href], since=since)
+            failed = True
+            continue
+        if since is not None:
+            ERRATA_PUBLICATION_LAG.observe(time.time() - since)
+    return failed
+
+
+def get_publication_retry_delay(attempt: int) -> Optional[int]:
+    """
+    Returns the delay in milliseconds before the given retry of failed
+    publications, None once retries are exhausted.
+    """
+    if attempt > settings.errata_publication_max_retries:
+        return None
+    return settings.errata_publication_window * 1000 * 2 ** (attempt - 1)
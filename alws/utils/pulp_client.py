@@ -1,12 +1,16 @@
 import asyncio
+import collections
 import io
 import json
 import logging
 import math
 import os
 import re
+import time
 import typing
 import urllib.parse
+from dataclasses import dataclass, field
+from datetime import datetime
 from typing import (
     Any,
     Dict,
@@ -21,10 +25,86 @@ from fastapi import status
 
 from alws.config import settings
 from alws.constants import UPLOAD_FILE_CHUNK_SIZE
+from alws.errors import PulpTransactionError
+from alws.utils.artifacts_cache import artifacts_cache
 from alws.utils.file_utils import hash_content, hash_file
 from alws.utils.ids import get_random_unique_version
+from alws.utils.metrics import (
+    PULP_REQUEST_DURATION,
+    PULP_REQUEST_ERRORS,
+    PULP_REQUEST_RETRIES,
+    PULP_SEMAPHORE_WAIT,
+    PULP_TASK_DURATION,
+)
+from alws.utils.modularity import RepoModulesYaml, fetch_repo_modules_yaml
 
 PULP_SEMAPHORE = asyncio.Semaphore(20)
+# Checksums per request of the bulk artifacts lookup, keeps the URL short
+ARTIFACTS_LOOKUP_BATCH_SIZE = 100
+# Bounds repo modifications and publications running in Pulp at once,
+# these hold Pulp workers for their whole duration
+PULP_TASKS_SEMAPHORE = asyncio.Semaphore(settings.pulp_max_concurrent_tasks)
+# Pulp hrefs embed UUIDs (and versions numbers), collapse them so that
+# metrics are labelled by endpoint template instead of by object
+PULP_HREF_ID_REGEX = re.compile(
+    r'/(?:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|\d+)'
+    r'(?=/|$)',
+    re.IGNORECASE,
+)
+
+
+def normalize_pulp_endpoint(url: str) -> str:
+    path = urllib.parse.urlsplit(url).path
+    if not path.startswith('/'):
+        path = f'/{path}'
+    return PULP_HREF_ID_REGEX.sub('/{id}', path)
+
+
+def _parse_pulp_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def observe_pulp_task(task: Dict[str, Any], waited: float):
+    task_name = (task.get('name') or 'unknown').rsplit('.', 1)[-1]
+    state = task['state']
+    created = _parse_pulp_timestamp(task.get('pulp_created'))
+    started = _parse_pulp_timestamp(task.get('started_at'))
+    finished = _parse_pulp_timestamp(task.get('finished_at'))
+    if created and started:
+        PULP_TASK_DURATION.labels(task_name, 'queued', state).observe(
+            (started - created).total_seconds()
+        )
+    if started and finished:
+        PULP_TASK_DURATION.labels(task_name, 'running', state).observe(
+            (finished - started).total_seconds()
+        )
+    PULP_TASK_DURATION.labels(task_name, 'waited', state).observe(waited)
+
+
+async def _count_retry_attempt(session, trace_config_ctx, params):
+    request_ctx = trace_config_ctx.trace_request_ctx or {}
+    if request_ctx.get('current_attempt', 1) > 1:
+        PULP_REQUEST_RETRIES.labels(
+            params.method, normalize_pulp_endpoint(str(params.url))
+        ).inc()
+
+
+def _get_retry_trace_config() -> aiohttp.TraceConfig:
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_count_retry_attempt)
+    return trace_config
+
+
+@dataclass
+class PulpTransactionReport:
+    # repository href -> created repository version href
+    modified: Dict[str, str] = field(default_factory=dict)
+    published: List[str] = field(default_factory=list)
+    # repository href -> error
+    failed: Dict[str, str] = field(default_factory=dict)
+    rolled_back: List[str] = field(default_factory=list)
 
 
 class PulpClient:
@@ -41,6 +121,7 @@ class PulpClient:
         self._password = password
         self._auth = aiohttp.BasicAuth(self._username, self._password)
         self._current_transaction = None
+        self._publish_on_commit = False
         self._retry_options = ExponentialRetry(
             exceptions={asyncio.TimeoutError, ClientResponseError}
         )
@@ -98,6 +179,35 @@ class PulpClient:
             name, auto_publish=True, create_publication=True
         )
 
+    async def rename_build_rpm_repo(
+        self,
+        repo_href: str,
+        distro_href: str,
+        name: str,
+        base_path_start: str = "builds",
+    ) -> (str, str):
+        """
+        Gives a pre-created (pooled) build repository and its distribution
+        the names create_build_rpm_repo would have used for a new one
+        """
+        repo_task, distro_task = await asyncio.gather(
+            self.request("PATCH", repo_href, json={"name": name}),
+            self.request(
+                "PATCH",
+                distro_href,
+                json={
+                    "name": f"{name}-distro",
+                    "base_path": f"{base_path_start}/{name}",
+                },
+            ),
+        )
+        await asyncio.gather(
+            self.wait_for_task(repo_task["task"]),
+            self.wait_for_task(distro_task["task"]),
+        )
+        distro = await self.get_distro(distro_href)
+        return distro["base_url"], repo_href
+
     async def get_repo_modules(self, repo_href: str) -> typing.List[str]:
         version = await self.get_by_href(repo_href)
         content = await self.get_latest_repo_present_content(
@@ -115,14 +225,7 @@ class PulpClient:
         self, params: dict
     ) -> typing.List[typing.Dict[str, typing.Any]]:
         endpoint = "pulp/api/v3/repositories/rpm/rpm/"
-        response = await self.request("GET", endpoint, params=params)
-        if response["count"] == 0:
-            return []
-        if response["count"] > 100:
-            new_params = params.copy()
-            new_params["limit"] = response["count"] + 1
-            response = await self.request("GET", endpoint, params=params)
-        return response["results"]
+        return await self.__get_entities(endpoint, **params)
 
     async def get_rpm_repository_by_params(
         self, params: dict
@@ -335,13 +438,52 @@ class PulpClient:
     async def check_if_artifact_exists(
         self, sha256: str
     ) -> typing.Optional[str]:
+        reference = await artifacts_cache.get(sha256)
+        if reference:
+            return reference
         endpoint = "pulp/api/v3/artifacts/"
         payload = {"sha256": sha256}
         response = await self.request("GET", endpoint, params=payload)
         if response["count"]:
-            return response["results"][0]["pulp_href"]
+            reference = response["results"][0]["pulp_href"]
+            await artifacts_cache.set(sha256, reference)
+            return reference
         return None
 
+    async def get_existing_artifacts(
+        self, checksums: typing.Iterable[str]
+    ) -> typing.Dict[str, str]:
+        """Map the sha256 checksums already present in Pulp to artifact hrefs.
+
+        Checksums unknown to the cache are resolved in batches
+        of ARTIFACTS_LOOKUP_BATCH_SIZE with a single request each.
+        """
+        checksums = set(checksums)
+        existing = await artifacts_cache.get_many(checksums)
+        missing = sorted(checksums - existing.keys())
+        endpoint = "pulp/api/v3/artifacts/"
+        found = {}
+        for start in range(0, len(missing), ARTIFACTS_LOOKUP_BATCH_SIZE):
+            batch = missing[start : start + ARTIFACTS_LOOKUP_BATCH_SIZE]
+            response = await self.request(
+                "GET",
+                endpoint,
+                params={
+                    "sha256__in": ",".join(batch),
+                    "fields": "pulp_href,sha256",
+                    "limit": len(batch),
+                },
+            )
+            requested = set(batch)
+            for artifact in response["results"]:
+                # Don't trust the filter to be applied, unrelated
+                # artifacts would poison the cache
+                if artifact["sha256"] in requested:
+                    found[artifact["sha256"]] = artifact["pulp_href"]
+        await artifacts_cache.set_many(found)
+        existing.update(found)
+        return existing
+
     async def upload_comps(self, data: dict) -> typing.List[str]:
         """
         endpoint will modify and publish repository after adding content units
@@ -440,26 +582,32 @@ class PulpClient:
             reference = await self._upload_local_file(file_path, sha256)
         else:
             raise NotImplementedError("Other upload flows are not supported")
+        if reference:
+            await artifacts_cache.set(sha256, reference)
 
         return reference, sha256
 
+    async def fetch_repo_modules_yaml(
+        self,
+        url: str,
+    ) -> typing.Optional[RepoModulesYaml]:
+        # Entries are cached and shared, callers modifying the parsed
+        # index should work on its copy()
+        return await fetch_repo_modules_yaml(url, auth=self._auth)
+
     async def get_repo_modules_yaml(self, url: str):
-        repomd_url = urllib.parse.urljoin(url, "repodata/repomd.xml")
-        async with aiohttp.ClientSession(auth=self._auth) as session:
-            async with session.get(repomd_url) as response:
-                repomd_xml = await response.text()
-                response.raise_for_status()
-            res = re.search(r"repodata/[\w\d]+-modules.yaml", repomd_xml)
-            if not res:
-                return
-            modules_path = res.group()
-            modules_url = urllib.parse.urljoin(url, modules_path)
-            async with session.get(modules_url) as response:
-                modules_yaml = await response.text()
-                response.raise_for_status()
-                return modules_yaml
+        modules_yaml = await self.fetch_repo_modules_yaml(url)
+        if modules_yaml is None:
+            return
+        return modules_yaml.template
+
+    def begin(self, publish: bool = False):
+        """Start a transaction: repository modifications are deferred.
 
-    def begin(self):
+        Modifications of the same repository are coalesced and applied on
+        commit, repositories are published afterwards if ``publish`` is set.
+        """
+        self._publish_on_commit = publish
         return self
 
     async def __aenter__(self):
@@ -468,25 +616,95 @@ class PulpClient:
         self._current_transaction = {}
 
     async def __aexit__(self, exc_type, exc_value, exc_traceback):
-        if exc_type is not None:
-            await self.rollback()
-        else:
-            await self.commit()
-        self._current_transaction = None
+        try:
+            if exc_type is not None:
+                await self.rollback()
+            else:
+                await self.commit()
+        finally:
+            self._current_transaction = None
+            self._publish_on_commit = False
 
     async def rollback(self):
-        # TODO: write description here, what should be done in rollback in real world
-        pass
+        # Nothing is sent to Pulp before commit, pending changes are dropped
+        self._current_transaction = {}
 
-    async def commit(self):
-        tasks = []
-        for repo, payload in self._current_transaction.items():
-            tasks.append(
-                self._modify_repository(
-                    repo, list(payload["add"]), list(payload["remove"])
-                )
+    async def _commit_repository(
+        self,
+        repo_href: str,
+        add: List[str],
+        remove: List[str],
+        report: PulpTransactionReport,
+        base_versions: Dict[str, str],
+    ):
+        try:
+            repo = await self.request("GET", repo_href)
+            base_versions[repo_href] = repo["latest_version_href"]
+            result = await self._modify_repository(repo_href, add, remove)
+            report.modified[repo_href] = next(
+                iter(result.get("created_resources") or []),
+                base_versions[repo_href],
             )
-        await asyncio.gather(*tasks)
+            if self._publish_on_commit:
+                await self.create_rpm_publication(repo_href)
+                report.published.append(repo_href)
+        except Exception as exc:
+            logging.exception("Cannot commit changes of %s", repo_href)
+            report.failed[repo_href] = str(exc)
+
+    async def revert_repository(self, repo_href: str, base_version: str):
+        # New repository version gets exactly the content of base_version
+        async with PULP_TASKS_SEMAPHORE:
+            task = await self.request(
+                "POST",
+                urllib.parse.urljoin(repo_href, "modify/"),
+                json={"base_version": base_version},
+            )
+            await self.wait_for_task(task["task"])
+
+    async def _revert_repository(
+        self,
+        repo_href: str,
+        base_version: str,
+        report: PulpTransactionReport,
+    ):
+        try:
+            await self.revert_repository(repo_href, base_version)
+            report.rolled_back.append(repo_href)
+        except Exception:
+            logging.exception("Cannot roll back %s", repo_href)
+
+    async def commit(self) -> PulpTransactionReport:
+        """Apply the coalesced modifications of the transaction.
+
+        Repositories are modified concurrently, bounded by
+        PULP_MAX_CONCURRENT_TASKS for the whole process. If any repository
+        fails, the already modified ones are restored to their previous
+        versions and PulpTransactionError is raised with the report.
+        """
+        report = PulpTransactionReport()
+        base_versions = {}
+        await asyncio.gather(*(
+            self._commit_repository(
+                repo,
+                list(payload["add"]),
+                list(payload["remove"]),
+                report,
+                base_versions,
+            )
+            for repo, payload in self._current_transaction.items()
+            if payload["add"] or payload["remove"]
+        ))
+        if not report.failed:
+            return report
+        await asyncio.gather(*(
+            self._revert_repository(repo, base_versions[repo], report)
+            for repo in report.modified
+        ))
+        raise PulpTransactionError(
+            f"Cannot modify repositories: {', '.join(report.failed)}",
+            report,
+        )
 
     async def _update_transaction(
         self, repo_to: str, add: List[str] = None, remove: List[str] = None
@@ -496,8 +714,16 @@ class PulpClient:
                 "add": set(),
                 "remove": set(),
             }
-        self._current_transaction[repo_to]["add"].update(add or [])
-        self._current_transaction[repo_to]["remove"].update(remove or [])
+        payload = self._current_transaction[repo_to]
+        # Pulp removes content before adding it, so the latest modification
+        # of a content unit wins: removal cancels its pending addition and
+        # vice versa, the same as if modifications were applied one by one
+        for href in remove or []:
+            payload["add"].discard(href)
+            payload["remove"].add(href)
+        for href in add or []:
+            payload["remove"].discard(href)
+            payload["add"].add(href)
 
     async def _modify_repository(
         self, repo_to: str, add: List[str] = None, remove: List[str] = None
@@ -508,14 +734,21 @@ class PulpClient:
             payload["add_content_units"] = add
         if remove:
             payload["remove_content_units"] = remove
-        task = await self.request("POST", endpoint, json=payload)
-        response = await self.wait_for_task(task["task"])
+        async with PULP_TASKS_SEMAPHORE:
+            task = await self.request("POST", endpoint, json=payload)
+            response = await self.wait_for_task(task["task"])
         return response
 
     async def modify_repository(
-        self, repo_to: str, add: List[str] = None, remove: List[str] = None
+        self,
+        repo_to: str,
+        add: List[str] = None,
+        remove: List[str] = None,
+        immediate: bool = False,
     ) -> Dict[str, Any]:
-        if self._current_transaction:
+        # Immediate modifications bypass the transaction and are kept
+        # even if it's rolled back
+        if self._current_transaction is not None and not immediate:
             return await self._update_transaction(repo_to, add, remove)
         return await self._modify_repository(repo_to, add, remove)
 
@@ -531,8 +764,9 @@ class PulpClient:
         # Creates repodata for repositories in some way
         endpoint = "pulp/api/v3/publications/rpm/rpm/"
         payload = {"repository": repository}
-        task = await self.request("POST", endpoint, json=payload)
-        await self.wait_for_task(task["task"], sleep_time=sleep_time)
+        async with PULP_TASKS_SEMAPHORE:
+            task = await self.request("POST", endpoint, json=payload)
+            await self.wait_for_task(task["task"], sleep_time=sleep_time)
 
     async def create_file(
         self,
@@ -671,6 +905,71 @@ class PulpClient:
             exclude_fields=exclude_fields,
         )
 
+    async def iter_pages(
+        self,
+        endpoint: str,
+        params: typing.Optional[dict] = None,
+    ) -> typing.AsyncIterator[typing.List[typing.Dict[str, typing.Any]]]:
+        """Yield the result pages of a Pulp list endpoint in order.
+
+        The total count is read from the first page, the remaining pages
+        are requested by offset, up to PULP_PAGINATION_CONCURRENCY at once.
+        """
+        params = dict(params or {})
+        response = await self.request("GET", endpoint, params=params)
+        results = response["results"]
+        yield results
+        count = response["count"]
+        # Pulp can cap the requested limit, follow the served page size
+        page_size = len(results)
+        if not page_size or page_size >= count:
+            return
+        start_offset = params.get("offset", 0) + len(results)
+        offsets = iter(range(start_offset, count, page_size))
+
+        def fetch_next_page() -> typing.Optional[asyncio.Task]:
+            offset = next(offsets, None)
+            if offset is None:
+                return None
+            page_params = {**params, "limit": page_size, "offset": offset}
+            return asyncio.ensure_future(
+                self.request("GET", endpoint, params=page_params)
+            )
+
+        pending = collections.deque()
+        for _ in range(settings.pulp_pagination_concurrency):
+            task = fetch_next_page()
+            if task is None:
+                break
+            pending.append(task)
+        try:
+            while pending:
+                response = await pending.popleft()
+                task = fetch_next_page()
+                if task is not None:
+                    pending.append(task)
+                yield response["results"]
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def iter_entities(
+        self,
+        endpoint,
+        include_fields: typing.Optional[typing.List[str]] = None,
+        exclude_fields: typing.Optional[typing.List[str]] = None,
+        **search_params,
+    ) -> typing.AsyncIterator[typing.Dict[str, typing.Any]]:
+        params = {}
+        if include_fields:
+            params["fields"] = ','.join(include_fields)
+        if exclude_fields:
+            params["exclude_fields"] = ','.join(exclude_fields)
+        params.update(search_params)
+        async for page in self.iter_pages(endpoint, params):
+            for entity in page:
+                yield entity
+
     async def __get_entities(
         self,
         endpoint,
@@ -678,24 +977,15 @@ class PulpClient:
         exclude_fields: typing.Optional[typing.List[str]] = None,
         **search_params,
     ) -> typing.List[typing.Dict[str, typing.Any]]:
-        all_entities = []
-
-        result = await self.__get_content_info(
-            endpoint,
-            include_fields=include_fields,
-            exclude_fields=exclude_fields,
-            **search_params,
-        )
-        if result["count"] == 0:
-            return []
-        all_entities.extend(result["results"])
-        while result.get("next"):
-            new_url = result.get("next")
-            parsed_url = urllib.parse.urlsplit(new_url)
-            new_url = parsed_url.path + "?" + parsed_url.query
-            result = await self.request("GET", new_url)
-            all_entities.extend(result["results"])
-        return all_entities
+        return [
+            entity
+            async for entity in self.iter_entities(
+                endpoint,
+                include_fields=include_fields,
+                exclude_fields=exclude_fields,
+                **search_params,
+            )
+        ]
 
     async def get_rpm_packages(
         self,
@@ -902,16 +1192,10 @@ class PulpClient:
             payload["fields"] = fields
         if search_params:
             payload.update(search_params)
-        response = await self.request(
-            "get", "pulp/api/v3/content/rpm/packages/", params=payload
-        )
-        for pkg in response["results"]:
-            yield pkg
-        while response.get("next"):
-            parsed_next = urllib.parse.urlparse(response.get("next"))
-            next_path = parsed_next.path + "?" + parsed_next.query
-            response = await self.request("get", next_path)
-            for pkg in response["results"]:
+        async for page in self.iter_pages(
+            "pulp/api/v3/content/rpm/packages/", payload
+        ):
+            for pkg in page:
                 yield pkg
 
     async def get_rpm_publications(
@@ -947,10 +1231,12 @@ class PulpClient:
         return entity_href, info["sha256"], artifact
 
     async def wait_for_task(self, task_href: str, sleep_time: float = 1.0):
+        start = time.perf_counter()
         task = await self.request("GET", task_href)
         while task["state"] not in ("failed", "completed"):
             await asyncio.sleep(sleep_time)
             task = await self.request("GET", task_href)
+        observe_pulp_task(task, time.perf_counter() - start)
         if task["state"] == "failed":
             error = task.get("error")
             error_msg = ""
@@ -1006,39 +1292,56 @@ class PulpClient:
             full_url = endpoint
         else:
             full_url = urllib.parse.urljoin(self._host, endpoint)
+        method_label = method.upper()
+        endpoint_label = normalize_pulp_endpoint(full_url)
+        wait_start = time.perf_counter()
         async with self.semaphore or PULP_SEMAPHORE:
-            if method.lower() == "get":
-                async with RetryClient(
-                    retry_options=self._retry_options
-                ) as client:
-                    response = await client.get(
+            PULP_SEMAPHORE_WAIT.observe(time.perf_counter() - wait_start)
+            start = time.perf_counter()
+            status_label = "error"
+            try:
+                if method.lower() == "get":
+                    async with RetryClient(
+                        retry_options=self._retry_options,
+                        trace_configs=[_get_retry_trace_config()],
+                    ) as client:
+                        response = await client.get(
+                            full_url,
+                            params=params,
+                            json=json,
+                            data=data,
+                            headers=headers,
+                            auth=self._auth,
+                        )
+                        status_label = str(response.status)
+                        if raw:
+                            return {"result": await response.text()}
+                        response_json = await response.json()
+                else:
+                    async with aiohttp.request(
+                        method,
                         full_url,
                         params=params,
                         json=json,
                         data=data,
                         headers=headers,
                         auth=self._auth,
-                    )
-                    if raw:
-                        return {"result": await response.text()}
-                    response_json = await response.json()
-            else:
-                async with aiohttp.request(
-                    method,
-                    full_url,
-                    params=params,
-                    json=json,
-                    data=data,
-                    headers=headers,
-                    auth=self._auth,
-                ) as response:
-                    if raw:
-                        return {"result": await response.text()}
-                    response_json = await response.json()
+                    ) as response:
+                        status_label = str(response.status)
+                        if raw:
+                            return {"result": await response.text()}
+                        response_json = await response.json()
+            finally:
+                PULP_REQUEST_DURATION.labels(
+                    method_label, endpoint_label, status_label
+                ).observe(time.perf_counter() - start)
 
             try:
                 response.raise_for_status()
             except ClientResponseError as exc:
+                PULP_REQUEST_ERRORS.labels(
+                    method_label, endpoint_label, f"{exc.status // 100}xx"
+                ).inc()
                 if exc.status == status.HTTP_400_BAD_REQUEST:
                     exc.message += f": {str(response_json)}"
                 raise exc
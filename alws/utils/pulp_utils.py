@@ -1,10 +1,11 @@
 import typing
 import uuid
 
+import sqlalchemy
 from fastapi_sqla import open_session
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload, load_only
+from sqlalchemy.orm import aliased, joinedload, load_only
 
 from alws.models import RpmModule
 from alws.pulp_models import (
@@ -17,18 +18,199 @@ from alws.pulp_models import (
     RpmModulemd,
     RpmPackage,
 )
-from alws.utils.modularity import IndexWrapper, get_modules_yaml_from_repo
+from alws.utils.modularity import get_modules_yaml_from_repo
 from alws.utils.parsing import parse_rpm_nevra
 
+REPO_DIFF_STATUSES = ("added", "removed", "changed", "same")
+
+
+class RepoVersionRef(typing.NamedTuple):
+    repo_id: uuid.UUID
+    # Latest repository version if not set
+    number: typing.Optional[int] = None
+
+
+class RepoContentDiff(typing.NamedTuple):
+    name: str
+    epoch: str
+    version: str
+    release: str
+    arch: str
+    # "added" if only in the right repositories, "removed" if only in
+    # the left ones, "changed" if both have the NEVRA with other pkgId
+    status: str
+    left_pkg_id: typing.Optional[str]
+    right_pkg_id: typing.Optional[str]
+    # Pulp hrefs of the packages, to modify repositories with the diff
+    left_pulp_href: typing.Optional[str] = None
+    right_pulp_href: typing.Optional[str] = None
+
+    @property
+    def nevra(self) -> str:
+        return (
+            f"{self.name}-{self.epoch}:{self.version}-{self.release}"
+            f".{self.arch}"
+        )
+
 
 def get_uuid_from_pulp_href(pulp_href: str) -> uuid.UUID:
     return uuid.UUID(pulp_href.split("/")[-2])
 
 
+def _get_repo_version_content_query(ref: RepoVersionRef):
+    if ref.number is None:
+        return select(CoreRepositoryContent.content_id).where(
+            CoreRepositoryContent.repository_id == ref.repo_id,
+            CoreRepositoryContent.version_removed_id.is_(None),
+        )
+    version_added = aliased(CoreRepositoryVersion)
+    version_removed = aliased(CoreRepositoryVersion)
+    return (
+        select(CoreRepositoryContent.content_id)
+        .join(
+            version_added,
+            version_added.pulp_id == CoreRepositoryContent.version_added_id,
+        )
+        .outerjoin(
+            version_removed,
+            version_removed.pulp_id == CoreRepositoryContent.version_removed_id,
+        )
+        .where(
+            CoreRepositoryContent.repository_id == ref.repo_id,
+            version_added.number <= ref.number,
+            sqlalchemy.or_(
+                version_removed.pulp_id.is_(None),
+                version_removed.number > ref.number,
+            ),
+        )
+    )
+
+
+def _get_repo_versions_packages_cte(
+    refs: typing.List[RepoVersionRef],
+    name: str,
+    arches: typing.Optional[typing.List[str]] = None,
+):
+    content_ids = sqlalchemy.union_all(
+        *(_get_repo_version_content_query(ref) for ref in refs)
+    ).subquery()
+    nevra = (
+        RpmPackage.name,
+        RpmPackage.epoch,
+        RpmPackage.version,
+        RpmPackage.release,
+        RpmPackage.arch,
+    )
+    pulp_href = sqlalchemy.func.concat(
+        "/pulp/api/v3/content/rpm/packages/",
+        sqlalchemy.cast(RpmPackage.content_ptr_id, sqlalchemy.String),
+        "/",
+    )
+    # The package with the lowest pkgId represents its NEVRA
+    query = (
+        select(
+            *nevra,
+            RpmPackage.pkgId.label("pkg_id"),
+            pulp_href.label("pulp_href"),
+        )
+        .where(RpmPackage.content_ptr_id.in_(select(content_ids.c[0])))
+        .distinct(*nevra)
+        .order_by(*nevra, RpmPackage.pkgId)
+    )
+    if arches:
+        query = query.where(RpmPackage.arch.in_(arches))
+    return query.cte(name)
+
+
+def get_repo_content_diff_query(
+    left: typing.List[RepoVersionRef],
+    right: typing.List[RepoVersionRef],
+    statuses: typing.Iterable[str] = ("added", "removed", "changed"),
+    arches: typing.Optional[typing.List[str]] = None,
+):
+    """Build a query comparing RPM packages of two sets of repositories.
+
+    Each side is the union of the given repository versions, packages
+    are matched by NEVRA. The set difference is computed by Pulp DB
+    from repository contents, nothing is loaded through the REST API.
+    """
+    left_packages = _get_repo_versions_packages_cte(
+        left, "left_packages", arches=arches
+    )
+    right_packages = _get_repo_versions_packages_cte(
+        right, "right_packages", arches=arches
+    )
+    nevra_fields = ("name", "epoch", "version", "release", "arch")
+    status = sqlalchemy.case(
+        (right_packages.c.pkg_id.is_(None), "removed"),
+        (left_packages.c.pkg_id.is_(None), "added"),
+        (left_packages.c.pkg_id != right_packages.c.pkg_id, "changed"),
+        else_="same",
+    )
+    return (
+        select(
+            *(
+                sqlalchemy.func.coalesce(
+                    left_packages.c[field], right_packages.c[field]
+                ).label(field)
+                for field in nevra_fields
+            ),
+            status.label("status"),
+            left_packages.c.pkg_id.label("left_pkg_id"),
+            right_packages.c.pkg_id.label("right_pkg_id"),
+            left_packages.c.pulp_href.label("left_pulp_href"),
+            right_packages.c.pulp_href.label("right_pulp_href"),
+        )
+        .select_from(
+            left_packages.join(
+                right_packages,
+                sqlalchemy.and_(*(
+                    left_packages.c[field] == right_packages.c[field]
+                    for field in nevra_fields
+                )),
+                full=True,
+            )
+        )
+        .where(status.in_(list(statuses)))
+        .order_by("name", "arch", "epoch", "version", "release")
+    )
+
+
+def iter_repo_content_diff(
+    left: typing.List[RepoVersionRef],
+    right: typing.List[RepoVersionRef],
+    statuses: typing.Iterable[str] = ("added", "removed", "changed"),
+    arches: typing.Optional[typing.List[str]] = None,
+    batch_size: int = 1000,
+) -> typing.Iterator[RepoContentDiff]:
+    query = get_repo_content_diff_query(
+        left, right, statuses=statuses, arches=arches
+    ).execution_options(yield_per=batch_size)
+    with open_session(key="pulp") as pulp_db:
+        for row in pulp_db.execute(query):
+            yield RepoContentDiff(*row)
+
+
+async def aiter_repo_content_diff(
+    pulp_db: AsyncSession,
+    left: typing.List[RepoVersionRef],
+    right: typing.List[RepoVersionRef],
+    statuses: typing.Iterable[str] = ("added", "removed", "changed"),
+    arches: typing.Optional[typing.List[str]] = None,
+    batch_size: int = 1000,
+) -> typing.AsyncIterator[RepoContentDiff]:
+    query = get_repo_content_diff_query(
+        left, right, statuses=statuses, arches=arches
+    ).execution_options(yield_per=batch_size)
+    result = await pulp_db.stream(query)
+    async for row in result:
+        yield RepoContentDiff(*row)
+
+
 # TODO: After ALBS-1012 is fixed, we can refactor this function
 # to get module packages from pulp without having to grab the actual
 # modules.yaml file from the repository
-def get_rpm_module_packages_from_repository(
+async def get_rpm_module_packages_from_repository(
     repo_id: uuid.UUID,
     module: str,
     pkg_names: typing.Optional[typing.List[str]] = None,
@@ -54,7 +236,7 @@ def get_rpm_module_packages_from_repository(
     # At this moment, we can only trust the modules that are in production
     # repositories.
     try:
-        repo_modules_yaml = get_modules_yaml_from_repo(repo_name)
+        repo_modules_yaml = await get_modules_yaml_from_repo(repo_name)
     except Exception:
         return result
     if not repo_modules_yaml:
@@ -66,7 +248,7 @@ def get_rpm_module_packages_from_repository(
     )
     repo_modules = []
     try:
-        repo_index = IndexWrapper.from_template(repo_modules_yaml)
+        repo_index = repo_modules_yaml.index
     except Exception:
         return result
     for repo_module in repo_index.iter_modules():
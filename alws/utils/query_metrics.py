@@ -0,0 +1,242 @@
+"""
+SQL query instrumentation for albs-web-server.
+
+Opt-in (``DB_QUERY_METRICS_ENABLED``) SQLAlchemy event hooks that count and
+time every statement executed on the engines behind the fastapi-sqla session
+keys. Statements are attributed to the unit of work currently running, which
+is either an HTTP route (see ``alws.utils.metrics.PrometheusMiddleware``) or a
+dramatiq actor (see ``QueryMetricsMiddleware``), so N+1 patterns show up as a
+growing per-unit query count.
+
+Statements slower than ``DB_SLOW_QUERY_THRESHOLD`` seconds are logged together
+with a fingerprint: the statement with literals and ``IN`` lists collapsed,
+which groups the same query issued with different parameters.
+"""
+
+import contextlib
+import contextvars
+import hashlib
+import logging
+import re
+import time
+import weakref
+from typing import Iterator, List, Optional, Tuple
+
+import dramatiq
+from prometheus_client import Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from alws.config import settings
+
+__all__ = [
+    'QueryBudgetExceeded',
+    'QueryMetricsMiddleware',
+    'QueryStats',
+    'assert_query_budget',
+    'instrument_engine',
+    'statement_fingerprint',
+    'track_queries',
+]
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger('alws.slow_queries')
+
+_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+_TIME_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+
+DB_QUERIES_PER_UNIT = Histogram(
+    'db_queries_per_unit',
+    'SQL statements issued by a single HTTP request or actor message',
+    labelnames=('kind', 'name'),
+    buckets=_COUNT_BUCKETS,
+)
+DB_QUERY_TIME_PER_UNIT = Histogram(
+    'db_query_seconds_per_unit',
+    'Total SQL time spent by a single HTTP request or actor message',
+    labelnames=('kind', 'name'),
+    buckets=_TIME_BUCKETS,
+)
+DB_STATEMENT_DURATION = Histogram(
+    'db_statement_duration_seconds',
+    'Duration of a single SQL statement in seconds',
+    labelnames=('db',),
+    buckets=_TIME_BUCKETS,
+)
+
+_START_TIME_KEY = 'alws_query_start_time'
+_FINGERPRINT_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\$\d+|%\(\w+\)s|%s'), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+_instrumented_engines = weakref.WeakSet()
+_active_stats: contextvars.ContextVar[Tuple['QueryStats', ...]] = (
+    contextvars.ContextVar('alws_active_query_stats', default=())
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats:
+    """Statements executed while a ``track_queries`` block is active."""
+
+    def __init__(self, kind: str, name: str, keep_statements: bool = False):
+        self.kind = kind
+        self.name = name
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Optional[List[str]] = [] if keep_statements else None
+
+    def add(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        if self.statements is not None:
+            self.statements.append(statement)
+
+
+def statement_fingerprint(statement: str) -> str:
+    normalized = statement
+    for pattern, replacement in _FINGERPRINT_PATTERNS:
+        normalized = pattern.sub(replacement, normalized)
+    normalized = normalized.strip()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def _before_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    conn.info.setdefault(_START_TIME_KEY, []).append(time.perf_counter())
+
+
+def _make_after_cursor_execute(db_name: str):
+    def _after_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        start_times = conn.info.get(_START_TIME_KEY)
+        if not start_times:
+            return
+        duration = time.perf_counter() - start_times.pop()
+        DB_STATEMENT_DURATION.labels(db_name).observe(duration)
+        active = _active_stats.get()
+        for stats in active:
+            stats.add(statement, duration)
+        if duration >= settings.db_slow_query_threshold:
+            unit = f'{active[-1].kind}:{active[-1].name}' if active else '-'
+            slow_query_logger.warning(
+                'Slow query on %s (%s) took %.3fs, fingerprint %s: %s',
+                db_name,
+                unit,
+                duration,
+                statement_fingerprint(statement),
+                statement[:1000],
+            )
+
+    return _after_cursor_execute
+
+
+def instrument_engine(engine: Engine, db_name: str):
+    """Attach the query hooks to a (sync) engine, at most once per engine.
+
+    Async engines must be instrumented through their ``sync_engine``.
+    """
+    if engine in _instrumented_engines:
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(
+        engine,
+        'after_cursor_execute',
+        _make_after_cursor_execute(db_name),
+    )
+    _instrumented_engines.add(engine)
+    logger.info('SQL query instrumentation enabled for %s', db_name)
+
+
+@contextlib.contextmanager
+def track_queries(
+    kind: str,
+    name: str,
+    keep_statements: bool = False,
+) -> Iterator[QueryStats]:
+    """Attribute statements executed inside the block to ``kind``/``name``.
+
+    Blocks can be nested, statements are counted by every active block.
+    Per-unit histograms are only observed once some engine is instrumented,
+    so the tracking stays silent when instrumentation is disabled.
+    """
+    stats = QueryStats(kind, name, keep_statements=keep_statements)
+    token = _active_stats.set(_active_stats.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active_stats.reset(token)
+        if _instrumented_engines:
+            DB_QUERIES_PER_UNIT.labels(stats.kind, stats.name).observe(
+                stats.count
+            )
+            DB_QUERY_TIME_PER_UNIT.labels(stats.kind, stats.name).observe(
+                stats.duration
+            )
+
+
+@contextlib.contextmanager
+def assert_query_budget(max_queries: int) -> Iterator[QueryStats]:
+    """Fail if the block issues more than ``max_queries`` SQL statements.
+
+    Intended for tests, e.g. to pin the number of queries an API call makes:
+
+        with assert_query_budget(10):
+            await client.get('/api/v1/builds/1/')
+    """
+    with track_queries('test', 'query_budget', keep_statements=True) as stats:
+        yield stats
+    if stats.count > max_queries:
+        statements = '\n'.join(
+            f'{statement_fingerprint(statement)}: {statement}'
+            for statement in stats.statements
+        )
+        raise QueryBudgetExceeded(
+            f'Expected at most {max_queries} queries, '
+            f'got {stats.count}:\n{statements}'
+        )
+
+
+class QueryMetricsMiddleware(dramatiq.Middleware):
+    """Attribute SQL statements issued by an actor to that actor."""
+
+    def __init__(self):
+        self._trackers = {}
+
+    def before_process_message(self, broker, message):
+        tracker = track_queries('actor', message.actor_name)
+        tracker.__enter__()
+        self._trackers[message.message_id] = tracker
+
+    def after_process_message(
+        self, broker, message, *, result=None, exception=None
+    ):
+        tracker = self._trackers.pop(message.message_id, None)
+        if tracker is not None:
+            tracker.__exit__(None, None, None)
+
+    after_skip_message = after_process_message
@@ -0,0 +1,104 @@
+"""
+Cache of updateinfo XML served for released errata records.
+
+Released records are effectively immutable, so their XML is built once
+at release time and kept in Redis under a key containing the record id,
+the platform and the record ``updated_date``. Updating a record changes
+the key and invalidates previously cached entries explicitly, keys of
+every record are tracked in a set so they're removed without scanning.
+"""
+
+import datetime
+import hashlib
+from typing import Iterable, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from alws.config import settings
+
+__all__ = [
+    'get_updateinfo_etag',
+    'get_cached_updateinfo',
+    'invalidate_updateinfo',
+    'store_updateinfo',
+]
+
+KEY_PREFIX = 'updateinfo_xml'
+RECORD_KEYS_PREFIX = 'updateinfo_xml_keys'
+
+_redis: Optional[aioredis.Redis] = None
+
+
+def _get_redis() -> aioredis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = aioredis.from_url(settings.redis_url)
+    return _redis
+
+
+def _get_key(
+    record_id: str,
+    platform_id: Optional[int],
+    updated_date: datetime.datetime,
+) -> str:
+    platform = platform_id if platform_id is not None else 'all'
+    return (
+        f'{KEY_PREFIX}:{record_id}:{platform}:'
+        f'{int(updated_date.timestamp())}'
+    )
+
+
+def _get_record_keys_key(record_id: str) -> str:
+    return f'{RECORD_KEYS_PREFIX}:{record_id}'
+
+
+def get_updateinfo_etag(updateinfo_xml: str) -> str:
+    return '"{}"'.format(hashlib.sha256(updateinfo_xml.encode()).hexdigest())
+
+
+async def get_cached_updateinfo(
+    record_id: str,
+    platform_id: Optional[int],
+    updated_date: datetime.datetime,
+) -> Optional[Tuple[str, str]]:
+    """Returns cached updateinfo XML with its ETag."""
+    if settings.updateinfo_xml_cache_ttl <= 0:
+        return None
+    cached = await _get_redis().hmget(
+        _get_key(record_id, platform_id, updated_date), 'xml', 'etag'
+    )
+    if not cached[0]:
+        return None
+    return cached[0].decode(), cached[1].decode()
+
+
+async def store_updateinfo(
+    record_id: str,
+    platform_id: Optional[int],
+    updated_date: datetime.datetime,
+    updateinfo_xml: str,
+) -> str:
+    etag = get_updateinfo_etag(updateinfo_xml)
+    if settings.updateinfo_xml_cache_ttl <= 0:
+        return etag
+    key = _get_key(record_id, platform_id, updated_date)
+    record_keys_key = _get_record_keys_key(record_id)
+    async with _get_redis().pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping={'xml': updateinfo_xml, 'etag': etag})
+        pipe.expire(key, settings.updateinfo_xml_cache_ttl)
+        pipe.sadd(record_keys_key, key)
+        pipe.expire(record_keys_key, settings.updateinfo_xml_cache_ttl)
+        await pipe.execute()
+    return etag
+
+
+async def invalidate_updateinfo(record_ids: Iterable[str]):
+    """Removes cached XML of the records for all platforms and dates."""
+    record_keys_keys = [
+        _get_record_keys_key(record_id) for record_id in set(record_ids)
+    ]
+    if not record_keys_keys:
+        return
+    redis = _get_redis()
+    keys = await redis.sunion(record_keys_keys)
+    await redis.delete(*keys, *record_keys_keys)
@@ -0,0 +1,215 @@
+"""
+Measures time and memory of the OVAL composition on a synthetic platform.
+
+Usage: python scripts/benchmark_oval_composition.py --records 20000
+"""
+
+import argparse
+import copy
+import datetime
+import importlib
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Callable, List
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from alws.constants import ErrataReferenceType
+from alws.crud.errata import (
+    _build_sibling_evr_index,
+    _inject_sibling_evr,
+    _sibling_evr_for_record,
+    new_errata_records_to_oval,
+)
+from alws.utils.oval_records import OvalRecord
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('benchmark-oval-composition')
+
+OVAL_NS = 'oval:org.almalinux.alsa'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        'benchmark_oval_composition',
+        description=__doc__,
+    )
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--packages', type=int, default=3000)
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+def generate_record(index: int, packages: int, rnd: random.Random):
+    """Generates a NewErrataRecord-like object with OVAL data."""
+    record_id = f'ALSA-2024:{index:05d}'
+    cve_indexes = sorted({rnd.randrange(index // 2 + 1) for _ in range(2)})
+    criterion, tests, objects, states = [], [], [], []
+    # Records sharing a CVE fix the same packages, like point release
+    # rebuilds do, so sibling criteria are injected
+    for pkg_index in {(cve_indexes[0] * 3 + i) % packages for i in range(3)}:
+        name = f'package-{pkg_index}'
+        # Packages are shared between records, their objects are deduped
+        object_id = f'{OVAL_NS}:obj:{pkg_index}'
+        test_id = f'{OVAL_NS}:tst:{index}{pkg_index}'
+        state_id = f'{OVAL_NS}:ste:{index}{pkg_index}'
+        evr = f'0:1.{pkg_index % 7}-{rnd.randint(1, 4)}.el9_{rnd.randint(0, 4)}'
+        criterion.append({
+            'ref': test_id,
+            'comment': f'{name} is earlier than {evr}',
+        })
+        tests.append({
+            'id': test_id,
+            'type': 'rpminfo_test',
+            'version': 1,
+            'check': 'at least one',
+            'comment': f'{name} is earlier than {evr}',
+            'object_ref': object_id,
+            'state_ref': state_id,
+        })
+        objects.append({
+            'id': object_id,
+            'type': 'rpminfo_object',
+            'version': 1,
+            'name': name,
+        })
+        states.append({
+            'id': state_id,
+            'type': 'rpminfo_state',
+            'version': 1,
+            'evr': evr,
+            'evr_operation': 'less than',
+        })
+    cve_ids = [f'CVE-2024-{cve_index}' for cve_index in cve_indexes]
+    references = [
+        SimpleNamespace(
+            ref_id=record_id,
+            ref_type=ErrataReferenceType.self_ref,
+            href=f'https://errata.almalinux.org/9/{record_id}.html',
+            title=record_id,
+            cve=None,
+        )
+    ]
+    for cve_id in cve_ids:
+        references.append(
+            SimpleNamespace(
+                ref_id=cve_id,
+                ref_type=ErrataReferenceType.cve,
+                href=f'https://access.redhat.com/security/cve/{cve_id}',
+                title=cve_id,
+                cve=SimpleNamespace(
+                    id=cve_id,
+                    public='2024-01-01T00:00:00Z',
+                    impact='moderate',
+                    cwe='CWE-20',
+                    cvss3='CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:H/A:H',
+                ),
+            )
+        )
+    issued_date = datetime.datetime(2024, 1, 1) + datetime.timedelta(
+        hours=index
+    )
+    return SimpleNamespace(
+        id=record_id,
+        platform_id=1,
+        definition_id=f'{OVAL_NS}:def:{index}',
+        definition_version='635',
+        definition_class='patch',
+        oval_title=f'{record_id}: Moderate: synthetic update',
+        description='Synthetic description. ' * 20,
+        original_description='Synthetic description. ' * 20,
+        contact_mail='packager@almalinux.org',
+        severity='moderate',
+        rights='Copyright 2024 AlmaLinux OS',
+        issued_date=issued_date,
+        updated_date=issued_date,
+        affected_cpe=['cpe:/a:almalinux:almalinux:9::appstream'],
+        criteria=[{
+            'operator': 'AND',
+            'criterion': criterion,
+            'criteria': [],
+        }],
+        tests=tests,
+        objects=objects,
+        states=states,
+        variables=[],
+        references=references,
+    )
+
+
+def measure(name: str, func: Callable, *args):
+    tracemalloc.start()
+    started_at = time.monotonic()
+    result = func(*args)
+    elapsed = time.monotonic() - started_at
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    logger.info(
+        '%s: %.2fs, retained %.1f MiB, peak %.1f MiB',
+        name,
+        elapsed,
+        current / 2**20,
+        peak / 2**20,
+    )
+    return result
+
+
+def to_compact_records(samples: List[SimpleNamespace]) -> List[OvalRecord]:
+    cves = {}
+    return [OvalRecord.from_model(sample, cves) for sample in samples]
+
+
+def inject_siblings(records: List[OvalRecord]) -> int:
+    cve_to_records, record_evr = _build_sibling_evr_index(records)
+    injected = 0
+    for record in records:
+        sibling_evr_by_pkg = _sibling_evr_for_record(
+            record, cve_to_records, record_evr
+        )
+        if not sibling_evr_by_pkg:
+            continue
+        criteria = copy.deepcopy(record.criteria)
+        for top in criteria:
+            _inject_sibling_evr(top, sibling_evr_by_pkg)
+        injected += 1
+    return injected
+
+
+def main():
+    args = parse_args()
+    rnd = random.Random(args.seed)
+    samples = measure(
+        f'Generating {args.records} records',
+        lambda: [
+            generate_record(index, args.packages, rnd)
+            for index in range(args.records)
+        ],
+    )
+    records = measure(
+        'Converting to compact records',
+        to_compact_records,
+        samples,
+    )
+    samples.clear()
+    injected = measure('Injecting sibling criteria', inject_siblings, records)
+    logger.info('Records with sibling criteria: %d', injected)
+    try:
+        importlib.import_module('almalinux.liboval.composer')
+    except ImportError:
+        logger.warning('liboval is not installed, skipping XML composition')
+        return
+    oval = measure(
+        'Composing OVAL XML',
+        new_errata_records_to_oval,
+        records,
+    )
+    logger.info('OVAL XML size: %.1f MiB', len(oval) / 2**20)
+
+
+if __name__ == '__main__':
+    main()
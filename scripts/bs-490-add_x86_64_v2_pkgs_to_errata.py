@@ -26,7 +26,7 @@ from sqlalchemy.orm import selectinload
 from alws import models
 from alws.config import settings
 from alws.crud.errata import (
-    get_albs_oval_cache,
+    get_albs_oval_registry,
     add_oval_data_to_errata_record,
     load_platform_packages,
     get_matching_albs_packages,
@@ -75,7 +75,7 @@ async def get_errata_records(db):
 async def make_oval_cache(db):
     for platform in ['AlmaLinux-10']:
         logging.info(f"Preparing OVAL cache for {platform}")
-        albs_oval_cache[platform] = await get_albs_oval_cache(db, platform)
+        albs_oval_cache[platform] = await get_albs_oval_registry(db, platform)
 
 def generate_v2_package_dicts(packages):
     clean_pkgs = []
@@ -166,8 +166,8 @@ async def release_x86_64_v2_errata(
         )
     except Exception as exc:
         # Don't need to do this
-        #db_record.release_status = ErrataReleaseStatus.FAILED
-        #db_record.last_release_log = str(exc)
+        # db_record.release_status = ErrataReleaseStatus.FAILED
+        # db_record.last_release_log = str(exc)
         logging.exception("Cannot release %s record:", record_id)
         await session.flush()
         return
@@ -195,10 +195,14 @@ async def release_x86_64_v2_errata(
 
     logging.info("Generating OVAL data")
     oval_cache = albs_oval_cache[db_record.platform.name]
-    await add_oval_data_to_errata_record(db_record, oval_cache)
+    objects, states, tests = await add_oval_data_to_errata_record(
+        db_record, oval_cache
+    )
+    # Registered in Redis once the session is committed
+    oval_cache.add(objects, states, tests)
 
     # I don't need to set it as RELEASED
-    #db_record.release_status = ErrataReleaseStatus.RELEASED
+    # db_record.release_status = ErrataReleaseStatus.RELEASED
     # Here, I must update the last_release_log to include the x86_64_v2 addition
     last_release_log = await get_release_logs(
         record_id=record_id,
@@ -236,9 +240,10 @@ async def add_x86_64_v2_errata_pkgs():
         for errata_record in errata_records:
             logging.info(f"Processing {errata_record.id}")
             await process_errata_record(db, errata_record)
+    for oval_cache in albs_oval_cache.values():
+        await oval_cache.save()
     logging.info(f"Finished processing affected erratas")
 
 
-
 if __name__ == '__main__':
     asyncio.run(add_x86_64_v2_errata_pkgs())
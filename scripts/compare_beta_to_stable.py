@@ -14,7 +14,6 @@ from sqlalchemy.orm import selectinload
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from alws.config import settings
 from alws.dependencies import get_async_db_key
 from alws.models import (
     Platform,
@@ -22,7 +21,7 @@ from alws.models import (
     Product,
     Repository,
 )
-from alws.utils import pulp_client
+from alws.utils import pulp_utils
 from alws.utils.debuginfo import is_debuginfo
 from alws.utils.fastapi_sqla_setup import setup_all
 
@@ -113,72 +112,46 @@ async def get_repositories(
 
 
 class PackagesComparator:
-    def __init__(self):
-        self.pulp = pulp_client.PulpClient(
-            settings.pulp_host, settings.pulp_user, settings.pulp_password
-        )
-
-    async def retrieve_all_packages_from_repo(
-        self, repository: Repository, arch: typing.Optional[str] = None
-    ) -> typing.Tuple[str, typing.List[typing.Dict[str, str]]]:
-
-        logging.info(
-            "Getting packages from repository %s %s",
-            repository.name,
-            repository.arch,
-        )
-        search_params = {}
-        if arch:
-            if arch == "src":
-                search_params["arch"] = arch
-            else:
-                search_params["arch__in"] = (arch, "noarch")
-        packages = await self.pulp.get_rpm_repository_packages(
-            repository.pulp_href,
-            include_fields=["sha256", "location_href"],
-            **search_params,
-        )
-        logging.info(
-            "Got all packages from repository %s %s",
-            repository.name,
-            repository.arch,
-        )
-        return repository.name, packages
-
-    async def get_packages_list(
+    async def get_intersections(
         self,
-        repositories: typing.List[Repository],
+        stable_repositories: typing.List[Repository],
+        beta_repositories: typing.List[Repository],
         arch: typing.Optional[str] = None,
-    ) -> typing.Tuple[typing.Set[str], typing.Set[str]]:
-        tasks = []
-        for repository in repositories:
-            if repository.pulp_href:
-                tasks.append(
-                    self.retrieve_all_packages_from_repo(repository, arch=arch)
-                )
-            else:
-                logging.warning(
-                    "Repository %s does not have Pulp HREF", str(repository)
+    ) -> typing.Set[str]:
+        refs = []
+        for repositories in (stable_repositories, beta_repositories):
+            side_refs = []
+            for repository in repositories:
+                if not repository.pulp_href:
+                    logging.warning(
+                        "Repository %s does not have Pulp HREF",
+                        str(repository),
+                    )
+                    continue
+                side_refs.append(
+                    pulp_utils.RepoVersionRef(
+                        pulp_utils.get_uuid_from_pulp_href(repository.pulp_href)
+                    )
                 )
-
-        packages = await asyncio.gather(*tasks)
-        debuginfo_packages = []
-        usual_packages = []
-
-        logging.debug("All packages: %s", pprint.pformat(packages))
-
-        for repo_name, packages in packages:
-            package_names = [
-                p["location_href"].split("/")[-1] for p in packages
-            ]
-            packages_list = (
-                debuginfo_packages
-                if is_debuginfo(repo_name)
-                else usual_packages
-            )
-            packages_list.extend(package_names)
-
-        return set(usual_packages), set(debuginfo_packages)
+            refs.append(side_refs)
+        stable_refs, beta_refs = refs
+        if not stable_refs or not beta_refs:
+            return set()
+        arches = None
+        if arch:
+            arches = [arch] if arch == "src" else [arch, "noarch"]
+        intersections = set()
+        async with open_async_session(key="pulp_async") as pulp_db:
+            async for diff in pulp_utils.aiter_repo_content_diff(
+                pulp_db,
+                stable_refs,
+                beta_refs,
+                statuses=("same", "changed"),
+                arches=arches,
+            ):
+                logging.debug("Found intersection: %s", diff)
+                intersections.add(diff.nevra)
+        return intersections
 
     async def run(self, args):
         async with open_async_session(key=get_async_db_key()) as session:
@@ -192,17 +165,15 @@ class PackagesComparator:
                 arch=args.arch,
             )
 
-        stable_usual_packages, stable_debuginfo_packages = (
-            await self.get_packages_list(stable_repositories, arch=args.arch)
-        )
-
-        beta_usual_packages, beta_debuginfo_packages = (
-            await self.get_packages_list(beta_repositories, arch=args.arch)
+        usual_diff = await self.get_intersections(
+            [r for r in stable_repositories if not is_debuginfo(r.name)],
+            [r for r in beta_repositories if not is_debuginfo(r.name)],
+            arch=args.arch,
         )
-
-        usual_diff = set(stable_usual_packages) & set(beta_usual_packages)
-        debuginfo_diff = set(stable_debuginfo_packages) & set(
-            beta_debuginfo_packages
+        debuginfo_diff = await self.get_intersections(
+            [r for r in stable_repositories if is_debuginfo(r.name)],
+            [r for r in beta_repositories if is_debuginfo(r.name)],
+            arch=args.arch,
         )
         if usual_diff:
             logging.error(
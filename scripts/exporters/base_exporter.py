@@ -2,7 +2,6 @@ import asyncio
 import logging
 import os
 import re
-import shutil
 import sys
 import urllib.parse
 from fnmatch import fnmatch
@@ -20,6 +19,20 @@ from alws.dependencies import get_async_db_session
 from alws.models import Repository
 from alws.utils.exporter import download_file, get_repodata_file_links
 from alws.utils.pulp_client import get_pulp_client
+from scripts.exporters.export_scheduler import (
+    ExportScheduler,
+    ExportStage,
+    RepoExportJob,
+)
+from scripts.exporters.export_state import ExportStateStore
+from scripts.exporters.repodata_store import RepodataStore
+
+# Concurrency limits of export stages: Pulp exports and repodata downloads
+# are I/O bound, createrepo_c is CPU bound and the sign server is shared
+PULP_EXPORT_CONCURRENCY = 10
+REPODATA_FETCH_CONCURRENCY = 10
+CREATEREPO_CONCURRENCY = os.cpu_count() or 4
+SIGN_CONCURRENCY = 4
 
 
 class BasePulpExporter:
@@ -31,6 +44,7 @@ class BasePulpExporter:
         verbose: bool = False,
         export_method: Literal['write', 'hardlink', 'symlink'] = 'hardlink',
         export_path: str = settings.pulp_export_path,
+        incremental: bool = False,
     ):
         self.pulp_client = get_pulp_client()
         self.export_method = export_method
@@ -45,6 +59,15 @@ class BasePulpExporter:
             if dir_path.exists():
                 continue
             dir_path.mkdir()
+        self.repodata_store = RepodataStore(self.repodata_cache_dir)
+        # Repositories exported with the same Pulp version as during
+        # the previous run are skipped when exporting incrementally
+        self.export_state = (
+            ExportStateStore(self.repodata_cache_dir) if incremental else None
+        )
+        self.unchanged_paths = set()
+        self.exported_versions = {}
+        self.sign_server_token = None
 
         self.logger = logging.getLogger(logger_name)
         Path(log_file_path).parent.mkdir(exist_ok=True)
@@ -82,15 +105,9 @@ class BasePulpExporter:
         _, stdout, _ = self.createrepo_c.run(args=args)
         self.logger.info(stdout)
         self.logger.info('createrepo_c is finished')
-        # Cache newly generated repodata into folder for future re-use
-        if not repo_repodata_cache.exists():
-            repo_repodata_cache.mkdir(parents=True)
-        else:
-            # Remove previous repodata before copying new ones
-            if cache_repodata_dir.exists():
-                shutil.rmtree(cache_repodata_dir)
-
-        shutil.copytree(repodata_path, cache_repodata_dir)
+        # Cache newly generated repodata into folder for future re-use,
+        # unchanged files are already linked from the repodata store
+        self.repodata_store.sync_directory(repodata_path, cache_repodata_dir)
 
     def remove_packages_from_repo(
         self,
@@ -100,12 +117,12 @@ class BasePulpExporter:
         packages_dir = Path(repo_path)
         if not packages_dir.exists():
             self.logger.warning(
-                'Packages directory does not exist: %s', repo_path,
+                'Packages directory does not exist: %s',
+                repo_path,
             )
             return
         globs = [
-            p + '*' if not p.endswith('*') else p
-            for p in exclude_patterns
+            p + '*' if not p.endswith('*') else p for p in exclude_patterns
         ]
         removed_count = 0
         for rpm_file in packages_dir.rglob('*.rpm'):
@@ -114,7 +131,9 @@ class BasePulpExporter:
                 rpm_file.unlink()
                 removed_count += 1
         self.logger.info(
-            'Removed %d packages from %s', removed_count, repo_path,
+            'Removed %d packages from %s',
+            removed_count,
+            repo_path,
         )
 
     async def create_filesystem_exporters(
@@ -176,15 +195,31 @@ class BasePulpExporter:
         return list(dict(results).values())
 
     async def download_repodata(self, repodata_path, repodata_url):
+        repodata_path = Path(repodata_path)
+        repodata_path.mkdir(exist_ok=True)
         file_links = await get_repodata_file_links(repodata_url)
+        file_names = set()
         for link in file_links:
             file_name = Path(link).name
             if file_name.endswith('..'):
                 continue
+            file_names.add(file_name)
+            if self.repodata_store.link(file_name, repodata_path):
+                self.logger.debug("Reusing stored repodata %s", file_name)
+                continue
+            file_path = repodata_path.joinpath(file_name)
+            # Don't write through a hardlink shared with other trees
+            if file_path.exists():
+                file_path.unlink()
             self.logger.info("Downloading repodata from %s", link)
-            await download_file(link, Path(repodata_path, file_name))
+            await download_file(link, file_path)
+            self.repodata_store.add(file_path)
+        for file_path in repodata_path.iterdir():
+            if file_path.name not in file_names and file_path.is_file():
+                file_path.unlink()
 
-    async def _export_repository(self, exporter: dict) -> Optional[str]:
+    async def _export_repository(self, job: RepoExportJob) -> bool:
+        exporter = job.exporter
         self.logger.info(
             "Exporting repository using following data: %s",
             str(exporter),
@@ -192,6 +227,19 @@ class BasePulpExporter:
         export_path = exporter["export_path"]
         href = exporter["exporter_href"]
         repository_version = exporter["repo_latest_version"]
+        if self.export_state:
+            if self.export_state.is_repository_unchanged(
+                export_path, repository_version
+            ):
+                self.logger.info(
+                    "Repository %s is not changed since the last export",
+                    exporter["exporter_name"],
+                )
+                self.unchanged_paths.add(export_path)
+                job.unchanged = True
+                job.export_path = export_path
+                return True
+            self.export_state.forget_repository(export_path)
         try:
             await self.pulp_client.export_to_filesystem(
                 href, repository_version
@@ -201,34 +249,111 @@ class BasePulpExporter:
                 "Cannot export repository via %s",
                 str(exporter),
             )
-            return
-        parent_dir = Path(export_path).parent
-        if not parent_dir.exists():
+            return False
+        if not Path(export_path).parent.exists():
             self.logger.info(
                 "Repository %s directory is absent",
                 exporter["exporter_name"],
             )
-            return
+            return False
+        job.export_path = export_path
+        return True
 
-        repodata_path = parent_dir.joinpath("repodata").absolute()
-        repodata_url = urllib.parse.urljoin(exporter["repo_url"], "repodata/")
-        if repodata_path.exists():
-            shutil.rmtree(repodata_path)
-        repodata_path.mkdir()
+    async def _fetch_repodata(self, job: RepoExportJob) -> bool:
+        if job.unchanged:
+            return True
+        repodata_path = Path(job.export_path).parent.joinpath("repodata")
+        repodata_url = urllib.parse.urljoin(
+            job.exporter["repo_url"], "repodata/"
+        )
         self.logger.info('Downloading repodata from %s', repodata_url)
         try:
-            await self.download_repodata(repodata_path, repodata_url)
+            await self.download_repodata(repodata_path.absolute(), repodata_url)
         except Exception as e:
             self.logger.exception("Cannot download repodata file: %s", str(e))
+            return False
+        # Saved as exported only if the remaining stages succeed too
+        self.exported_versions[job.export_path] = job.exporter[
+            "repo_latest_version"
+        ]
+        return True
+
+    def _regenerate_repodata(self, job: RepoExportJob) -> bool:
+        if job.unchanged:
+            return True
+        self.regenerate_repo_metadata(str(Path(job.export_path).parent))
+        return True
+
+    async def _sign_repodata(self, job: RepoExportJob) -> bool:
+        if job.unchanged or not os.path.exists(job.export_path):
+            return True
+        self.logger.info('Key ID: %s', str(job.sign_key_id))
+        return await self.repomd_signer(
+            Path(job.export_path).parent / "repodata",
+            job.sign_key_id,
+            self.sign_server_token,
+        )
 
-        return export_path
+    def get_export_stages(self) -> List[ExportStage]:
+        return [
+            ExportStage(
+                'pulp_export',
+                self._export_repository,
+                concurrency=PULP_EXPORT_CONCURRENCY,
+            ),
+            ExportStage(
+                'repodata_fetch',
+                self._fetch_repodata,
+                concurrency=REPODATA_FETCH_CONCURRENCY,
+                depends_on=('pulp_export',),
+            ),
+            ExportStage(
+                'createrepo_c',
+                self._regenerate_repodata,
+                concurrency=CREATEREPO_CONCURRENCY,
+                depends_on=('repodata_fetch',),
+                blocking=True,
+            ),
+            ExportStage(
+                'sign',
+                self._sign_repodata,
+                concurrency=SIGN_CONCURRENCY,
+                depends_on=('createrepo_c',),
+            ),
+        ]
 
-    async def export_repositories(self, repo_ids: List[int]) -> List[str]:
+    async def create_export_jobs(
+        self,
+        repo_ids: List[int],
+        sign_key_id: Optional[str] = None,
+        verify_key_ids: Optional[List[str]] = None,
+    ) -> List[RepoExportJob]:
         exporters = await self.create_filesystem_exporters(repo_ids)
-        results = await asyncio.gather(
-            *(self._export_repository(e) for e in exporters)
+        return [
+            RepoExportJob(
+                exporter=exporter,
+                sign_key_id=sign_key_id,
+                verify_key_ids=verify_key_ids,
+            )
+            for exporter in exporters
+        ]
+
+    async def run_export_jobs(
+        self,
+        jobs: List[RepoExportJob],
+    ) -> List[RepoExportJob]:
+        if any(job.sign_key_id for job in jobs):
+            self.sign_server_token = await self.get_sign_server_token()
+        scheduler = ExportScheduler(self.get_export_stages(), self.logger)
+        await scheduler.run(jobs)
+        return jobs
+
+    def save_export_state(self, export_path: str):
+        if not self.export_state or export_path not in self.exported_versions:
+            return
+        self.export_state.save_repository(
+            export_path, self.exported_versions[export_path]
         )
-        return [path for path in results if path]
 
     async def get_sign_keys(self):
         endpoint = "sign-keys/"
@@ -285,25 +410,35 @@ class BasePulpExporter:
             if attempt == max_attempts:
                 self.logger.error(
                     "Signing %s failed after %d attempts: %s",
-                    path_to_file, attempt, err_msg,
+                    path_to_file,
+                    attempt,
+                    err_msg,
                 )
                 break
             self.logger.warning(
                 "Signing %s failed on attempt %d/%d: %s; retrying in %.1fs",
-                path_to_file, attempt, max_attempts, err_msg, backoff,
+                path_to_file,
+                attempt,
+                max_attempts,
+                err_msg,
+                backoff,
             )
             await asyncio.sleep(backoff)
             backoff *= 2
         return result
 
-    async def repomd_signer(self, repodata_path, key_id, token):
+    async def repomd_signer(self, repodata_path, key_id, token) -> bool:
+        """
+        Signs repomd.xml, returns False if signing has failed. Repositories
+        without a GPG key aren't signed, that's not a failure.
+        """
         string_repodata_path = str(repodata_path)
         if key_id is None:
             self.logger.info(
                 "Cannot sign repomd.xml in %s, missing GPG key",
                 string_repodata_path,
             )
-            return
+            return True
 
         file_path = os.path.join(repodata_path, "repomd.xml")
         result = await self.sign_repomd_xml(file_path, key_id, token)
@@ -316,12 +451,13 @@ class BasePulpExporter:
                 string_repodata_path,
                 result["error"],
             )
-            return
+            return False
 
         repodata_path = os.path.join(repodata_path, "repomd.xml.asc")
         with open(repodata_path, "w") as file:
             file.writelines(result_data)
         self.logger.info("repomd.xml in %s is signed", string_repodata_path)
+        return True
 
     async def make_request(
         self,
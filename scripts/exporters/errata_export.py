@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import Executor
+from typing import Iterable, Iterator, List
+
+from alws.utils.errata import SCHEMA_VERSION, dump_errata_to_html
+from alws.utils.osv import export_errata_to_osv
+from scripts.exporters.export_state import get_file_sha256
+
+# Errata records sent to a worker process at once
+RENDER_CHUNK_SIZE = 200
+
+
+def write_if_changed(path: str, chunks: Iterable[str]) -> bool:
+    """
+    Writes chunks into a temporary file next to the target one and replaces
+    the target only if its content hash differs, returns True if the file
+    was rewritten.
+    """
+    sha256 = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(
+        'w',
+        encoding='utf-8',
+        dir=os.path.dirname(path),
+        prefix='.',
+        suffix='.tmp',
+        delete=False,
+    ) as fd:
+        for chunk in chunks:
+            fd.write(chunk)
+            sha256.update(chunk.encode('utf-8'))
+    if os.path.exists(path) and get_file_sha256(path) == sha256.hexdigest():
+        os.unlink(fd.name)
+        return False
+    os.chmod(fd.name, 0o644)
+    os.replace(fd.name, path)
+    return True
+
+
+def _iter_json_list(items: Iterable[dict]) -> Iterator[str]:
+    # Produces the same output as json.dump of the whole list
+    yield '['
+    for i, item in enumerate(items):
+        if i:
+            yield ', '
+        yield json.dumps(item)
+    yield ']'
+
+
+def _to_legacy_json(record: dict) -> dict:
+    result = dict(record)
+    for key in ('issued_date', 'updated_date'):
+        result[key] = {'$date': int(record[key].timestamp() * 1000)}
+    return result
+
+
+def iter_errata_json(records: Iterable[dict]) -> Iterator[str]:
+    return _iter_json_list(_to_legacy_json(record) for record in records)
+
+
+def iter_modern_errata_json(records: Iterable[dict]) -> Iterator[str]:
+    yield '{"schema_version": %s, "data": ' % json.dumps(SCHEMA_VERSION)
+    yield from _iter_json_list(records)
+    yield '}'
+
+
+def _chunks(items: List[dict], size: int = RENDER_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def render_errata_pages(records: List[dict], html_dir: str) -> int:
+    rewritten = 0
+    for record in records:
+        errata_file = '{0}.html'.format(
+            record['updateinfo_id'].replace(':', '-')
+        )
+        rewritten += write_if_changed(
+            os.path.join(html_dir, errata_file),
+            [dump_errata_to_html(record)],
+        )
+    return rewritten
+
+
+def render_osv_records(
+    records: List[dict],
+    target_dir: str,
+    ecosystem: str,
+) -> int:
+    rewritten = 0
+    with tempfile.TemporaryDirectory(dir=target_dir, prefix='.') as tmp_dir:
+        export_errata_to_osv(
+            errata_records=records,
+            target_dir=tmp_dir,
+            ecosystem=ecosystem,
+        )
+        for entry in os.scandir(tmp_dir):
+            target_path = os.path.join(target_dir, entry.name)
+            if os.path.exists(target_path) and get_file_sha256(
+                target_path
+            ) == get_file_sha256(entry.path):
+                continue
+            os.chmod(entry.path, 0o644)
+            shutil.move(entry.path, target_path)
+            rewritten += 1
+    return rewritten
+
+
+def export_errata_pages(
+    executor: Executor,
+    records: List[dict],
+    html_dir: str,
+) -> int:
+    futures = [
+        executor.submit(render_errata_pages, chunk, html_dir)
+        for chunk in _chunks(records)
+    ]
+    return sum(future.result() for future in futures)
+
+
+def export_osv_records(
+    executor: Executor,
+    records: List[dict],
+    target_dir: str,
+    ecosystem: str,
+) -> int:
+    futures = [
+        executor.submit(render_osv_records, chunk, target_dir, ecosystem)
+        for chunk in _chunks(records)
+    ]
+    return sum(future.result() for future in futures)
@@ -0,0 +1,175 @@
+import asyncio
+import inspect
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+# Progress is logged at most once per this number of seconds
+PROGRESS_LOG_INTERVAL = 10
+
+
+@dataclass
+class RepoExportJob:
+    exporter: dict
+    sign_key_id: Optional[str] = None
+    # Key ids to check packages signatures with, not checked if None
+    verify_key_ids: Optional[List[str]] = None
+    export_path: Optional[str] = None
+    unchanged: bool = False
+    completed_stages: Set[str] = field(default_factory=set)
+    failed_stages: Set[str] = field(default_factory=set)
+
+    @property
+    def name(self) -> str:
+        return self.exporter['exporter_name']
+
+
+StageFunc = Callable[[RepoExportJob], Union[bool, Awaitable[bool]]]
+
+
+@dataclass
+class ExportStage:
+    name: str
+    func: StageFunc
+    concurrency: int = 1
+    depends_on: Tuple[str, ...] = ()
+    # Blocking stages are run in threads
+    blocking: bool = False
+
+
+class ExportScheduler:
+    """
+    Runs export stages of each repository as a small DAG: a stage starts
+    as soon as stages it depends on succeeded for the same repository,
+    stages of different repositories run concurrently within the stage
+    concurrency limit. Stages depending on a failed one are skipped.
+    """
+
+    def __init__(
+        self,
+        stages: Sequence[ExportStage],
+        logger: Optional[logging.Logger] = None,
+    ):
+        names = set()
+        for stage in stages:
+            unknown = set(stage.depends_on) - names
+            if unknown:
+                raise ValueError(
+                    f'Stage {stage.name} depends on unknown or later '
+                    f'stages: {", ".join(sorted(unknown))}'
+                )
+            names.add(stage.name)
+        self.stages = list(stages)
+        self.logger = logger or logging.getLogger(__name__)
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._total = 0
+        self._done = 0
+        self._started_at = 0.0
+        self._progress_logged_at = 0.0
+
+    async def run(self, jobs: Sequence[RepoExportJob]):
+        self._semaphores = {
+            stage.name: asyncio.Semaphore(stage.concurrency)
+            for stage in self.stages
+        }
+        self._total = len(jobs) * len(self.stages)
+        self._done = 0
+        self._started_at = self._progress_logged_at = time.monotonic()
+        await asyncio.gather(*(self._run_job(job) for job in jobs))
+        self.log_timings()
+
+    async def _run_job(self, job: RepoExportJob):
+        tasks = {}
+        for stage in self.stages:
+            dependencies = [tasks[name] for name in stage.depends_on]
+            tasks[stage.name] = asyncio.ensure_future(
+                self._run_stage(stage, job, dependencies)
+            )
+        await asyncio.gather(*tasks.values())
+
+    async def _run_stage(
+        self,
+        stage: ExportStage,
+        job: RepoExportJob,
+        dependencies: List[asyncio.Future],
+    ) -> bool:
+        if not all(await asyncio.gather(*dependencies)):
+            self._update_progress()
+            return False
+        async with self._semaphores[stage.name]:
+            started_at = time.monotonic()
+            try:
+                if stage.blocking:
+                    result = await asyncio.to_thread(stage.func, job)
+                else:
+                    result = stage.func(job)
+                    if inspect.isawaitable(result):
+                        result = await result
+            except Exception:
+                self.logger.exception(
+                    'Stage %s has failed for %s', stage.name, job.name
+                )
+                result = False
+            self.timings[stage.name].append(time.monotonic() - started_at)
+        if result:
+            job.completed_stages.add(stage.name)
+        else:
+            job.failed_stages.add(stage.name)
+        self._update_progress()
+        return bool(result)
+
+    def _update_progress(self):
+        self._done += 1
+        now = time.monotonic()
+        if (
+            self._done < self._total
+            and now - self._progress_logged_at < PROGRESS_LOG_INTERVAL
+        ):
+            return
+        self._progress_logged_at = now
+        elapsed = now - self._started_at
+        eta = elapsed / self._done * (self._total - self._done)
+        self.logger.info(
+            'Export progress: %d/%d stages (%.0f%%), elapsed %.0fs, '
+            'ETA %.0fs',
+            self._done,
+            self._total,
+            self._done / self._total * 100,
+            elapsed,
+            eta,
+        )
+
+    def get_timings(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {
+                'count': len(durations),
+                'total': sum(durations),
+                'avg': sum(durations) / len(durations),
+                'max': max(durations),
+            }
+            for name, durations in self.timings.items()
+        }
+
+    def log_timings(self):
+        for name, timing in self.get_timings().items():
+            self.logger.info(
+                'Stage %s: %d runs, total %.1fs, avg %.1fs, max %.1fs',
+                name,
+                timing['count'],
+                timing['total'],
+                timing['avg'],
+                timing['max'],
+            )
@@ -0,0 +1,132 @@
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Tuple
+
+STATE_FILE_NAME = 'export_state.sqlite3'
+# sqlite limits the number of query parameters
+QUERY_BATCH_SIZE = 500
+
+# Files are identified by inode, size and mtime (in nanoseconds)
+FileKey = Tuple[int, int, int]
+
+
+def get_file_sha256(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as fd:
+        for chunk in iter(lambda: fd.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class ExportStateStore:
+    """
+    State of previous exports kept in a sqlite file next to the repodata
+    cache: repository versions exported into each path with the checksum
+    of the resulting repomd.xml, and signer key ids of exported packages
+    by their inode, size and mtime.
+    """
+
+    def __init__(self, repodata_cache_dir: Path):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            str(Path(repodata_cache_dir, STATE_FILE_NAME)),
+            check_same_thread=False,
+        )
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS repositories ('
+                'export_path TEXT PRIMARY KEY, '
+                'repo_version TEXT NOT NULL, '
+                'repomd_sha256 TEXT NOT NULL)'
+            )
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS signers ('
+                'inode INTEGER NOT NULL, '
+                'size INTEGER NOT NULL, '
+                'mtime_ns INTEGER NOT NULL, '
+                'signer TEXT NOT NULL, '
+                'PRIMARY KEY (inode, size, mtime_ns))'
+            )
+
+    def close(self):
+        self._connection.close()
+
+    @staticmethod
+    def _get_repomd_path(export_path: str) -> Path:
+        return Path(export_path).parent.joinpath('repodata', 'repomd.xml')
+
+    def is_repository_unchanged(
+        self,
+        export_path: str,
+        repo_version: str,
+    ) -> bool:
+        """
+        Repository is unchanged if the same Pulp version was exported
+        before and its repomd.xml on disk wasn't modified since then.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT repo_version, repomd_sha256 FROM repositories '
+                'WHERE export_path = ?',
+                (export_path,),
+            ).fetchone()
+        if not row or row[0] != repo_version:
+            return False
+        repomd_path = self._get_repomd_path(export_path)
+        if not repomd_path.exists():
+            return False
+        return get_file_sha256(str(repomd_path)) == row[1]
+
+    def save_repository(self, export_path: str, repo_version: str):
+        repomd_path = self._get_repomd_path(export_path)
+        if not repomd_path.exists():
+            return
+        repomd_sha256 = get_file_sha256(str(repomd_path))
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO repositories '
+                '(export_path, repo_version, repomd_sha256) '
+                'VALUES (?, ?, ?)',
+                (export_path, repo_version, repomd_sha256),
+            )
+
+    def forget_repository(self, export_path: str):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'DELETE FROM repositories WHERE export_path = ?',
+                (export_path,),
+            )
+
+    def get_signers(
+        self,
+        files: Iterable[FileKey],
+    ) -> Dict[FileKey, str]:
+        """
+        Returns signer key ids of the packages checked during previous
+        exports, an empty key id means that the package isn't signed.
+        """
+        files = set(files)
+        inodes = list({inode for inode, _, _ in files})
+        signers = {}
+        with self._lock:
+            for i in range(0, len(inodes), QUERY_BATCH_SIZE):
+                batch = inodes[i : i + QUERY_BATCH_SIZE]
+                placeholders = ', '.join('?' for _ in batch)
+                for inode, size, mtime_ns, signer in self._connection.execute(
+                    'SELECT inode, size, mtime_ns, signer FROM signers '
+                    f'WHERE inode IN ({placeholders})',
+                    batch,
+                ):
+                    if (inode, size, mtime_ns) in files:
+                        signers[(inode, size, mtime_ns)] = signer
+        return signers
+
+    def save_signers(self, signers: Dict[FileKey, str]):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO signers '
+                '(inode, size, mtime_ns, signer) VALUES (?, ?, ?, ?)',
+                [key + (signer,) for key, signer in signers.items()],
+            )
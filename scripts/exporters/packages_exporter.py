@@ -6,16 +6,19 @@ import os
 import pwd
 import re
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
 from datetime import datetime, timezone
 from pathlib import Path
 from time import time
-from typing import Any, Dict, List, Literal, Optional, Tuple
+from typing import Any, Dict, List, Literal, Optional
 
 import aiohttp
 import jmespath
-import pgpy
-import rpm
 import sentry_sdk
 import sqlalchemy
 from fastapi_sqla import open_async_session
@@ -30,24 +33,31 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from alws import models
 from alws.config import settings
-from alws.constants import SignStatusEnum
 from alws.dependencies import get_async_db_key
 from alws.utils.errata import (
+    ErrataRecordsIndex,
     extract_errata_metadata,
     extract_errata_metadata_modern,
     find_metadata,
-    generate_errata_page,
     iter_updateinfo,
-    merge_errata_records,
-    merge_errata_records_modern,
 )
 from alws.utils.fastapi_sqla_setup import setup_all
-from alws.utils.osv import export_errata_to_osv
 from scripts.exporters.base_exporter import BasePulpExporter
+from scripts.exporters.errata_export import (
+    export_errata_pages,
+    export_osv_records,
+    iter_errata_json,
+    iter_modern_errata_json,
+    write_if_changed,
+)
+from scripts.exporters.export_scheduler import ExportStage, RepoExportJob
+from scripts.exporters.signature_verifier import SignatureVerifier
 
 KNOWN_SUBKEYS_CONFIG = os.path.abspath(
     os.path.expanduser("~/config/known_subkeys.json")
 )
+# Signature checks share the process pool of the signature verifier
+SIGNATURE_CHECK_CONCURRENCY = 4
 LOG_DIR = Path.home() / "exporter_logs"
 LOGGER_NAME = "packages-exporter"
 LOG_FILE = LOG_DIR / f"{LOGGER_NAME}_{int(time())}.log"
@@ -116,6 +126,16 @@ def parse_args():
         required=False,
         help="Method of exporting (choices: write, hardlink, symlink)",
     )
+    parser.add_argument(
+        "--full-export",
+        action="store_true",
+        default=False,
+        required=False,
+        help=(
+            "Export and post-process all repositories, even if they are"
+            " unchanged since the previous export"
+        ),
+    )
     parser.add_argument(
         "-osv-dir",
         type=str,
@@ -146,6 +166,7 @@ class PackagesExporter(BasePulpExporter):
         export_method: Literal['write', 'hardlink', 'symlink'] = "hardlink",
         export_path: str = settings.pulp_export_path,
         osv_dir: str = settings.pulp_export_path,
+        incremental: bool = True,
     ):
         super().__init__(
             repodata_cache_dir=repodata_cache_dir,
@@ -154,12 +175,14 @@ class PackagesExporter(BasePulpExporter):
             verbose=verbose,
             export_method=export_method,
             export_path=export_path,
+            incremental=incremental,
         )
 
         self.osv_dir = osv_dir
         self.current_user = self.get_current_username()
+        # Signature check errors, one JSON object per repository
         self.export_error_file = os.path.abspath(
-            os.path.expanduser("~/export.err")
+            os.path.expanduser("~/export.err.jsonl")
         )
         if os.path.exists(self.export_error_file):
             os.remove(self.export_error_file)
@@ -167,6 +190,11 @@ class PackagesExporter(BasePulpExporter):
         if os.path.exists(KNOWN_SUBKEYS_CONFIG):
             with open(KNOWN_SUBKEYS_CONFIG, "rt") as f:
                 self.known_subkeys = json.load(f)
+        self.signature_verifier = SignatureVerifier(
+            known_subkeys=self.known_subkeys,
+            export_state=self.export_state,
+        )
+        self._report_lock = threading.Lock()
 
     @staticmethod
     def get_current_username():
@@ -174,7 +202,8 @@ class PackagesExporter(BasePulpExporter):
 
     def process_osv_data(
         self,
-        errata_cache: List[Dict[str, Any]],
+        executor: ProcessPoolExecutor,
+        errata_records: List[Dict[str, Any]],
         platform: str,
     ):
         osv_distr_mapping = {
@@ -190,12 +219,13 @@ class PackagesExporter(BasePulpExporter):
         )
         if not os.path.exists(osv_target_dir):
             os.makedirs(osv_target_dir, exist_ok=True)
-        export_errata_to_osv(
-            errata_records=errata_cache,
+        rewritten = export_osv_records(
+            executor,
+            errata_records,
             target_dir=osv_target_dir,
             ecosystem=osv_distr_mapping[platform],
         )
-        self.logger.debug("OSV data are generated")
+        self.logger.debug("OSV data are generated, %d files changed", rewritten)
 
     # TODO: Use direct function call to alws.crud.errata_get_oval_xml
     async def get_oval_xml(
@@ -267,96 +297,45 @@ class PackagesExporter(BasePulpExporter):
 
         return feed.rss_str(pretty=True).decode('utf-8')
 
-    def check_rpms_signature(self, repository_path: str, sign_keys: list):
+    def check_rpms_signature(self, repository_path: str, key_ids: List[str]):
         self.logger.info("Checking signature for %s repo", repository_path)
-        key_ids_lower = [i.keyid.lower() for i in sign_keys]
-        ts = rpm.TransactionSet()
-        ts.setVSFlags(rpm._RPMVSF_NOSIGNATURES)
-
-        def check(pkg_path: str) -> Tuple[SignStatusEnum, str]:
-            if not os.path.exists(pkg_path):
-                return SignStatusEnum.READ_ERROR, ""
-
-            with open(pkg_path, "rb") as fd:
-                header = ts.hdrFromFdno(fd)
-                signature = header[rpm.RPMTAG_SIGGPG]
-                sig = ""
-                if not signature:
-                    signature = header[rpm.RPMTAG_SIGPGP]
-                if not signature:
-                    return SignStatusEnum.NO_SIGNATURE, ""
-
-                pgp_msg = pgpy.PGPMessage.from_blob(signature)
-                for signature in pgp_msg.signatures:
-                    sig = signature.signer.lower()
-                    if sig in key_ids_lower:
-                        return SignStatusEnum.SUCCESS, sig
-                    for key_id in key_ids_lower:
-                        sub_keys = self.known_subkeys.get(key_id, [])
-                        if sig in sub_keys:
-                            return SignStatusEnum.SUCCESS, sig
-
-                return SignStatusEnum.WRONG_SIGNATURE, sig
-
-        errored_packages = set()
-        no_signature_packages = set()
-        wrong_signature_packages = set()
-        futures = {}
-
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            for package in os.listdir(repository_path):
-                package_path = os.path.join(repository_path, package)
-                if not package_path.endswith(".rpm"):
-                    self.logger.debug(
-                        "Skipping non-RPM file or directory: %s",
-                        package_path,
-                    )
-                    continue
-
-                futures[executor.submit(check, package_path)] = package_path
-
-            for future in as_completed(futures):
-                package_path = futures[future]
-                result, pkg_sig = future.result()
-                if result == SignStatusEnum.READ_ERROR:
-                    errored_packages.add(package_path)
-                elif result == SignStatusEnum.NO_SIGNATURE:
-                    no_signature_packages.add(package_path)
-                elif result == SignStatusEnum.WRONG_SIGNATURE:
-                    wrong_signature_packages.add(f"{package_path} {pkg_sig}")
-
-        if (
-            errored_packages
-            or no_signature_packages
-            or wrong_signature_packages
-        ):
-            if not os.path.exists(self.export_error_file):
-                mode = "wt"
-            else:
-                mode = "at"
-            lines = [f"Errors when checking packages in {repository_path}"]
-            if errored_packages:
-                lines.append("Packages that we cannot get information about:")
-                lines.extend(list(errored_packages))
-            if no_signature_packages:
-                lines.append("Packages without signature:")
-                lines.extend(list(no_signature_packages))
-            if wrong_signature_packages:
-                lines.append("Packages with wrong signature:")
-                lines.extend(list(wrong_signature_packages))
-            lines.append("\n")
-            with open(self.export_error_file, mode=mode) as f:
-                f.write("\n".join(lines))
-
+        report = self.signature_verifier.verify_repository(
+            repository_path, key_ids
+        )
+        if report.has_errors:
+            with self._report_lock, open(self.export_error_file, "at") as f:
+                f.write(json.dumps(report.as_dict()) + "\n")
         self.logger.info("Signature check is done")
 
-    async def export_repos_from_pulp(
+    def _check_signatures(self, job: RepoExportJob) -> bool:
+        if job.verify_key_ids is None:
+            return True
+        if not os.path.exists(job.export_path):
+            self.logger.error("Path %s does not exist", job.export_path)
+            return True
+        self.check_rpms_signature(job.export_path, job.verify_key_ids)
+        self.logger.info("%s packages signatures are checked", job.export_path)
+        return True
+
+    def get_export_stages(self) -> List[ExportStage]:
+        # Packages signatures are checked while repodata are regenerated
+        return super().get_export_stages() + [
+            ExportStage(
+                "signature_check",
+                self._check_signatures,
+                concurrency=SIGNATURE_CHECK_CONCURRENCY,
+                depends_on=("pulp_export",),
+                blocking=True,
+            ),
+        ]
+
+    async def get_platforms_export_jobs(
         self,
+        db_sign_keys: List[dict],
         platform_names: Optional[List[str]] = None,
         repo_ids: Optional[List[int]] = None,
         arches: Optional[List[str]] = None,
-    ) -> Tuple[List[str], Dict[int, str]]:
-        platforms_dict = {}
+    ) -> List[RepoExportJob]:
         msg, msg_values = (
             "Start exporting packages for following platforms:\n%s",
             platform_names,
@@ -385,54 +364,39 @@ class PackagesExporter(BasePulpExporter):
             db_platforms = await db.execute(query)
         db_platforms = db_platforms.scalars().all()
 
-        final_export_paths = []
+        jobs = []
+        scheduled_repo_ids = set()
         for db_platform in db_platforms:
-            repo_ids_to_export = []
-            platforms_dict[db_platform.id] = []
+            repo_ids_to_export = set()
             for repo in db_platform.repos:
                 if (repo_ids is not None and repo.id not in repo_ids) or (
                     repo.production is False
                 ):
                     continue
-                if arches is not None:
-                    if repo.arch in arches:
-                        platforms_dict[db_platform.id].append(repo.export_path)
-                        repo_ids_to_export.append(repo.id)
-                else:
-                    platforms_dict[db_platform.id].append(repo.export_path)
-                    repo_ids_to_export.append(repo.id)
-            exported_paths = await self.export_repositories(
-                list(set(repo_ids_to_export))
-            )
-            final_export_paths.extend(exported_paths)
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                futures = {}
-                for repo_path in exported_paths:
-                    if not os.path.exists(repo_path):
-                        self.logger.error("Path %s does not exist", repo_path)
-                        continue
-                    futures[
-                        executor.submit(
-                            self.check_rpms_signature,
-                            repo_path,
-                            db_platform.sign_keys,
-                        )
-                    ] = repo_path
-                for future in as_completed(futures):
-                    repo_path = futures[future]
-                    self.logger.info(
-                        '%s packages signatures are checked', repo_path
-                    )
-            self.logger.debug(
-                "All repositories exported in following paths:\n%s",
-                "\n".join((str(path) for path in exported_paths)),
+                if arches is not None and repo.arch not in arches:
+                    continue
+                if repo.id in scheduled_repo_ids:
+                    continue
+                repo_ids_to_export.add(repo.id)
+            scheduled_repo_ids.update(repo_ids_to_export)
+            jobs.extend(
+                await self.create_export_jobs(
+                    list(repo_ids_to_export),
+                    sign_key_id=get_platform_sign_key_id(
+                        db_sign_keys, db_platform.id
+                    ),
+                    verify_key_ids=[
+                        sign_key.keyid for sign_key in db_platform.sign_keys
+                    ],
+                )
             )
-        return final_export_paths, platforms_dict
+        return jobs
 
-    async def export_repos_from_release(
+    async def get_release_export_jobs(
         self,
+        db_sign_keys: List[dict],
         release_id: int,
-    ) -> Tuple[List[str], int]:
+    ) -> List[RepoExportJob]:
         self.logger.info(
             "Start exporting packages from release id=%s",
             release_id,
@@ -447,52 +411,32 @@ class PackagesExporter(BasePulpExporter):
             "packages[].repositories[].id",
             db_release.plan,
         )
-        repo_ids = list(set(repo_ids))
-        exported_paths = await self.export_repositories(repo_ids)
-        return exported_paths, db_release.platform_id
+        return await self.create_export_jobs(
+            list(set(repo_ids)),
+            sign_key_id=get_platform_sign_key_id(
+                db_sign_keys, db_release.platform_id
+            ),
+        )
 
-async def sign_repodata(
-    exporter: PackagesExporter,
-    exported_paths: List[str],
-    platforms_dict: dict,
-    db_sign_keys: list,
-    key_id_by_platform: Optional[str] = None,
-):
-    tasks = []
-    token = await exporter.get_sign_server_token()
-
-    for repo_path in exported_paths:
-        path = Path(repo_path)
-        parent_dir = path.parent
-        repodata = parent_dir / "repodata"
-        if not os.path.exists(repo_path):
-            continue
-
-        key_id = key_id_by_platform or None
-        for platform_id, platform_repos in platforms_dict.items():
-            for repo_export_path in platform_repos:
-                if repo_export_path in repo_path:
-                    key_id = next(
-                        (
-                            sign_key["keyid"]
-                            for sign_key in db_sign_keys
-                            if platform_id in sign_key["platform_ids"]
-                        ),
-                        None,
-                    )
-                    break
-        exporter.logger.info('Key ID: %s', str(key_id))
-        tasks.append(exporter.repomd_signer(repodata, key_id, token))
 
-    await asyncio.gather(*tasks)
+def get_platform_sign_key_id(
+    db_sign_keys: List[dict],
+    platform_id: int,
+) -> Optional[str]:
+    return next(
+        (
+            sign_key["keyid"]
+            for sign_key in db_sign_keys
+            if platform_id in sign_key["platform_ids"]
+        ),
+        None,
+    )
 
 
-def extract_errata(repo_path: str) -> Tuple[List[dict], List[dict]]:
-    errata_records: List[dict] = []
-    modern_errata_records: List[dict] = []
+def extract_errata(repo_path: str, errata_index: ErrataRecordsIndex):
     if not os.path.exists(repo_path):
         logging.debug("%s is missing, skipping", repo_path)
-        return errata_records, modern_errata_records
+        return
 
     path = Path(repo_path)
     parent_dir = path.parent
@@ -500,29 +444,17 @@ def extract_errata(repo_path: str) -> Tuple[List[dict], List[dict]]:
     errata_file = find_metadata(str(repodata), "updateinfo")
     if not errata_file:
         logging.debug("updateinfo.xml is missing, skipping")
-        return errata_records, modern_errata_records
+        return
 
     for record in iter_updateinfo(errata_file):
-        errata_records.append(extract_errata_metadata(record))
-        modern_errata_records.extend(
-            extract_errata_metadata_modern(record)["data"]
-        )
-    return errata_records, modern_errata_records
-
-
-def repo_post_processing(exporter: PackagesExporter, repo_path: str) -> bool:
-    result = True
-    try:
-        exporter.regenerate_repo_metadata(str(Path(repo_path).parent))
-    except Exception as e:
-        exporter.logger.exception("Post-processing failed: %s", str(e))
-        result = False
-    return result
+        errata_index.add_record(extract_errata_metadata(record))
+        for modern_record in extract_errata_metadata_modern(record)["data"]:
+            errata_index.add_modern_record(modern_record)
 
 
 def export_errata_and_oval(
     exporter: PackagesExporter,
-    platform_errata_cache: dict,
+    platform_errata_cache: Dict[str, ErrataRecordsIndex],
     platform_names: Optional[List[str]] = None,
 ):
     if not platform_names:
@@ -536,106 +468,139 @@ def export_errata_and_oval(
         )
         if not os.path.exists(errata_export_base_path):
             os.mkdir(errata_export_base_path)
-        for platform in platform_names:
-            errata_cache = platform_errata_cache.get(platform, {}).get('cache')
-            if not errata_cache:
-                exporter.logger.debug('No errata cache for %s platform, skipping', platform)
-                continue
-            platform_path = os.path.join(errata_export_base_path, platform)
-            if not os.path.exists(platform_path):
-                os.mkdir(platform_path)
-            html_path = os.path.join(platform_path, "html")
-            if not os.path.exists(html_path):
-                os.mkdir(html_path)
-            exporter.process_osv_data(errata_cache, platform)
-            exporter.logger.debug("Generating HTML errata pages")
-            for record in errata_cache:
-                generate_errata_page(record, html_path)
-            exporter.logger.debug("HTML pages are generated")
-            for item in errata_cache:
-                item["issued_date"] = {
-                    "$date": int(item["issued_date"].timestamp() * 1000)
-                }
-                item["updated_date"] = {
-                    "$date": int(item["updated_date"].timestamp() * 1000)
-                }
-            exporter.logger.debug("Dumping errata data into JSON")
-            with open(os.path.join(platform_path, "errata.json"), "w") as fd:
-                json.dump(errata_cache, fd)
-            with open(
-                os.path.join(platform_path, "errata.full.json"), "w"
-            ) as fd:
-                json.dump(platform_errata_cache[platform]["modern_cache"], fd)
-            exporter.logger.debug("JSON dump is done")
-            exporter.logger.debug("Generating OVAL data")
-            oval = sync(
-                # aiohttp is not able to send booleans in params.
-                # For this reason, we're passing only_released as a string,
-                # which in turn will be converted into boolean on backend
-                # side by fastapi/pydantic.
-                exporter.get_oval_xml(platform, only_released=True)
-            )
-            with open(os.path.join(platform_path, "oval.xml"), "w") as fd:
-                fd.write(oval)
-            exporter.logger.debug("OVAL is generated")
-
-            exporter.logger.debug("Generating RSS feed for %s", platform)
-            rss = sync(
-                exporter.generate_rss(
+        with ProcessPoolExecutor() as executor:
+            for platform in platform_names:
+                errata_index = platform_errata_cache.pop(platform, None)
+                if not errata_index:
+                    exporter.logger.debug(
+                        'No errata cache for %s platform, skipping', platform
+                    )
+                    continue
+                export_platform_errata(
+                    exporter,
+                    executor,
+                    errata_export_base_path,
                     platform,
-                    platform_errata_cache[platform]["modern_cache"],
+                    errata_index,
                 )
-            )
-            with open(os.path.join(platform_path, "errata.rss"), "w") as fd:
-                fd.write(rss)
-            exporter.logger.debug("RSS generation for %s is done", platform)
     except Exception:
         exporter.logger.exception("Error happened:\n")
 
 
+def export_platform_errata(
+    exporter: PackagesExporter,
+    executor: ProcessPoolExecutor,
+    errata_export_base_path: str,
+    platform: str,
+    errata_index: ErrataRecordsIndex,
+):
+    platform_path = os.path.join(errata_export_base_path, platform)
+    if not os.path.exists(platform_path):
+        os.mkdir(platform_path)
+    html_path = os.path.join(platform_path, "html")
+    if not os.path.exists(html_path):
+        os.mkdir(html_path)
+    errata_records = errata_index.records
+    exporter.process_osv_data(executor, errata_records, platform)
+    exporter.logger.debug("Generating HTML errata pages")
+    # HTML pages and errata.json list packages ordered by arch
+    for record in errata_records:
+        record["pkglist"]["packages"].sort(key=lambda x: x["arch"])
+    rewritten = export_errata_pages(executor, errata_records, html_path)
+    exporter.logger.debug("HTML pages are generated, %d changed", rewritten)
+    exporter.logger.debug("Dumping errata data into JSON")
+    write_if_changed(
+        os.path.join(platform_path, "errata.json"),
+        iter_errata_json(errata_records),
+    )
+    modern_records = errata_index.modern_records
+    write_if_changed(
+        os.path.join(platform_path, "errata.full.json"),
+        iter_modern_errata_json(modern_records["data"]),
+    )
+    exporter.logger.debug("JSON dump is done")
+    exporter.logger.debug("Generating OVAL data")
+    oval = sync(
+        # aiohttp is not able to send booleans in params.
+        # For this reason, we're passing only_released as a string,
+        # which in turn will be converted into boolean on backend
+        # side by fastapi/pydantic.
+        exporter.get_oval_xml(platform, only_released=True)
+    )
+    write_if_changed(os.path.join(platform_path, "oval.xml"), [oval])
+    exporter.logger.debug("OVAL is generated")
+
+    exporter.logger.debug("Generating RSS feed for %s", platform)
+    rss = sync(exporter.generate_rss(platform, modern_records))
+    with open(os.path.join(platform_path, "errata.rss"), "w") as fd:
+        fd.write(rss)
+    exporter.logger.debug("RSS generation for %s is done", platform)
+
+
+def get_repo_platform(repo_path: str) -> str:
+    repo_match = re.search(r"/(almalinux|vault)/(\d+)/", repo_path)
+    if repo_match:
+        return f"AlmaLinux-{repo_match.group(2)}"
+    return "AlmaLinux-8"
+
+
 def extract_errata_from_exported_paths(
     exporter: PackagesExporter,
     exported_paths: List[str],
-) -> dict:
-    platform_errata_cache = {}
+) -> Dict[str, ErrataRecordsIndex]:
+    platform_errata_cache = {
+        platform: ErrataRecordsIndex()
+        for platform in {get_repo_platform(path) for path in exported_paths}
+    }
     with ThreadPoolExecutor(max_workers=4) as executor:
+        # Records are merged into the platform index while parsing,
+        # so only unique records are kept in memory
         errata_futures = {
-            executor.submit(extract_errata, exp_path): exp_path
+            executor.submit(
+                extract_errata,
+                exp_path,
+                platform_errata_cache[get_repo_platform(exp_path)],
+            ): exp_path
             for exp_path in exported_paths
         }
 
         exporter.logger.debug("Starting errata extraction")
         for future in as_completed(errata_futures):
-            repo_path = errata_futures[future]
-            errata_records, modern_errata_records = future.result()
-            if errata_records or modern_errata_records:
-                exporter.logger.info(
-                    "Extracted errata records from %s",
-                    repo_path,
-                )
-                repo_match = re.search(r"/(almalinux|vault)/(\d+)/", repo_path)
-                if repo_match:
-                    version = repo_match.group(2)
-                    platform = f"AlmaLinux-{version}"
-                else:
-                    platform = "AlmaLinux-8"
-                if platform not in platform_errata_cache:
-                    platform_errata_cache[platform] = {
-                        "cache": [],
-                        "modern_cache": {
-                            "data": [],
-                        },
-                    }
-                platform_cache = platform_errata_cache[platform]
-                platform_cache["cache"] = merge_errata_records(
-                    platform_cache["cache"], errata_records
-                )
-                platform_cache["modern_cache"] = merge_errata_records_modern(
-                    platform_cache["modern_cache"],
-                    {"data": modern_errata_records},
-                )
+            future.result()
+            exporter.logger.info(
+                "Extracted errata records from %s",
+                errata_futures[future],
+            )
         exporter.logger.debug("Errata extraction completed")
-    return platform_errata_cache
+    return {
+        platform: errata_index
+        for platform, errata_index in platform_errata_cache.items()
+        if errata_index
+    }
+
+
+async def export_repositories(
+    exporter: PackagesExporter,
+    args: argparse.Namespace,
+) -> List[RepoExportJob]:
+    db_sign_keys = await exporter.get_sign_keys()
+    jobs = []
+    if args.release_id:
+        jobs.extend(
+            await exporter.get_release_export_jobs(
+                db_sign_keys, args.release_id
+            )
+        )
+    if args.platform_names or args.repo_ids:
+        jobs.extend(
+            await exporter.get_platforms_export_jobs(
+                db_sign_keys,
+                platform_names=args.platform_names,
+                arches=args.arches,
+                repo_ids=args.repo_ids,
+            )
+        )
+    return await exporter.run_export_jobs(jobs)
 
 
 def main():
@@ -643,9 +608,6 @@ def main():
     init_sentry()
     sync(setup_all())
 
-    platforms_dict = {}
-    key_id_by_platform = None
-    exported_paths = []
     exporter = PackagesExporter(
         repodata_cache_dir=args.cache_dir,
         logger_name=LOGGER_NAME,
@@ -653,67 +615,30 @@ def main():
         verbose=args.verbose,
         export_method=args.export_method,
         osv_dir=args.osv_dir,
+        incremental=not args.full_export,
     )
 
-    db_sign_keys = sync(exporter.get_sign_keys())
-    if args.release_id:
-        exported_paths, platform_id = sync(
-            exporter.export_repos_from_release(args.release_id)
-        )
-        key_id_by_platform = next(
-            (
-                sign_key["keyid"]
-                for sign_key in db_sign_keys
-                if platform_id in sign_key["platform_ids"]
-            ),
-            None,
-        )
-
-    if args.platform_names or args.repo_ids:
-        exported_paths, platforms_dict = sync(
-            exporter.export_repos_from_pulp(
-                platform_names=args.platform_names,
-                arches=args.arches,
-                repo_ids=args.repo_ids,
+    jobs = sync(export_repositories(exporter, args))
+    exporter.signature_verifier.close()
+    for job in jobs:
+        if job.failed_stages:
+            exporter.logger.error(
+                "%s export has failed on stages: %s",
+                job.name,
+                ", ".join(sorted(job.failed_stages)),
             )
-        )
-
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        post_processing_futures = {
-            executor.submit(
-                repo_post_processing,
-                exporter,
-                repo_path,
-            ): repo_path
-            for repo_path in exported_paths
-        }
-        for future in as_completed(post_processing_futures):
-            repo_path = post_processing_futures[future]
-            result = future.result()
-            if result:
-                exporter.logger.info(
-                    "%s post-processing is successful",
-                    repo_path,
-                )
-            else:
-                exporter.logger.error(
-                    "%s post-processing has failed",
-                    repo_path,
-                )
+        # Unchanged repositories keep metadata and signatures from
+        # the previous export
+        elif not job.unchanged:
+            exporter.save_export_state(job.export_path)
 
     platform_errata_cache = extract_errata_from_exported_paths(
         exporter=exporter,
-        exported_paths=exported_paths,
+        exported_paths=[job.export_path for job in jobs if job.export_path],
     )
-
-    sync(
-        sign_repodata(
-            exporter,
-            exported_paths,
-            platforms_dict,
-            db_sign_keys,
-            key_id_by_platform=key_id_by_platform,
-        )
+    exporter.logger.info(
+        "Removed %d unused repodata files from the store",
+        exporter.repodata_store.prune(),
     )
 
     export_errata_and_oval(
@@ -1,9 +1,8 @@
 import argparse
 import asyncio
-import os
 import sys
 from pathlib import Path
-from typing import List, Literal
+from typing import List, Literal, Optional
 
 from sqlalchemy import select
 from sqlalchemy.orm import joinedload
@@ -14,11 +13,11 @@ from alws.config import settings
 from alws.dependencies import get_async_db_session
 from alws.errors import DataNotFoundError
 from alws.models import Platform, Product, Repository
-from alws.utils import pulp_client
 from alws.utils.fastapi_sqla_setup import setup_all
 from scripts.exporters.base_exporter import BasePulpExporter
+from scripts.exporters.export_scheduler import ExportStage, RepoExportJob
 
-SEMAPHORE = asyncio.Semaphore(4)
+REMOVE_PACKAGES_CONCURRENCY = 4
 
 
 def parse_args():
@@ -111,6 +110,7 @@ class ProductExporter(BasePulpExporter):
         verbose: bool = False,
         export_method: Literal['write', 'hardlink', 'symlink'] = 'hardlink',
         export_path: str = settings.pulp_export_path,
+        remove_packages: Optional[List[str]] = None,
     ):
         super().__init__(
             repodata_cache_dir=repodata_cache_dir,
@@ -120,13 +120,36 @@ class ProductExporter(BasePulpExporter):
             export_method=export_method,
             export_path=export_path,
         )
+        self.remove_packages = remove_packages
+
+    def _remove_packages(self, job: RepoExportJob) -> bool:
+        self.remove_packages_from_repo(job.export_path, self.remove_packages)
+        return True
+
+    def get_export_stages(self) -> List[ExportStage]:
+        stages = super().get_export_stages()
+        if not self.remove_packages:
+            return stages
+        # Packages are removed before createrepo_c regenerates repodata
+        remove_stage = ExportStage(
+            'remove_packages',
+            self._remove_packages,
+            concurrency=REMOVE_PACKAGES_CONCURRENCY,
+            depends_on=('pulp_export',),
+            blocking=True,
+        )
+        for stage in stages:
+            if stage.name == 'createrepo_c':
+                stage.depends_on += (remove_stage.name,)
+        return [stages[0], remove_stage, *stages[1:]]
 
     async def export_product_repos(
         self,
         product_name: str,
         distr_name: str,
         arches: List[str],
-    ):
+        sign_key_id: Optional[str] = None,
+    ) -> List[RepoExportJob]:
         self.logger.info(
             'Start exporting packages from product: %s',
             product_name,
@@ -150,9 +173,11 @@ class ProductExporter(BasePulpExporter):
             product = (await session.execute(query)).scalars().first()
         if not product:
             raise DataNotFoundError(f'Cannot find product: {product_name}')
-        return await self.export_repositories(
-            list({repo.id for repo in product.repositories})
+        jobs = await self.create_export_jobs(
+            list({repo.id for repo in product.repositories}),
+            sign_key_id=sign_key_id,
         )
+        return await self.run_export_jobs(jobs)
 
     async def get_sign_key_id(self, key_id):
         sign_keys = await self.get_sign_keys()
@@ -166,41 +191,6 @@ class ProductExporter(BasePulpExporter):
         )
 
 
-async def repo_post_processing(
-    exporter: ProductExporter,
-    repo_path: str,
-) -> bool:
-    async with SEMAPHORE:
-        result = False
-        try:
-            exporter.regenerate_repo_metadata(str(Path(repo_path).parent))
-        except Exception as exc:
-            result = False
-            exporter.logger.exception("Post-processing failed: %s", str(exc))
-        return result
-
-
-async def sign_repodata(
-    exporter: ProductExporter,
-    exported_paths: List[str],
-    key_id: str,
-):
-    tasks = []
-    token = await exporter.get_sign_server_token()
-
-    for repo_path in exported_paths:
-        path = Path(repo_path)
-        parent_dir = path.parent
-        repodata = parent_dir / "repodata"
-        if not os.path.exists(repo_path):
-            continue
-
-        exporter.logger.info('Key ID: %s', str(key_id))
-        tasks.append(exporter.repomd_signer(repodata, key_id, token))
-
-    await asyncio.gather(*tasks)
-
-
 async def main():
     args = parse_args()
     await setup_all()
@@ -209,6 +199,7 @@ async def main():
         verbose=args.verbose,
         export_method=args.export_method,
         log_file_path=args.log,
+        remove_packages=args.remove_packages,
     )
 
     sign_key_id = None
@@ -218,23 +209,19 @@ async def main():
             err = "Couldn't retrieve the '{args.sign_with}' sign key"
             raise Exception(f'Aborting product export, error was: {err}')
 
-    pulp_client.PULP_SEMAPHORE = asyncio.Semaphore(10)
-    exported_paths = await exporter.export_product_repos(
+    jobs = await exporter.export_product_repos(
         product_name=args.product,
         distr_name=args.distribution,
         arches=args.arches,
+        sign_key_id=sign_key_id,
     )
-
-    if args.remove_packages:
-        for path in exported_paths:
-            exporter.remove_packages_from_repo(path, args.remove_packages)
-
-    await asyncio.gather(
-        *(repo_post_processing(exporter, path) for path in exported_paths)
-    )
-
-    if sign_key_id:
-        await sign_repodata(exporter, exported_paths, sign_key_id)
+    for job in jobs:
+        if job.failed_stages:
+            exporter.logger.error(
+                '%s export has failed on stages: %s',
+                job.name,
+                ', '.join(sorted(job.failed_stages)),
+            )
 
 
 if __name__ == '__main__':
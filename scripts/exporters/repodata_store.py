@@ -0,0 +1,145 @@
+import errno
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Optional, Union
+
+STORE_DIR_NAME = 'objects'
+# Stored files copied instead of linked keep paths of their copies here
+COPIES_DIR_NAME = 'copies'
+# createrepo_c and Pulp prefix repodata file names with their checksum
+CHECKSUM_FILE_NAME_RE = re.compile(r'^(?P<checksum>[0-9a-f]{32,128})-.+$')
+
+
+def get_file_checksum(file_name: str) -> Optional[str]:
+    match = CHECKSUM_FILE_NAME_RE.match(file_name)
+    return match.group('checksum') if match else None
+
+
+def link_or_copy(src: Union[str, Path], dest: Union[str, Path]) -> bool:
+    """Hardlinks the file, copies it across filesystems, returns False then."""
+    try:
+        os.link(src, dest)
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise
+        shutil.copy2(src, dest)
+        return False
+    return True
+
+
+class RepodataStore:
+    """
+    Content-addressed store of repodata files inside the repodata cache.
+
+    Files with a checksum in their name are kept once and hardlinked into
+    export trees and repodata caches, so unchanged primary, filelists,
+    other, etc. files are never downloaded or copied again. Files without
+    a checksum (repomd.xml and its signature) are always copied.
+
+    Files can't be hardlinked across filesystems, they are copied then
+    and the copies are recorded, so that prune keeps the stored file
+    while any of them exists.
+    """
+
+    def __init__(self, repodata_cache_dir: Path):
+        self.root = Path(repodata_cache_dir, STORE_DIR_NAME)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.copies_root = Path(repodata_cache_dir, COPIES_DIR_NAME)
+
+    def _get_object_path(self, file_name: str) -> Optional[Path]:
+        checksum = get_file_checksum(file_name)
+        if not checksum:
+            return None
+        return self.root.joinpath(checksum[:2], file_name)
+
+    def _get_copies_path(self, object_path: Path) -> Path:
+        return self.copies_root.joinpath(
+            object_path.parent.name,
+            object_path.name,
+        )
+
+    def _add_copy(self, object_path: Path, copy_path: Path):
+        copies_path = self._get_copies_path(object_path)
+        copies_path.parent.mkdir(parents=True, exist_ok=True)
+        with copies_path.open('a') as copies_file:
+            copies_file.write(f'{copy_path.absolute()}\n')
+
+    def _has_copies(self, object_path: Path) -> bool:
+        copies_path = self._get_copies_path(object_path)
+        if not copies_path.exists():
+            return False
+        # File names contain the checksum, an existing copy has the same
+        # content as the stored file
+        copies = {
+            line
+            for line in copies_path.read_text().splitlines()
+            if Path(line).exists()
+        }
+        if not copies:
+            copies_path.unlink()
+            return False
+        copies_path.write_text(''.join(f'{line}\n' for line in sorted(copies)))
+        return True
+
+    def link(self, file_name: str, dest_dir: Path) -> bool:
+        """
+        Links the stored file into the directory, returns False
+        if the file isn't stored.
+        """
+        object_path = self._get_object_path(file_name)
+        if not object_path or not object_path.exists():
+            return False
+        dest = dest_dir.joinpath(file_name)
+        if dest.exists():
+            if dest.stat().st_ino == object_path.stat().st_ino:
+                return True
+            dest.unlink()
+        if not link_or_copy(object_path, dest):
+            self._add_copy(object_path, dest)
+        return True
+
+    def add(self, path: Path):
+        object_path = self._get_object_path(path.name)
+        if not object_path or object_path.exists():
+            return
+        object_path.parent.mkdir(exist_ok=True)
+        try:
+            linked = link_or_copy(path, object_path)
+        except FileExistsError:
+            # Added concurrently by another export
+            return
+        if not linked:
+            self._add_copy(object_path, path)
+
+    def sync_directory(self, src_dir: Path, dest_dir: Path):
+        """
+        Makes dest_dir a copy of src_dir: checksum-named files are stored
+        and linked, files absent in src_dir are removed from dest_dir.
+        """
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        src_names = set()
+        for src in src_dir.iterdir():
+            if not src.is_file():
+                continue
+            src_names.add(src.name)
+            self.add(src)
+            if self.link(src.name, dest_dir):
+                continue
+            shutil.copy2(src, dest_dir.joinpath(src.name))
+        for dest in dest_dir.iterdir():
+            if dest.name not in src_names and dest.is_file():
+                dest.unlink()
+
+    def prune(self) -> int:
+        """Removes stored files which aren't linked or copied anywhere."""
+        removed = 0
+        for object_path in self.root.glob('*/*'):
+            if object_path.stat().st_nlink > 1:
+                continue
+            if self._has_copies(object_path):
+                continue
+            object_path.unlink()
+            removed += 1
+        return removed
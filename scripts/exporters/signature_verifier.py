@@ -0,0 +1,264 @@
+import itertools
+import mmap
+import os
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from alws.constants import SignStatusEnum
+from scripts.exporters.export_state import ExportStateStore, FileKey
+
+RPM_LEAD_SIZE = 96
+RPM_HEADER_MAGIC = b'\x8e\xad\xe8\x01'
+RPM_BIN_TYPE = 7
+# GPG and PGP payload signatures are preferred as before,
+# RSA and DSA header-only signatures are used if they are absent
+SIGNATURE_TAGS = (1005, 1002, 268, 267)
+PGP_SIGNATURE_PACKET = 2
+PGP_ISSUER_SUBPACKET = 16
+PGP_ISSUER_FINGERPRINT_SUBPACKET = 33
+# Packages sent to a worker process at once
+VERIFY_CHUNK_SIZE = 64
+# Packages looked up in the state store and verified at once
+VERIFY_BATCH_SIZE = 2000
+
+
+def read_signature(path: str) -> Optional[bytes]:
+    """
+    Reads the OpenPGP signature from the signature header of RPM package,
+    only the lead and the signature header are mapped into memory.
+    """
+    with open(path, 'rb') as fd, mmap.mmap(
+        fd.fileno(), 0, access=mmap.ACCESS_READ
+    ) as data:
+        header_start = RPM_LEAD_SIZE
+        if data[header_start : header_start + 4] != RPM_HEADER_MAGIC:
+            raise ValueError(f'{path} is not an RPM package')
+        index_count, store_size = struct.unpack(
+            '>II', data[header_start + 8 : header_start + 16]
+        )
+        index_start = header_start + 16
+        store_start = index_start + index_count * 16
+        entries = {}
+        for i in range(index_count):
+            entry_start = index_start + i * 16
+            tag, tag_type, offset, count = struct.unpack(
+                '>iiii', data[entry_start : entry_start + 16]
+            )
+            if tag in SIGNATURE_TAGS and tag_type == RPM_BIN_TYPE:
+                entries[tag] = (offset, count)
+        for tag in SIGNATURE_TAGS:
+            if tag not in entries:
+                continue
+            offset, count = entries[tag]
+            if offset + count > store_size:
+                raise ValueError(f'{path} has corrupted signature header')
+            data_start = store_start + offset
+            return bytes(data[data_start : data_start + count])
+    return None
+
+
+def _read_subpacket_length(data: bytes, pos: int) -> Tuple[int, int]:
+    first = data[pos]
+    if first < 192:
+        return first, pos + 1
+    if first < 255:
+        return ((first - 192) << 8) + data[pos + 1] + 192, pos + 2
+    return struct.unpack('>I', data[pos + 1 : pos + 5])[0], pos + 5
+
+
+def _get_issuer(subpackets: bytes) -> Optional[str]:
+    pos = 0
+    fingerprint_key_id = None
+    while pos < len(subpackets):
+        length, pos = _read_subpacket_length(subpackets, pos)
+        subpacket_type = subpackets[pos] & 0x7F
+        body = subpackets[pos + 1 : pos + length]
+        pos += length
+        if subpacket_type == PGP_ISSUER_SUBPACKET:
+            return body.hex()
+        if subpacket_type == PGP_ISSUER_FINGERPRINT_SUBPACKET:
+            fingerprint_key_id = body[-8:].hex()
+    return fingerprint_key_id
+
+
+def get_signer_key_id(signature: bytes) -> Optional[str]:
+    """Extracts the issuer key id from an OpenPGP signature packet."""
+    first = signature[0]
+    if first & 0x40:
+        tag = first & 0x3F
+        length, pos = _read_subpacket_length(signature, 1)
+    else:
+        tag = (first >> 2) & 0x0F
+        length_size = {0: 1, 1: 2, 2: 4}.get(first & 0x03)
+        if length_size is None:
+            pos = 1
+        else:
+            pos = 1 + length_size
+    if tag != PGP_SIGNATURE_PACKET:
+        return None
+    body = signature[pos:]
+    version = body[0]
+    if version in (2, 3):
+        return body[7:15].hex()
+    if version != 4:
+        return None
+    hashed_size = struct.unpack('>H', body[4:6])[0]
+    hashed = body[6 : 6 + hashed_size]
+    unhashed_start = 6 + hashed_size
+    unhashed_size = struct.unpack(
+        '>H', body[unhashed_start : unhashed_start + 2]
+    )[0]
+    unhashed = body[unhashed_start + 2 : unhashed_start + 2 + unhashed_size]
+    return _get_issuer(hashed) or _get_issuer(unhashed)
+
+
+def get_package_signer(path: str) -> Optional[str]:
+    """
+    Returns the signer key id of the package, an empty string if
+    the package isn't signed and None if it can't be read.
+    """
+    try:
+        signature = read_signature(path)
+        if not signature:
+            return ''
+        return get_signer_key_id(signature) or ''
+    except Exception:
+        return None
+
+
+def iter_packages(repository_path: str) -> Iterator[Tuple[str, FileKey]]:
+    with os.scandir(repository_path) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.rpm') or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            yield entry.path, (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+@dataclass
+class SignatureReport:
+    repository: str
+    read_errors: List[str] = field(default_factory=list)
+    no_signature: List[str] = field(default_factory=list)
+    wrong_signature: List[Dict[str, str]] = field(default_factory=list)
+
+    @property
+    def has_errors(self) -> bool:
+        return bool(
+            self.read_errors or self.no_signature or self.wrong_signature
+        )
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class SignatureVerifier:
+    """
+    Verifies signatures of exported packages in a pool of processes shared
+    between repositories, signers are cached in the export state store.
+    """
+
+    def __init__(
+        self,
+        known_subkeys: Optional[Dict[str, List[str]]] = None,
+        export_state: Optional[ExportStateStore] = None,
+        max_workers: Optional[int] = None,
+    ):
+        self.known_subkeys = known_subkeys or {}
+        self.export_state = export_state
+        self.max_workers = max_workers or os.cpu_count()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers
+                )
+            return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _get_signers(
+        self,
+        packages: List[Tuple[str, FileKey]],
+    ) -> Dict[str, Optional[str]]:
+        cached = {}
+        if self.export_state:
+            cached = self.export_state.get_signers(
+                file_key for _, file_key in packages
+            )
+        signers = {}
+        to_verify = []
+        for path, file_key in packages:
+            if file_key in cached:
+                signers[path] = cached[file_key]
+            else:
+                to_verify.append((path, file_key))
+        verified = self._get_executor().map(
+            get_package_signer,
+            [path for path, _ in to_verify],
+            chunksize=VERIFY_CHUNK_SIZE,
+        )
+        new_signers = {}
+        for (path, file_key), signer in zip(to_verify, verified):
+            signers[path] = signer
+            if signer is not None:
+                new_signers[file_key] = signer
+        if self.export_state and new_signers:
+            self.export_state.save_signers(new_signers)
+        return signers
+
+    def _is_known_signer(self, signer: str, key_ids: List[str]) -> bool:
+        if signer in key_ids:
+            return True
+        return any(
+            signer in self.known_subkeys.get(key_id, []) for key_id in key_ids
+        )
+
+    def verify_repository(
+        self,
+        repository_path: str,
+        key_ids: List[str],
+    ) -> SignatureReport:
+        key_ids = [key_id.lower() for key_id in key_ids]
+        report = SignatureReport(repository=repository_path)
+        packages = iter_packages(repository_path)
+        while True:
+            batch = list(itertools.islice(packages, VERIFY_BATCH_SIZE))
+            if not batch:
+                break
+            for path, signer in self._get_signers(batch).items():
+                status = self.get_status(signer, key_ids)
+                if status == SignStatusEnum.READ_ERROR:
+                    report.read_errors.append(path)
+                elif status == SignStatusEnum.NO_SIGNATURE:
+                    report.no_signature.append(path)
+                elif status == SignStatusEnum.WRONG_SIGNATURE:
+                    report.wrong_signature.append(
+                        {'path': path, 'signer': signer}
+                    )
+        return report
+
+    def get_status(
+        self,
+        signer: Optional[str],
+        key_ids: List[str],
+    ) -> SignStatusEnum:
+        if signer is None:
+            return SignStatusEnum.READ_ERROR
+        if not signer:
+            return SignStatusEnum.NO_SIGNATURE
+        if self._is_known_signer(signer, key_ids):
+            return SignStatusEnum.SUCCESS
+        return SignStatusEnum.WRONG_SIGNATURE
@@ -5,7 +5,6 @@ import logging
 import os
 import sys
 import typing
-import urllib.parse
 
 from fastapi_sqla import open_async_session
 from sqlalchemy import select
@@ -17,7 +16,7 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from alws.config import settings
 from alws.dependencies import get_async_db_key
 from alws.models import Platform, Product, Repository
-from alws.utils import pulp_client
+from alws.utils import pulp_client, pulp_utils
 from alws.utils.fastapi_sqla_setup import setup_all
 
 
@@ -64,46 +63,25 @@ class NoarchProcessor:
     def get_full_repo_name(repo: Repository) -> str:
         return f"{repo.name}-{'debuginfo-' if repo.debug else ''}{repo.arch}"
 
-    async def retrieve_all_packages_from_repo(
-        self,
-        latest_repo_version: str,
-    ) -> typing.List[typing.Dict[str, str]]:
-        endpoint = "pulp/api/v3/content/rpm/packages/"
-        params = {
-            "arch": "noarch",
-            "fields": ",".join((
-                "name",
-                "version",
-                "release",
-                "sha256",
-                "pulp_href",
-            )),
-            "repository_version": latest_repo_version,
-        }
-        response = await self.pulp.request("GET", endpoint, params=params)
-        packages = response["results"]
-        while response.get("next"):
-            new_url = response.get("next")
-            parsed_url = urllib.parse.urlsplit(new_url)
-            new_url = parsed_url.path + "?" + parsed_url.query
-            response = await self.pulp.request("GET", new_url)
-            packages.extend(response["results"])
-        return packages
-
     async def copy_noarch_packages_from_source(
         self,
         source_repo_name: str,
-        source_repo_packages: typing.List[dict],
+        source_repo_href: str,
         destination_repo_name: str,
         destination_repo_href: str,
     ) -> None:
         self.logger.info(
-            'Collecting packages from: "%s"',
+            'Comparing packages of "%s" and "%s"',
+            source_repo_name,
             destination_repo_name,
         )
-        destination_repo_packages = await self.retrieve_all_packages_from_repo(
-            await self.pulp.get_repo_latest_version(destination_repo_href)
-        )
+        statuses = []
+        if not self.only_replace and not self.show_diff:
+            statuses.append("added")
+        if not self.only_copy:
+            statuses.append("changed")
+        if not statuses:
+            return
 
         packages_to_add = []
         packages_to_remove = []
@@ -114,44 +92,34 @@ class NoarchProcessor:
             replace_msg = (
                 'Package "%s" can be replaced in "%s" repo from "%s" repo'
             )
-        for package_dict in source_repo_packages:
-            pkg_name = package_dict["name"]
-            pkg_version = package_dict["version"]
-            pkg_release = package_dict["release"]
-            is_modular = ".module_el" in pkg_release
-            full_name = f"{pkg_name}-{pkg_version}-{pkg_release}.noarch.rpm"
-            compared_pkg = next(
-                (
-                    pkg
-                    for pkg in destination_repo_packages
-                    if all((
-                        pkg["name"] == pkg_name,
-                        pkg["version"] == pkg_version,
-                        pkg["release"] == pkg_release,
-                    ))
-                ),
-                None,
-            )
-            if compared_pkg is None and not self.only_replace:
-                if is_modular or self.show_diff:
-                    continue
-                if not self.only_check:
-                    packages_to_add.append(package_dict["pulp_href"])
-                self.logger.info(
-                    add_msg,
-                    full_name,
-                    source_repo_name,
-                    destination_repo_name,
-                )
-                continue
-            if (
-                compared_pkg
-                and package_dict["sha256"] != compared_pkg["sha256"]
-                and not self.only_copy
+        # Packages are compared in Pulp DB, "added" ones are missing
+        # in the destination repo and "changed" ones have other checksum
+        async with open_async_session(key="pulp_async") as pulp_db:
+            async for diff in pulp_utils.aiter_repo_content_diff(
+                pulp_db,
+                [self.get_repo_version_ref(destination_repo_href)],
+                [self.get_repo_version_ref(source_repo_href)],
+                statuses=statuses,
+                arches=["noarch"],
             ):
+                full_name = (
+                    f"{diff.name}-{diff.version}-{diff.release}.noarch.rpm"
+                )
+                if diff.status == "added":
+                    if ".module_el" in diff.release:
+                        continue
+                    if not self.only_check:
+                        packages_to_add.append(diff.right_pulp_href)
+                    self.logger.info(
+                        add_msg,
+                        full_name,
+                        source_repo_name,
+                        destination_repo_name,
+                    )
+                    continue
                 if not self.only_check:
-                    packages_to_remove.append(compared_pkg["pulp_href"])
-                    packages_to_add.append(package_dict["pulp_href"])
+                    packages_to_remove.append(diff.left_pulp_href)
+                    packages_to_add.append(diff.right_pulp_href)
                 self.logger.info(
                     replace_msg,
                     full_name,
@@ -169,6 +137,12 @@ class NoarchProcessor:
                 destination_repo_href,
             )
 
+    @staticmethod
+    def get_repo_version_ref(repo_href: str) -> pulp_utils.RepoVersionRef:
+        return pulp_utils.RepoVersionRef(
+            pulp_utils.get_uuid_from_pulp_href(repo_href)
+        )
+
     async def prepare_and_execute_async_tasks(
         self,
         source_repo_dict: dict,
@@ -177,13 +151,6 @@ class NoarchProcessor:
         tasks = []
         for source_repo_name, repo_data in source_repo_dict.items():
             repo_href, source_is_debug = repo_data
-            self.logger.info(
-                'Collecting packages from: "%s"',
-                source_repo_name,
-            )
-            source_repo_packages = await self.retrieve_all_packages_from_repo(
-                await self.pulp.get_repo_latest_version(repo_href),
-            )
             for dest_repo_name, dest_repo_data in dest_repo_dict.items():
                 dest_repo_href, dest_repo_is_debug = dest_repo_data
                 if source_is_debug != dest_repo_is_debug:
@@ -191,7 +158,7 @@ class NoarchProcessor:
                 tasks.append(
                     self.copy_noarch_packages_from_source(
                         source_repo_name=source_repo_name,
-                        source_repo_packages=source_repo_packages,
+                        source_repo_href=repo_href,
                         destination_repo_name=dest_repo_name,
                         destination_repo_href=dest_repo_href,
                     )
@@ -15,6 +15,7 @@ from alws.config import settings
 from alws.database import Base
 from alws.dependencies import get_async_db_key
 from alws.utils.fastapi_sqla_setup import setup_all
+from alws.utils.query_metrics import assert_query_budget, instrument_engine
 from tests.constants import ADMIN_USER_ID, CUSTOM_USER_ID
 
 
@@ -118,6 +119,14 @@ async def create_tables():
         await conn.run_sync(Base.metadata.drop_all)
 
 
+@pytest.fixture
+def query_budget():
+    """Return ``assert_query_budget`` with the app's db engines instrumented."""
+    for key, factory in _async_session_factories.items():
+        instrument_engine(factory.kw['bind'].sync_engine, key)
+    return assert_query_budget
+
+
 @pytest.fixture
 def sqla_modules():
     from alws.models import (  # noqa
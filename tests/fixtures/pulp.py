@@ -8,7 +8,7 @@ from typing import Any, Dict, List
 import pytest
 
 from alws.config import settings
-from alws.utils.modularity import IndexWrapper
+from alws.utils.modularity import IndexWrapper, RepoModulesYaml
 from alws.utils.pulp_client import PulpClient
 from tests.test_utils.pulp_utils import (
     get_artifact_href,
@@ -358,12 +358,14 @@ def get_repo_modules_yaml(
 ):
     async def func(*args, **kwargs):
         _, repo_url = args
-        return await read_repo_modules(
-            repo_url,
-            modular_build_payload['tasks'][0]['modules_yaml'],
+        return RepoModulesYaml(
+            await read_repo_modules(
+                repo_url,
+                modular_build_payload['tasks'][0]['modules_yaml'],
+            )
         )
 
-    monkeypatch.setattr(PulpClient, "get_repo_modules_yaml", func)
+    monkeypatch.setattr(PulpClient, "fetch_repo_modules_yaml", func)
 
 
 @pytest.fixture
@@ -373,12 +375,14 @@ def get_repo_virt_modules_yaml(
 ):
     async def func(*args, **kwargs):
         _, repo_url = args
-        return await read_repo_modules(
-            repo_url,
-            virt_build_payload['tasks'][0]['modules_yaml'],
+        return RepoModulesYaml(
+            await read_repo_modules(
+                repo_url,
+                virt_build_payload['tasks'][0]['modules_yaml'],
+            )
         )
 
-    monkeypatch.setattr(PulpClient, "get_repo_modules_yaml", func)
+    monkeypatch.setattr(PulpClient, "fetch_repo_modules_yaml", func)
 
 
 @pytest.fixture
@@ -388,12 +392,14 @@ def get_repo_ruby_modules_yaml(
 ):
     async def func(*args, **kwargs):
         _, repo_url = args
-        return await read_repo_modules(
-            repo_url,
-            ruby_build_payload['tasks'][0]['modules_yaml'],
+        return RepoModulesYaml(
+            await read_repo_modules(
+                repo_url,
+                ruby_build_payload['tasks'][0]['modules_yaml'],
+            )
         )
 
-    monkeypatch.setattr(PulpClient, "get_repo_modules_yaml", func)
+    monkeypatch.setattr(PulpClient, "fetch_repo_modules_yaml", func)
 
 
 @pytest.fixture
@@ -403,12 +409,14 @@ def get_repo_subversion_modules_yaml(
 ):
     async def func(*args, **kwargs):
         _, repo_url = args
-        return await read_repo_modules(
-            repo_url,
-            subversion_build_payload['tasks'][0]['modules_yaml'],
+        return RepoModulesYaml(
+            await read_repo_modules(
+                repo_url,
+                subversion_build_payload['tasks'][0]['modules_yaml'],
+            )
         )
 
-    monkeypatch.setattr(PulpClient, "get_repo_modules_yaml", func)
+    monkeypatch.setattr(PulpClient, "fetch_repo_modules_yaml", func)
 
 
 @pytest.fixture
@@ -418,12 +426,14 @@ def get_repo_llvm_modules_yaml(
 ):
     async def func(*args, **kwargs):
         _, repo_url = args
-        return await read_repo_modules(
-            repo_url,
-            llvm_build_payload['tasks'][0]['modules_yaml'],
+        return RepoModulesYaml(
+            await read_repo_modules(
+                repo_url,
+                llvm_build_payload['tasks'][0]['modules_yaml'],
+            )
         )
 
-    monkeypatch.setattr(PulpClient, "get_repo_modules_yaml", func)
+    monkeypatch.setattr(PulpClient, "fetch_repo_modules_yaml", func)
 
 
 @pytest.fixture
@@ -446,7 +456,14 @@ def create_entity(monkeypatch):
             href = get_rpm_pkg_href()
         return href, hashlib.sha256().hexdigest(), artifact
 
+    async def get_existing_artifacts(*args, **kwargs):
+        _, checksums = args
+        return {checksum: get_file_href() for checksum in checksums}
+
     monkeypatch.setattr(PulpClient, "create_entity", func)
+    monkeypatch.setattr(
+        PulpClient, "get_existing_artifacts", get_existing_artifacts
+    )
 
 
 @pytest.fixture
@@ -1,11 +1,15 @@
 import pytest
 
 from alws.constants import BuildTaskStatus
+from alws.crud.build import remove_build_data
 from alws.models import Build
 from alws.utils.modularity import IndexWrapper
 from tests.constants import CUSTOM_USER_ID
 from tests.mock_classes import BaseAsyncTestCase
 
+# Main build query, one query per eager loaded relationship and the user
+BUILD_DETAILS_QUERY_BUDGET = 15
+
 
 class TestBuildsEndpoints(BaseAsyncTestCase):
     @pytest.mark.parametrize("task_ids", [[1, 2, 3], []])
@@ -43,6 +47,21 @@ class TestBuildsEndpoints(BaseAsyncTestCase):
         message = "Build doesn't contain cancelled tasks"
         assert cancelled_tasks, message
 
+    async def test_get_build_query_budget(
+        self,
+        regular_build: Build,
+        start_build,
+        query_budget,
+    ):
+        # Relationships are loaded per build, not per build task
+        with query_budget(BUILD_DETAILS_QUERY_BUDGET) as stats:
+            response = await self.make_request(
+                "get",
+                f"/api/v1/builds/{regular_build.id}/",
+            )
+        assert response.status_code == self.status_codes.HTTP_200_OK
+        assert 0 < stats.count <= BUILD_DETAILS_QUERY_BUDGET
+
     async def test_create_modular_build(
         self,
         modular_build_payload,
@@ -91,11 +110,56 @@ class TestBuildsEndpoints(BaseAsyncTestCase):
         build_for_release,
         delete_by_href,
     ):
+        build_id = build_for_release.id
+        response = await self.make_request(
+            "delete",
+            f"/api/v1/builds/{build_id}/remove",
+        )
+        assert response.status_code == self.status_codes.HTTP_204_NO_CONTENT
+        # build data is deleted in the background by the dramatiq actor
+        await remove_build_data(build_id)
+        response = await self.make_request(
+            "get",
+            f"/api/v1/builds/{build_id}/",
+        )
+        assert response.status_code == self.status_codes.HTTP_404_NOT_FOUND
+
+    async def test_deleting_build_is_not_dispatched(
+        self,
+        regular_build: Build,
+        start_build,
+    ):
+        build_id = regular_build.id
         response = await self.make_request(
             "delete",
-            f"/api/v1/builds/{build_for_release.id}/remove",
+            f"/api/v1/builds/{build_id}/remove",
         )
         assert response.status_code == self.status_codes.HTTP_204_NO_CONTENT
+        response = await self.make_request(
+            "post",
+            "/api/v1/build_node/get_task",
+            json={
+                "supported_arches": ["src", "x86_64", "i686"],
+                "excluded_packages": [],
+            },
+        )
+        assert response.status_code == self.status_codes.HTTP_200_OK
+        task = response.json()
+        assert not task or task["build_id"] != build_id
+        await remove_build_data(build_id)
+
+    async def test_build_not_marked_for_deletion_is_kept(
+        self,
+        regular_build: Build,
+        start_build,
+    ):
+        build_id = regular_build.id
+        await remove_build_data(build_id)
+        response = await self.make_request(
+            "get",
+            f"/api/v1/builds/{build_id}/",
+        )
+        assert response.status_code == self.status_codes.HTTP_200_OK
 
 
 @pytest.mark.usefixtures(
@@ -29,10 +29,25 @@ class TestErrataEndpoints(BaseAsyncTestCase):
             and "xml version" in response.text
         ), f"Cannot get updateinfo.xml:\n{response.text}"
 
-    async def test_list_errata_all_records(
+    async def test_get_updateinfo_xml_not_modified(
         self,
-        errata_create_payload,
-        create_errata_dramatiq
+        list_updateinfo_records,
+    ):
+        endpoint = "/api/v1/errata/ALSA-2023:1068/updateinfo/"
+        response = await self.make_request("get", endpoint)
+        etag = response.headers["etag"]
+        response = await self.make_request(
+            "get",
+            endpoint,
+            headers={"If-None-Match": etag},
+        )
+        assert (
+            response.status_code == self.status_codes.HTTP_304_NOT_MODIFIED
+            and not response.text
+        )
+
+    async def test_list_errata_all_records(
+        self, errata_create_payload, create_errata_dramatiq
     ):
 
         response = await self.make_request("get", "/api/v1/errata/all/")
@@ -0,0 +1,42 @@
+import pytest
+
+from alws.crud.sign_task import RepoAdditionsBatcher
+
+
+class FakePulpClient:
+    def __init__(self):
+        self.added = {}
+        self.reverted = {}
+
+    async def get_repo_latest_version(self, repo_href: str):
+        return f'{repo_href}versions/{len(self.added.get(repo_href, []))}/'
+
+    async def modify_repository(self, repo_href: str, add=None):
+        self.added.setdefault(repo_href, []).append(add)
+
+    async def revert_repository(self, repo_href: str, base_version: str):
+        self.reverted[repo_href] = base_version
+
+
+@pytest.mark.anyio
+async def test_batcher_flush():
+    pulp_client = FakePulpClient()
+    batcher = RepoAdditionsBatcher(pulp_client, batch_size=2)
+    for href in ('pkg1', 'pkg2', 'pkg3'):
+        batcher.add('repo/', href)
+    await batcher.flush()
+    assert pulp_client.added == {'repo/': [['pkg1', 'pkg2'], ['pkg3']]}
+    assert not pulp_client.reverted
+
+
+@pytest.mark.anyio
+async def test_batcher_rollback():
+    pulp_client = FakePulpClient()
+    batcher = RepoAdditionsBatcher(pulp_client, batch_size=2)
+    for href in ('pkg1', 'pkg2', 'pkg3'):
+        batcher.add('repo/', href)
+    batcher.add('other/', 'pkg4')
+    await batcher.rollback()
+    # Pending additions are never sent, sent ones are reverted
+    assert pulp_client.added == {'repo/': [['pkg1', 'pkg2']]}
+    assert pulp_client.reverted == {'repo/': 'repo/versions/0/'}
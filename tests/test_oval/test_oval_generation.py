@@ -1,6 +1,7 @@
 from unittest import TestCase
 
 from alws.crud.errata import new_errata_records_to_oval
+from alws.utils.oval_records import OvalRecord
 from almalinux.liboval.composer import Composer
 
 
@@ -16,5 +17,21 @@ def test_new_errata_records_to_oval(new_errata_records_samples, oval_sample):
     generated_oval_dict = Composer.load_from_string(oval_string).as_dict()
     expected_oval_dict = Composer.load_from_string(oval_sample).as_dict()
 
+    TestCase().assertDictEqual(generated_oval_dict, expected_oval_dict)
+
+
+def test_new_errata_records_to_oval_from_compact_records(
+    new_errata_records_samples,
+    oval_sample,
+):
+    cves = {}
+    records = [
+        OvalRecord.from_model(record, cves)
+        for record in new_errata_records_samples
+    ]
+    oval_string = new_errata_records_to_oval(records)
+
+    generated_oval_dict = Composer.load_from_string(oval_string).as_dict()
+    expected_oval_dict = Composer.load_from_string(oval_sample).as_dict()
 
     TestCase().assertDictEqual(generated_oval_dict, expected_oval_dict)
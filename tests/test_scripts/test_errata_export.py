@@ -0,0 +1,59 @@
+import datetime
+import json
+
+from alws.utils.errata import ErrataRecordsIndex
+from scripts.exporters.errata_export import (
+    iter_errata_json,
+    iter_modern_errata_json,
+    write_if_changed,
+)
+
+
+def _make_record(package_sum: str, updated_day: int) -> dict:
+    return {
+        "updateinfo_id": "ALSA-2024:0001",
+        "issued_date": datetime.datetime(2024, 1, 1),
+        "updated_date": datetime.datetime(2024, 1, updated_day),
+        "pkglist": {
+            "packages": [{"sum": package_sum, "arch": "x86_64"}],
+        },
+        "references": [{"type": "cve", "id": "CVE-2024-0001"}],
+    }
+
+
+def test_errata_records_index():
+    index = ErrataRecordsIndex()
+    index.add_record(_make_record("b", 1))
+    index.add_record(_make_record("a", 2))
+    index.add_record(_make_record("a", 1))
+
+    assert len(index) == 1
+    record = index.records[0]
+    assert [pkg["sum"] for pkg in record["pkglist"]["packages"]] == ["a", "b"]
+    assert record["references"] == [{"type": "cve", "id": "CVE-2024-0001"}]
+    assert record["updated_date"] == datetime.datetime(2024, 1, 2)
+
+
+def test_errata_json_matches_json_dump():
+    record = _make_record("a", 1)
+    expected = dict(record)
+    for key in ("issued_date", "updated_date"):
+        expected[key] = {"$date": int(record[key].timestamp() * 1000)}
+
+    assert "".join(iter_errata_json([record])) == json.dumps([expected])
+    modern = [{"id": "ALSA-2024:0001"}, {"id": "ALSA-2024:0002"}]
+    assert "".join(iter_modern_errata_json(modern)) == json.dumps(
+        {"schema_version": "1.0", "data": modern}
+    )
+
+
+def test_write_if_changed(tmp_path):
+    path = tmp_path / "errata.json"
+
+    assert write_if_changed(str(path), ["[", "]"])
+    mtime = path.stat().st_mtime_ns
+    assert not write_if_changed(str(path), ["[]"])
+    assert path.stat().st_mtime_ns == mtime
+    assert write_if_changed(str(path), ["[1]"])
+    assert path.read_text() == "[1]"
+    assert [p.name for p in tmp_path.iterdir()] == ["errata.json"]
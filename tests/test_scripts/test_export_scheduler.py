@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from scripts.exporters.export_scheduler import (
+    ExportScheduler,
+    ExportStage,
+    RepoExportJob,
+)
+
+
+def _make_job(name: str) -> RepoExportJob:
+    return RepoExportJob(exporter={"exporter_name": name})
+
+
+@pytest.mark.anyio
+async def test_export_scheduler_dependencies():
+    calls = []
+    running = 0
+    max_running = 0
+
+    async def export(job):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        calls.append(("export", job.name))
+        return job.name != "broken"
+
+    def regenerate(job):
+        calls.append(("regenerate", job.name))
+        return True
+
+    def check(job):
+        calls.append(("check", job.name))
+        return True
+
+    scheduler = ExportScheduler([
+        ExportStage("export", export, concurrency=2),
+        ExportStage("regenerate", regenerate, depends_on=("export",)),
+        ExportStage("check", check, depends_on=("export",), blocking=True),
+    ])
+    jobs = [_make_job(name) for name in ("a", "b", "c", "broken")]
+    await scheduler.run(jobs)
+
+    assert max_running == 2
+    for job in jobs[:3]:
+        assert calls.index(("export", job.name)) < calls.index(
+            ("regenerate", job.name)
+        )
+        assert job.completed_stages == {"export", "regenerate", "check"}
+    assert jobs[3].failed_stages == {"export"}
+    assert not jobs[3].completed_stages
+    assert ("regenerate", "broken") not in calls
+    assert scheduler.get_timings()["export"]["count"] == 4
+    assert scheduler.get_timings()["regenerate"]["count"] == 3
+
+
+def test_export_scheduler_unknown_dependency():
+    with pytest.raises(ValueError):
+        ExportScheduler([
+            ExportStage("regenerate", lambda job: True, depends_on=("x",)),
+        ])
@@ -0,0 +1,32 @@
+from scripts.exporters.export_state import ExportStateStore
+
+
+def test_export_state_repository(tmp_path):
+    packages_path = tmp_path / "repo" / "Packages"
+    repodata_path = tmp_path / "repo" / "repodata"
+    packages_path.mkdir(parents=True)
+    repodata_path.mkdir()
+    repodata_path.joinpath("repomd.xml").write_text("<repomd/>")
+    state = ExportStateStore(tmp_path)
+    export_path = str(packages_path)
+
+    assert not state.is_repository_unchanged(export_path, "versions/1/")
+    state.save_repository(export_path, "versions/1/")
+    assert state.is_repository_unchanged(export_path, "versions/1/")
+    assert not state.is_repository_unchanged(export_path, "versions/2/")
+
+    repodata_path.joinpath("repomd.xml").write_text("<repomd></repomd>")
+    assert not state.is_repository_unchanged(export_path, "versions/1/")
+
+
+def test_export_state_signers(tmp_path):
+    state = ExportStateStore(tmp_path)
+    signed = (1, 100, 1000)
+    unsigned = (2, 100, 1000)
+
+    assert not state.get_signers([signed, unsigned])
+    state.save_signers({signed: "51d6647ec21ad6ea", unsigned: ""})
+    assert state.get_signers([signed, unsigned, (1, 100, 2000)]) == {
+        signed: "51d6647ec21ad6ea",
+        unsigned: "",
+    }
@@ -1,12 +1,16 @@
+import asyncio
 import logging
 
 import pytest
 
 from scripts.exporters.base_exporter import BasePulpExporter
+from scripts.exporters.export_scheduler import RepoExportJob
 from scripts.exporters.packages_exporter import PackagesExporter
 from tests.mock_classes import BaseAsyncTestCase
 
-FAKE_SIGNATURE = "-----BEGIN PGP SIGNATURE-----\nfake\n-----END PGP SIGNATURE-----"
+FAKE_SIGNATURE = (
+    "-----BEGIN PGP SIGNATURE-----\nfake\n-----END PGP SIGNATURE-----"
+)
 
 
 def _make_exporter() -> PackagesExporter:
@@ -38,7 +42,9 @@ class TestPackagesExporter(BaseAsyncTestCase):
 
         temp_file = tmp_path / "repomd.xml"
         temp_file.write_bytes(b"Hello world!")
-        res = await exporter.sign_repomd_xml(temp_file, "1234567890ABCDEF", token)
+        res = await exporter.sign_repomd_xml(
+            temp_file, "1234567890ABCDEF", token
+        )
         assert res["error"] is None
         assert res["asc_content"] == FAKE_SIGNATURE
 
@@ -58,3 +64,52 @@ class TestPackagesExporter(BaseAsyncTestCase):
         )
         assert res["asc_content"] is None
         assert res["error"] == "sign server returned empty response"
+
+    async def test_repomd_signer_failure_fails_stage(
+        self, monkeypatch, tmp_path
+    ):
+        async def fake_make_request(self, method, endpoint, **kwargs):
+            return ""
+
+        async def fake_sleep(delay):
+            pass
+
+        monkeypatch.setattr(BasePulpExporter, "make_request", fake_make_request)
+        monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+        exporter = _make_exporter()
+        exporter.sign_server_token = "test-token"
+        repodata_path = tmp_path / "repodata"
+        repodata_path.mkdir()
+        repodata_path.joinpath("repomd.xml").write_bytes(b"Hello world!")
+        job = RepoExportJob(
+            exporter={"exporter_name": "repo"},
+            sign_key_id="1234567890ABCDEF",
+            export_path=str(tmp_path / "Packages"),
+        )
+        tmp_path.joinpath("Packages").mkdir()
+        assert not await exporter._sign_repodata(job)
+        assert not repodata_path.joinpath("repomd.xml.asc").exists()
+
+    async def test_fetch_repodata_failure_is_not_exported(
+        self, monkeypatch, tmp_path
+    ):
+        async def fake_download_repodata(self, repodata_path, repodata_url):
+            raise ValueError("connection reset")
+
+        monkeypatch.setattr(
+            BasePulpExporter, "download_repodata", fake_download_repodata
+        )
+
+        exporter = _make_exporter()
+        exporter.exported_versions = {}
+        job = RepoExportJob(
+            exporter={
+                "exporter_name": "repo",
+                "repo_url": "http://pulp/repo/",
+                "repo_latest_version": "versions/2/",
+            },
+            export_path=str(tmp_path / "Packages"),
+        )
+        assert not await exporter._fetch_repodata(job)
+        assert not exporter.exported_versions
@@ -0,0 +1,70 @@
+import errno
+import os
+
+from scripts.exporters import repodata_store
+from scripts.exporters.repodata_store import RepodataStore
+
+PRIMARY = "0" * 64 + "-primary.xml.gz"
+OTHER = "1" * 64 + "-other.xml.gz"
+
+
+def test_repodata_store_links(tmp_path):
+    store = RepodataStore(tmp_path / "cache")
+    export_dir = tmp_path / "export"
+    export_dir.mkdir()
+    primary = export_dir / PRIMARY
+    primary.write_bytes(b"primary")
+    (export_dir / "repomd.xml").write_text("<repomd/>")
+
+    assert not store.link(PRIMARY, tmp_path)
+    store.add(primary)
+    store.add(export_dir / "repomd.xml")
+    assert store.link(PRIMARY, tmp_path)
+    assert (tmp_path / PRIMARY).stat().st_ino == primary.stat().st_ino
+    assert not store.link("repomd.xml", tmp_path)
+
+
+def test_repodata_store_sync_directory(tmp_path):
+    store = RepodataStore(tmp_path / "cache")
+    repodata = tmp_path / "repodata"
+    cached = tmp_path / "cached"
+    repodata.mkdir()
+    cached.mkdir()
+    (repodata / PRIMARY).write_bytes(b"primary")
+    (repodata / "repomd.xml").write_text("<repomd/>")
+    (cached / OTHER).write_bytes(b"outdated")
+
+    store.sync_directory(repodata, cached)
+
+    assert sorted(p.name for p in cached.iterdir()) == [PRIMARY, "repomd.xml"]
+    primary_inode = (repodata / PRIMARY).stat().st_ino
+    assert (cached / PRIMARY).stat().st_ino == primary_inode
+    assert (cached / "repomd.xml").stat().st_nlink == 1
+
+    (repodata / PRIMARY).unlink()
+    (cached / PRIMARY).unlink()
+    assert store.prune() == 1
+
+
+def test_repodata_store_keeps_copied_files(tmp_path, monkeypatch):
+    def cross_device_link(src, dest):
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+    monkeypatch.setattr(repodata_store.os, "link", cross_device_link)
+    store = RepodataStore(tmp_path / "cache")
+    repodata = tmp_path / "repodata"
+    cached = tmp_path / "cached"
+    repodata.mkdir()
+    (repodata / PRIMARY).write_bytes(b"primary")
+
+    store.sync_directory(repodata, cached)
+
+    assert (cached / PRIMARY).read_bytes() == b"primary"
+    (repodata / PRIMARY).unlink()
+    assert store.prune() == 0
+    assert store.link(PRIMARY, tmp_path)
+    (cached / PRIMARY).unlink()
+    assert store.prune() == 0
+    (tmp_path / PRIMARY).unlink()
+    assert store.prune() == 1
+    assert not store.link(PRIMARY, tmp_path)
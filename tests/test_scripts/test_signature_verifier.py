@@ -0,0 +1,98 @@
+import struct
+
+import pgpy
+from pgpy.constants import HashAlgorithm, KeyFlags, PubKeyAlgorithm
+
+from alws.constants import SignStatusEnum
+from scripts.exporters.export_state import ExportStateStore
+from scripts.exporters.signature_verifier import (
+    RPM_HEADER_MAGIC,
+    RPM_LEAD_SIZE,
+    SignatureVerifier,
+    get_package_signer,
+    iter_packages,
+)
+
+
+def _make_key() -> pgpy.PGPKey:
+    key = pgpy.PGPKey.new(PubKeyAlgorithm.RSAEncryptOrSign, 1024)
+    key.add_uid(
+        pgpy.PGPUID.new("Test"),
+        usage={KeyFlags.Sign},
+        hashes=[HashAlgorithm.SHA256],
+    )
+    return key
+
+
+def _write_rpm(path, signature: bytes = b""):
+    entries = b""
+    if signature:
+        # RPMSIGTAG_GPG with BIN type
+        entries = struct.pack(">iiii", 1005, 7, 0, len(signature))
+    header = (
+        RPM_HEADER_MAGIC
+        + b"\x00" * 4
+        + struct.pack(">II", len(entries) // 16, len(signature))
+        + entries
+        + signature
+    )
+    path.write_bytes(b"\x00" * RPM_LEAD_SIZE + header + b"payload")
+
+
+def test_get_package_signer(tmp_path):
+    key = _make_key()
+    signed = tmp_path / "signed.rpm"
+    unsigned = tmp_path / "unsigned.rpm"
+    broken = tmp_path / "broken.rpm"
+    _write_rpm(signed, bytes(key.sign(b"header")))
+    _write_rpm(unsigned)
+    broken.write_bytes(b"not an rpm")
+
+    assert get_package_signer(str(signed)) == key.fingerprint.keyid.lower()
+    assert get_package_signer(str(unsigned)) == ""
+    assert get_package_signer(str(broken)) is None
+
+
+def test_verify_repository(tmp_path):
+    key = _make_key()
+    other_key = _make_key()
+    packages_dir = tmp_path / "Packages"
+    packages_dir.mkdir()
+    _write_rpm(packages_dir / "good.rpm", bytes(key.sign(b"header")))
+    _write_rpm(packages_dir / "wrong.rpm", bytes(other_key.sign(b"header")))
+    _write_rpm(packages_dir / "unsigned.rpm")
+    (packages_dir / "repomd.xml").write_text("<repomd/>")
+    state = ExportStateStore(tmp_path)
+    verifier = SignatureVerifier(export_state=state, max_workers=1)
+    try:
+        report = verifier.verify_repository(
+            str(packages_dir), [key.fingerprint.keyid]
+        )
+        assert report.no_signature == [str(packages_dir / "unsigned.rpm")]
+        assert report.wrong_signature == [{
+            "path": str(packages_dir / "wrong.rpm"),
+            "signer": other_key.fingerprint.keyid.lower(),
+        }]
+        assert not report.read_errors
+        assert (
+            verifier.get_status(
+                key.fingerprint.keyid.lower(), [key.fingerprint.keyid.lower()]
+            )
+            == SignStatusEnum.SUCCESS
+        )
+
+        # Signers are taken from the state store on the next run
+        assert (
+            len(
+                state.get_signers(
+                    file_key for _, file_key in iter_packages(str(packages_dir))
+                )
+            )
+            == 3
+        )
+        cached = verifier.verify_repository(
+            str(packages_dir), [key.fingerprint.keyid]
+        )
+        assert cached.as_dict()["wrong_signature"] == report.wrong_signature
+    finally:
+        verifier.close()
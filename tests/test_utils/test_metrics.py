@@ -0,0 +1,56 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from alws.utils.metrics import (
+    HTTP_REQUEST_TOTAL,
+    PrometheusMiddleware,
+    RouteTemplateLookup,
+)
+
+
+def _make_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(PrometheusMiddleware)
+
+    @app.post("/api/v1/build_node/get_task")
+    async def get_task():
+        return {}
+
+    @app.get("/api/v1/builds/{build_id}/")
+    async def get_build(build_id: int):
+        return {"id": build_id}
+
+    return app
+
+
+def _scope(method: str, path: str) -> dict:
+    return {"type": "http", "method": method, "path": path, "root_path": ""}
+
+
+def test_route_template_lookup():
+    lookup = RouteTemplateLookup(_make_app().routes)
+    assert (
+        lookup.lookup(_scope("POST", "/api/v1/build_node/get_task"))
+        == "/api/v1/build_node/get_task"
+    )
+    assert (
+        lookup.lookup(_scope("GET", "/api/v1/builds/42/"))
+        == "/api/v1/builds/{build_id}/"
+    )
+    assert lookup.lookup(_scope("GET", "/unknown")) == "__unmatched__"
+
+
+def test_route_template_lookup_cache_is_bounded():
+    lookup = RouteTemplateLookup(_make_app().routes, maxsize=2)
+    for build_id in range(5):
+        lookup.lookup(_scope("GET", f"/api/v1/builds/{build_id}/"))
+    assert len(lookup._cache) == 2
+
+
+def test_prometheus_middleware_labels_by_template():
+    client = TestClient(_make_app())
+    labels = ("GET", "/api/v1/builds/{build_id}/", "200")
+    before = HTTP_REQUEST_TOTAL.labels(*labels)._value.get()
+    client.get("/api/v1/builds/1/")
+    client.get("/api/v1/builds/2/")
+    assert HTTP_REQUEST_TOTAL.labels(*labels)._value.get() == before + 2
@@ -1,6 +1,82 @@
-from alws.utils.modularity import IndexWrapper
+import gzip
+import lzma
+
+import pytest
+
+from alws.utils import modularity
+from alws.utils.modularity import (
+    IndexWrapper,
+    fetch_repo_modules_yaml,
+    modules_yaml_cache,
+    parse_repomd_modules_record,
+)
 from alws.utils.parsing import parse_rpm_nevra
 
+REPO_URL = "https://example.com/repo"
+REPOMD_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<repomd xmlns="http://linux.duke.edu/metadata/repo">
+  <data type="modules">
+    <checksum type="sha256">{checksum}</checksum>
+    <location href="{href}"/>
+  </data>
+</repomd>
+"""
+
+
+class FakeResponse:
+    def __init__(self, content: bytes):
+        self.content = content
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def text(self) -> str:
+        return self.content.decode()
+
+    async def read(self) -> bytes:
+        return self.content
+
+
+class FakeClientSession:
+    def __init__(self, files: dict, requested: list):
+        self.files = files
+        self.requested = requested
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def get(self, url: str) -> FakeResponse:
+        self.requested.append(url)
+        return FakeResponse(self.files[url])
+
+
+@pytest.fixture
+def repo_files(monkeypatch):
+    files = {}
+    requested = []
+    monkeypatch.setattr(
+        modularity.aiohttp,
+        "ClientSession",
+        lambda **kwargs: FakeClientSession(files, requested),
+    )
+    modules_yaml_cache.clear()
+    yield files, requested
+    modules_yaml_cache.clear()
+
+
+def add_modules_yaml(files: dict, checksum: str, href: str, content: bytes):
+    files[f"{REPO_URL}/repodata/repomd.xml"] = REPOMD_TEMPLATE.format(
+        checksum=checksum,
+        href=href,
+    ).encode()
+    files[f"{REPO_URL}/{href}"] = content
+
 
 def test_add_rpm_artifact(
     modules_yaml_with_filter: bytes,
@@ -37,3 +113,86 @@ def test_add_rpm_artifact(
         new_artifacts = _module.get_rpm_artifacts()
 
         assert new_artifacts == artifacts
+
+
+def test_parse_repomd_modules_record():
+    repomd_xml = """<?xml version="1.0" encoding="UTF-8"?>
+<repomd xmlns="http://linux.duke.edu/metadata/repo">
+  <revision>1700000000</revision>
+  <data type="primary">
+    <checksum type="sha256">aaa</checksum>
+    <location href="repodata/aaa-primary.xml.gz"/>
+  </data>
+  <data type="modules">
+    <checksum type="sha256">bbb</checksum>
+    <location href="repodata/bbb-modules.yaml"/>
+  </data>
+</repomd>
+"""
+    assert parse_repomd_modules_record(repomd_xml) == (
+        "repodata/bbb-modules.yaml",
+        "bbb",
+    )
+    assert (
+        parse_repomd_modules_record(
+            repomd_xml.replace('type="modules"', 'type="other"')
+        )
+        is None
+    )
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "href, compress",
+    [
+        ("repodata/aaa-modules.yaml", lambda content: content),
+        ("repodata/aaa-modules.yaml.gz", gzip.compress),
+        (
+            "repodata/aaa-modules.yaml.xz",
+            lambda content: lzma.compress(content),
+        ),
+    ],
+)
+async def test_fetch_repo_modules_yaml_decompression(
+    repo_files,
+    modules_yaml_with_filter: bytes,
+    href: str,
+    compress,
+):
+    files, _ = repo_files
+    add_modules_yaml(files, "aaa", href, compress(modules_yaml_with_filter))
+    entry = await fetch_repo_modules_yaml(REPO_URL)
+    assert entry.template == modules_yaml_with_filter.decode()
+
+
+@pytest.mark.anyio
+async def test_fetch_repo_modules_yaml_cache(
+    repo_files,
+    modules_yaml_with_filter: bytes,
+):
+    files, requested = repo_files
+    href = "repodata/aaa-modules.yaml"
+    add_modules_yaml(files, "aaa", href, modules_yaml_with_filter)
+    entry = await fetch_repo_modules_yaml(REPO_URL)
+    assert await fetch_repo_modules_yaml(REPO_URL) is entry
+    assert requested.count(f"{REPO_URL}/{href}") == 1
+    assert requested.count(f"{REPO_URL}/repodata/repomd.xml") == 2
+    assert entry.index is entry.index
+    assert entry.index.copy() is not entry.index
+
+    # New checksum of modules.yaml means the repository was changed
+    href = "repodata/bbb-modules.yaml"
+    add_modules_yaml(files, "bbb", href, modules_yaml_with_filter)
+    assert await fetch_repo_modules_yaml(REPO_URL) is not entry
+    assert requested.count(f"{REPO_URL}/{href}") == 1
+
+
+@pytest.mark.anyio
+async def test_fetch_repo_without_modules(repo_files):
+    files, _ = repo_files
+    files[f"{REPO_URL}/repodata/repomd.xml"] = (
+        REPOMD_TEMPLATE.replace('type="modules"', 'type="primary"')
+        .format(checksum="aaa", href="repodata/aaa-primary.xml.gz")
+        .encode()
+    )
+    assert await fetch_repo_modules_yaml(REPO_URL) is None
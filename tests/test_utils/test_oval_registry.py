@@ -0,0 +1,105 @@
+import functools
+
+import fakeredis
+import pytest
+
+from alws.crud import errata as errata_crud
+from alws.utils.oval_registry import OvalRegistry
+
+PLATFORM = 'AlmaLinux-9'
+
+
+def make_item(item_id: str, **kwargs) -> dict:
+    return {'id': item_id, 'version': 1, **kwargs}
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeAsyncRedis()
+
+
+@pytest.mark.anyio
+async def test_items_are_stored_on_save(redis):
+    registry = OvalRegistry(PLATFORM, redis=redis, ttl=60)
+    registry.add(objects=[make_item('obj:1')], tests=[make_item('tst:1')])
+    assert registry.get_ids('objects') == ['obj:1']
+    assert not await redis.exists(registry._get_key('objects'))
+
+    await registry.save()
+    await registry.mark_ready()
+    assert 0 < await redis.ttl(registry._ready_key) <= 60
+
+    loaded = OvalRegistry(PLATFORM, redis=redis)
+    assert await loaded.load()
+    assert loaded.objects == [make_item('obj:1')]
+    assert loaded.tests == [make_item('tst:1')]
+    assert not loaded.states
+
+
+@pytest.mark.anyio
+async def test_known_ids_are_skipped(redis):
+    registry = OvalRegistry(PLATFORM, redis=redis)
+    registry.add(states=[make_item('ste:1', evr='0:1-1')])
+    registry.add(
+        states=[make_item('ste:1', evr='0:1-2'), make_item('ste:2')],
+    )
+    await registry.save()
+    assert registry.states == [
+        make_item('ste:1', evr='0:1-1'),
+        make_item('ste:2'),
+    ]
+    assert await redis.hlen(registry._get_key('states')) == 2
+
+
+@pytest.mark.anyio
+async def test_invalidate(redis):
+    registry = OvalRegistry(PLATFORM, redis=redis)
+    registry.add(objects=[make_item('obj:1')])
+    await registry.save()
+    await registry.mark_ready()
+
+    await registry.invalidate()
+    assert not await redis.keys('*')
+    assert not await OvalRegistry(PLATFORM, redis=redis).load()
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    async def execute(self, query):
+        self.queries += 1
+        return self.rows
+
+
+@pytest.mark.anyio
+async def test_get_albs_oval_registry_builds_once(monkeypatch, redis):
+    monkeypatch.setattr(
+        errata_crud,
+        'OvalRegistry',
+        functools.partial(OvalRegistry, redis=redis),
+    )
+    # Items left from an expired registry are dropped on rebuild
+    stale = OvalRegistry(PLATFORM, redis=redis)
+    stale.add(objects=[make_item('obj:stale')])
+    await stale.save()
+    session = FakeSession([
+        (
+            [{'operator': 'AND'}],
+            [make_item('obj:1')],
+            [make_item('ste:1')],
+            [make_item('tst:1')],
+        ),
+        # Records without OVAL data are skipped
+        (None, [make_item('obj:2')], None, None),
+    ])
+
+    registry = await errata_crud.get_albs_oval_registry(session, PLATFORM)
+    assert registry.get_ids('objects') == ['obj:1']
+    assert registry.get_ids('states') == ['ste:1']
+    assert registry.get_ids('tests') == ['tst:1']
+
+    registry = await errata_crud.get_albs_oval_registry(session, PLATFORM)
+    assert registry.get_ids('objects') == ['obj:1']
+    assert session.queries == 1
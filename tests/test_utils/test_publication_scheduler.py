@@ -0,0 +1,81 @@
+import time
+
+import fakeredis
+import pytest
+
+from alws.config import settings
+from alws.utils import publication_scheduler
+from alws.utils.publication_scheduler import (
+    DIRTY_REPOS_KEY,
+    DIRTY_SINCE_KEY,
+    get_publication_retry_delay,
+    publish_dirty_repositories,
+)
+
+
+class FakePulpClient:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.published = []
+
+    async def create_rpm_publication(self, href: str):
+        if href in self.failing:
+            raise ValueError(f'Cannot publish {href}')
+        self.published.append(href)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(publication_scheduler, '_redis', redis)
+    monkeypatch.setattr(settings, 'errata_publication_window', 60)
+    return redis
+
+
+async def mark_dirty(redis, href: str, modified_at: float, since: float):
+    await redis.zadd(DIRTY_REPOS_KEY, {href: modified_at})
+    await redis.hset(DIRTY_SINCE_KEY, href, since)
+
+
+@pytest.mark.anyio
+async def test_claim_takes_repos_outside_window(redis):
+    now = time.time()
+    await mark_dirty(redis, 'old', now - 120, now - 300)
+    await mark_dirty(redis, 'recent', now - 10, now - 300)
+
+    claimed = await publication_scheduler._claim_ready_repositories()
+
+    assert claimed == [('old', now - 300)]
+    assert await redis.zrange(DIRTY_REPOS_KEY, 0, -1) == [b'recent']
+    assert await redis.hkeys(DIRTY_SINCE_KEY) == [b'recent']
+
+
+@pytest.mark.anyio
+async def test_failed_publications_keep_since(redis):
+    now = time.time()
+    await mark_dirty(redis, 'failed', now - 120, now - 300)
+    await mark_dirty(redis, 'published', now - 120, now - 300)
+    pulp_client = FakePulpClient(failing=['failed'])
+
+    assert await publish_dirty_repositories(pulp_client)
+
+    assert pulp_client.published == ['published']
+    assert await redis.zrange(DIRTY_REPOS_KEY, 0, -1) == [b'failed']
+    assert await redis.zscore(DIRTY_REPOS_KEY, 'failed') >= now
+    since = await redis.hget(DIRTY_SINCE_KEY, 'failed')
+    assert float(since) == now - 300
+
+
+@pytest.mark.anyio
+async def test_nothing_failed(redis):
+    await mark_dirty(redis, 'repo', time.time() - 120, time.time() - 120)
+    assert not await publish_dirty_repositories(FakePulpClient())
+    assert not await redis.exists(DIRTY_REPOS_KEY, DIRTY_SINCE_KEY)
+
+
+def test_retry_delay_is_bounded(monkeypatch):
+    monkeypatch.setattr(settings, 'errata_publication_window', 60)
+    monkeypatch.setattr(settings, 'errata_publication_max_retries', 3)
+    delays = [get_publication_retry_delay(attempt) for attempt in (1, 2, 3)]
+    assert delays == [60000, 120000, 240000]
+    assert get_publication_retry_delay(4) is None
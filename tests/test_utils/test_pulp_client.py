@@ -0,0 +1,191 @@
+import pytest
+
+from alws.errors import PulpTransactionError
+from alws.utils.artifacts_cache import artifacts_cache
+from alws.utils.metrics import PULP_TASK_DURATION
+from alws.utils.pulp_client import (
+    PulpClient,
+    normalize_pulp_endpoint,
+    observe_pulp_task,
+)
+
+
+@pytest.mark.parametrize(
+    'url, expected',
+    [
+        (
+            'http://pulp/pulp/api/v3/repositories/rpm/rpm/'
+            '0189a3b2-1c2d-7e8f-9a0b-1c2d3e4f5a6b/modify/',
+            '/pulp/api/v3/repositories/rpm/rpm/{id}/modify/',
+        ),
+        (
+            'pulp/api/v3/repositories/rpm/rpm/'
+            '0189a3b2-1c2d-7e8f-9a0b-1c2d3e4f5a6b/versions/12/',
+            '/pulp/api/v3/repositories/rpm/rpm/{id}/versions/{id}/',
+        ),
+        (
+            '/pulp/api/v3/content/rpm/packages/?limit=1000&offset=2000',
+            '/pulp/api/v3/content/rpm/packages/',
+        ),
+    ],
+)
+def test_normalize_pulp_endpoint(url: str, expected: str):
+    assert normalize_pulp_endpoint(url) == expected
+
+
+def test_observe_pulp_task():
+    task = {
+        'name': 'pulpcore.app.tasks.repository.add_and_remove',
+        'state': 'completed',
+        'pulp_created': '2024-01-01T00:00:00.000000Z',
+        'started_at': '2024-01-01T00:00:05.000000Z',
+        'finished_at': '2024-01-01T00:00:07.500000Z',
+    }
+    queued = PULP_TASK_DURATION.labels('add_and_remove', 'queued', 'completed')
+    running = PULP_TASK_DURATION.labels(
+        'add_and_remove', 'running', 'completed'
+    )
+    queued_before = queued._sum.get()
+    running_before = running._sum.get()
+    observe_pulp_task(task, waited=8.0)
+    assert queued._sum.get() - queued_before == 5.0
+    assert running._sum.get() - running_before == 2.5
+
+
+@pytest.mark.anyio
+async def test_transaction_rollback(monkeypatch):
+    good_repo = 'pulp/api/v3/repositories/rpm/rpm/good/'
+    bad_repo = 'pulp/api/v3/repositories/rpm/rpm/bad/'
+    payloads = []
+
+    async def request(self, method, endpoint, json=None, **kwargs):
+        if method == 'GET':
+            return {'latest_version_href': f'{endpoint}versions/1/'}
+        if endpoint.startswith(bad_repo):
+            raise ValueError('modification failed')
+        payloads.append((endpoint, json))
+        return {'task': 'task'}
+
+    async def wait_for_task(self, task_href, sleep_time=5.0):
+        return {'created_resources': [f'{good_repo}versions/2/']}
+
+    monkeypatch.setattr(PulpClient, 'request', request)
+    monkeypatch.setattr(PulpClient, 'wait_for_task', wait_for_task)
+    pulp_client = PulpClient('http://pulp', 'user', 'password')
+    with pytest.raises(PulpTransactionError) as exc_info:
+        async with pulp_client.begin():
+            await pulp_client.modify_repository(good_repo, add=['a'])
+            await pulp_client.modify_repository(good_repo, add=['b'])
+            await pulp_client.modify_repository(bad_repo, add=['c'])
+            assert not payloads
+    report = exc_info.value.report
+    assert list(report.failed) == [bad_repo]
+    assert report.rolled_back == [good_repo]
+    modify_payload, rollback_payload = [json for _, json in payloads]
+    assert sorted(modify_payload['add_content_units']) == ['a', 'b']
+    assert rollback_payload == {'base_version': f'{good_repo}versions/1/'}
+
+
+@pytest.mark.anyio
+async def test_get_existing_artifacts(monkeypatch):
+    requests = []
+
+    async def request(self, method, endpoint, params=None, **kwargs):
+        requests.append(params)
+        return {
+            'results': [
+                {'sha256': sha256, 'pulp_href': f'artifacts/{sha256}/'}
+                for sha256 in params['sha256__in'].split(',')
+                if sha256 != 'missing'
+            ],
+        }
+
+    monkeypatch.setattr(PulpClient, 'request', request)
+    artifacts_cache.clear()
+    pulp_client = PulpClient('http://pulp', 'user', 'password')
+    checksums = ['first', 'second', 'missing']
+    expected = {'first': 'artifacts/first/', 'second': 'artifacts/second/'}
+    assert await pulp_client.get_existing_artifacts(checksums) == expected
+    assert len(requests) == 1
+    assert await pulp_client.check_if_artifact_exists('first') == (
+        'artifacts/first/'
+    )
+    assert len(requests) == 1
+
+
+@pytest.mark.anyio
+async def test_get_existing_artifacts_ignores_unrequested(monkeypatch):
+    async def request(self, method, endpoint, params=None, **kwargs):
+        # Filter isn't applied by Pulp, all artifacts are listed
+        return {
+            'results': [
+                {'sha256': sha256, 'pulp_href': f'artifacts/{sha256}/'}
+                for sha256 in ('first', 'unrelated')
+            ],
+        }
+
+    monkeypatch.setattr(PulpClient, 'request', request)
+    artifacts_cache.clear()
+    pulp_client = PulpClient('http://pulp', 'user', 'password')
+    assert await pulp_client.get_existing_artifacts(['first']) == {
+        'first': 'artifacts/first/'
+    }
+    assert await artifacts_cache.get('unrelated') is None
+
+
+@pytest.mark.anyio
+async def test_iter_pages(monkeypatch):
+    items = list(range(25))
+
+    async def request(self, method, endpoint, params=None, **kwargs):
+        offset = params.get('offset', 0)
+        return {
+            'count': len(items),
+            'results': items[offset : offset + min(params['limit'], 10)],
+        }
+
+    monkeypatch.setattr(PulpClient, 'request', request)
+    pulp_client = PulpClient('http://pulp', 'user', 'password')
+    pages = [
+        page
+        async for page in pulp_client.iter_pages(
+            'pulp/api/v3/content/rpm/packages/', {'limit': 1000}
+        )
+    ]
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert sum(pages, []) == items
+
+
+@pytest.mark.anyio
+async def test_transaction_keeps_modifications_order(monkeypatch):
+    repo = 'pulp/api/v3/repositories/rpm/rpm/repo/'
+    payloads = []
+
+    async def request(self, method, endpoint, json=None, **kwargs):
+        if method == 'GET':
+            return {'latest_version_href': f'{endpoint}versions/1/'}
+        payloads.append(json)
+        return {'task': 'task'}
+
+    async def wait_for_task(self, task_href, sleep_time=5.0):
+        return {'created_resources': [f'{repo}versions/2/']}
+
+    monkeypatch.setattr(PulpClient, 'request', request)
+    monkeypatch.setattr(PulpClient, 'wait_for_task', wait_for_task)
+    pulp_client = PulpClient('http://pulp', 'user', 'password')
+    async with pulp_client.begin():
+        # Uploaded and then replaced by the canonical noarch package
+        await pulp_client.modify_repository(repo, add=['noarch', 'x86_64'])
+        await pulp_client.modify_repository(
+            repo, add=['canonical'], remove=['noarch']
+        )
+        # Removed and then added back
+        await pulp_client.modify_repository(repo, remove=['old'])
+        await pulp_client.modify_repository(repo, add=['old'])
+    (payload,) = payloads
+    assert sorted(payload['add_content_units']) == [
+        'canonical',
+        'old',
+        'x86_64',
+    ]
+    assert payload['remove_content_units'] == ['noarch']
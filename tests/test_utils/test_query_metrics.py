@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from alws.utils.query_metrics import (
+    QueryBudgetExceeded,
+    assert_query_budget,
+    instrument_engine,
+    statement_fingerprint,
+    track_queries,
+)
+
+
+@pytest.fixture
+def sqlite_engine():
+    engine = create_engine('sqlite://')
+    instrument_engine(engine, 'sqlite')
+    yield engine
+    engine.dispose()
+
+
+def test_statement_fingerprint_ignores_literals():
+    assert statement_fingerprint(
+        "SELECT * FROM builds WHERE id IN (1, 2, 3) AND name = 'foo'"
+    ) == statement_fingerprint(
+        "SELECT *  FROM builds WHERE id IN (4) AND name = 'bar'"
+    )
+    assert statement_fingerprint(
+        'SELECT * FROM builds'
+    ) != statement_fingerprint('SELECT * FROM build_tasks')
+
+
+def test_track_queries_nested(sqlite_engine):
+    with track_queries('test', 'outer') as outer:
+        with sqlite_engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+            with track_queries('test', 'inner') as inner:
+                conn.execute(text('SELECT 2'))
+    assert outer.count == 2
+    assert inner.count == 1
+
+
+def test_assert_query_budget(sqlite_engine):
+    with assert_query_budget(2):
+        with sqlite_engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+    with pytest.raises(QueryBudgetExceeded):
+        with assert_query_budget(1):
+            with sqlite_engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+                conn.execute(text('SELECT 2'))
@@ -0,0 +1,317 @@
+import contextlib
+import os
+import typing
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from alws.config import settings
+from alws.models import Repository
+from alws.utils.pulp_utils import (
+    REPO_DIFF_STATUSES,
+    RepoContentDiff,
+    RepoVersionRef,
+    aiter_repo_content_diff,
+    get_repo_content_diff_query,
+)
+from scripts import compare_beta_to_stable
+
+
+def test_repo_content_diff_query():
+    query = get_repo_content_diff_query(
+        [RepoVersionRef(uuid.uuid4())],
+        [RepoVersionRef(uuid.uuid4(), 3), RepoVersionRef(uuid.uuid4())],
+        statuses=("added", "removed"),
+        arches=["x86_64", "noarch"],
+    )
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    assert "FULL OUTER JOIN" in sql
+    assert sql.count("UNION ALL") == 1
+    assert "version_removed_id IS NULL" in sql
+    assert "DISTINCT ON" in sql
+    assert "left_pulp_href" in sql
+
+
+def test_repo_content_diff_nevra():
+    diff = RepoContentDiff(
+        "bash", "0", "5.1.8", "9.el9", "x86_64", "added", None, "abc"
+    )
+    assert diff.nevra == "bash-0:5.1.8-9.el9.x86_64"
+
+
+def test_repo_content_diff_pulp_hrefs():
+    href = "/pulp/api/v3/content/rpm/packages/1/"
+    diff = RepoContentDiff(
+        "bash",
+        "0",
+        "5.1.8",
+        "9.el9",
+        "noarch",
+        "changed",
+        "a",
+        "b",
+        None,
+        href,
+    )
+    assert diff.left_pulp_href is None
+    assert diff.right_pulp_href == href
+
+
+PULP_DIFF_TABLES = (
+    "CREATE TABLE core_repositoryversion ("
+    " pulp_id uuid PRIMARY KEY, repository_id uuid, number integer)",
+    "CREATE TABLE core_repositorycontent ("
+    " content_id uuid, repository_id uuid,"
+    " version_added_id uuid, version_removed_id uuid)",
+    'CREATE TABLE rpm_package (content_ptr_id uuid PRIMARY KEY,'
+    ' name text, epoch text, version text, release text, arch text,'
+    ' "pkgId" text)',
+)
+
+
+class PulpRepo:
+    def __init__(self, pulp_db: AsyncSession):
+        self.pulp_db = pulp_db
+        self.repo_id = uuid.uuid4()
+        self.versions = {}
+
+    @property
+    def pulp_href(self) -> str:
+        return f"/pulp/api/v3/repositories/rpm/rpm/{self.repo_id}/"
+
+    async def get_version(self, number: int) -> uuid.UUID:
+        if number not in self.versions:
+            self.versions[number] = uuid.uuid4()
+            await self.pulp_db.execute(
+                text(
+                    "INSERT INTO core_repositoryversion "
+                    "VALUES (:pulp_id, :repo_id, :number)"
+                ),
+                {
+                    "pulp_id": self.versions[number],
+                    "repo_id": self.repo_id,
+                    "number": number,
+                },
+            )
+        return self.versions[number]
+
+    async def add(
+        self,
+        content_id: uuid.UUID,
+        added: int = 1,
+        removed: typing.Optional[int] = None,
+    ):
+        await self.pulp_db.execute(
+            text(
+                "INSERT INTO core_repositorycontent "
+                "VALUES (:content_id, :repo_id, :added, :removed)"
+            ),
+            {
+                "content_id": content_id,
+                "repo_id": self.repo_id,
+                "added": await self.get_version(added),
+                "removed": await self.get_version(removed) if removed else None,
+            },
+        )
+
+
+async def create_package(
+    pulp_db: AsyncSession,
+    name: str,
+    version: str,
+    release: str,
+    arch: str,
+    pkg_id: str,
+) -> uuid.UUID:
+    content_id = uuid.uuid4()
+    await pulp_db.execute(
+        text(
+            "INSERT INTO rpm_package VALUES (:content_id, :name, '0',"
+            " :version, :release, :arch, :pkg_id)"
+        ),
+        {
+            "content_id": content_id,
+            "name": name,
+            "version": version,
+            "release": release,
+            "arch": arch,
+            "pkg_id": pkg_id,
+        },
+    )
+    return content_id
+
+
+def get_package_href(content_id: uuid.UUID) -> str:
+    return f"/pulp/api/v3/content/rpm/packages/{content_id}/"
+
+
+@pytest.fixture
+async def pulp_db():
+    engine = create_async_engine(
+        os.getenv('DATABASE_URL', settings.fastapi_sqla__async__sqlalchemy_url),
+        poolclass=NullPool,
+    )
+    # Everything is rolled back at the end, Postgres DDL is transactional
+    async with engine.connect() as conn:
+        await conn.execute(text("CREATE SCHEMA pulp_diff_test"))
+        await conn.execute(text("SET search_path TO pulp_diff_test"))
+        for table in PULP_DIFF_TABLES:
+            await conn.execute(text(table))
+        session = AsyncSession(bind=conn)
+        yield session
+        await session.close()
+        await conn.rollback()
+    await engine.dispose()
+
+
+@pytest.fixture
+async def diff_repos(pulp_db: AsyncSession):
+    stable = PulpRepo(pulp_db)
+    beta = PulpRepo(pulp_db)
+    same = await create_package(
+        pulp_db, "bash", "5.1.8", "9.el9", "x86_64", "a"
+    )
+    stable_zsh = await create_package(
+        pulp_db, "zsh", "5.8", "9.el9", "x86_64", "b"
+    )
+    beta_zsh = await create_package(
+        pulp_db, "zsh", "5.8", "9.el9", "x86_64", "c"
+    )
+    # The package with the lowest pkgId represents a duplicated NEVRA
+    beta_zsh_duplicate = await create_package(
+        pulp_db, "zsh", "5.8", "9.el9", "x86_64", "d"
+    )
+    removed = await create_package(
+        pulp_db, "vim", "9.0", "1.el9", "noarch", "e"
+    )
+    added = await create_package(
+        pulp_db, "python3", "3.9", "1.el9", "noarch", "f"
+    )
+    dropped = await create_package(
+        pulp_db, "tar", "1.34", "6.el9", "x86_64", "g"
+    )
+    for content_id in (same, stable_zsh, removed):
+        await stable.add(content_id)
+    # Present in the first version of the stable repository only
+    await stable.add(dropped, added=1, removed=2)
+    for content_id in (same, beta_zsh, beta_zsh_duplicate, added):
+        await beta.add(content_id)
+    return (
+        stable,
+        beta,
+        {
+            "same": same,
+            "stable_zsh": stable_zsh,
+            "beta_zsh": beta_zsh,
+            "removed": removed,
+            "added": added,
+            "dropped": dropped,
+        },
+    )
+
+
+async def collect_diff(pulp_db: AsyncSession, left, right, **kwargs):
+    return [
+        diff
+        async for diff in aiter_repo_content_diff(
+            pulp_db, left, right, **kwargs
+        )
+    ]
+
+
+@pytest.mark.anyio
+async def test_aiter_repo_content_diff(pulp_db, diff_repos):
+    stable, beta, packages = diff_repos
+    diff = await collect_diff(
+        pulp_db,
+        [RepoVersionRef(stable.repo_id)],
+        [RepoVersionRef(beta.repo_id)],
+        statuses=REPO_DIFF_STATUSES,
+    )
+    assert [
+        (
+            item.nevra,
+            item.status,
+            item.left_pkg_id,
+            item.right_pkg_id,
+            item.left_pulp_href,
+            item.right_pulp_href,
+        )
+        for item in diff
+    ] == [
+        (
+            "bash-0:5.1.8-9.el9.x86_64",
+            "same",
+            "a",
+            "a",
+            get_package_href(packages["same"]),
+            get_package_href(packages["same"]),
+        ),
+        (
+            "python3-0:3.9-1.el9.noarch",
+            "added",
+            None,
+            "f",
+            None,
+            get_package_href(packages["added"]),
+        ),
+        (
+            "vim-0:9.0-1.el9.noarch",
+            "removed",
+            "e",
+            None,
+            get_package_href(packages["removed"]),
+            None,
+        ),
+        (
+            "zsh-0:5.8-9.el9.x86_64",
+            "changed",
+            "b",
+            "c",
+            get_package_href(packages["stable_zsh"]),
+            get_package_href(packages["beta_zsh"]),
+        ),
+    ]
+
+
+@pytest.mark.anyio
+async def test_aiter_repo_content_diff_filters(pulp_db, diff_repos):
+    stable, beta, _ = diff_repos
+    diff = await collect_diff(
+        pulp_db,
+        [RepoVersionRef(stable.repo_id, 1)],
+        [RepoVersionRef(beta.repo_id)],
+        statuses=("removed",),
+        arches=["x86_64"],
+    )
+    # The first version still has tar, noarch vim is filtered out
+    assert [item.nevra for item in diff] == ["tar-0:1.34-6.el9.x86_64"]
+
+
+@pytest.mark.anyio
+async def test_compare_beta_to_stable_intersections(
+    monkeypatch, pulp_db, diff_repos
+):
+    @contextlib.asynccontextmanager
+    async def open_pulp_session(key: str):
+        yield pulp_db
+
+    monkeypatch.setattr(
+        compare_beta_to_stable, "open_async_session", open_pulp_session
+    )
+    stable, beta, _ = diff_repos
+    intersections = (
+        await compare_beta_to_stable.PackagesComparator().get_intersections(
+            [Repository(name="stable", pulp_href=stable.pulp_href)],
+            [Repository(name="beta", pulp_href=beta.pulp_href)],
+        )
+    )
+    # NEVRAs are reported instead of the former file names
+    assert intersections == {
+        "bash-0:5.1.8-9.el9.x86_64",
+        "zsh-0:5.8-9.el9.x86_64",
+    }
@@ -0,0 +1,44 @@
+import datetime
+
+import fakeredis
+import pytest
+
+from alws.config import settings
+from alws.utils import updateinfo_cache
+from alws.utils.updateinfo_cache import (
+    get_cached_updateinfo,
+    invalidate_updateinfo,
+    store_updateinfo,
+)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(updateinfo_cache, '_redis', redis)
+    monkeypatch.setattr(settings, 'updateinfo_xml_cache_ttl', 60)
+    return redis
+
+
+@pytest.mark.anyio
+async def test_invalidate_updateinfo(redis):
+    updated_date = datetime.datetime(2024, 1, 1)
+    for platform_id in (1, 2, None):
+        await store_updateinfo('ALSA-1', platform_id, updated_date, 'xml')
+    await store_updateinfo('ALSA-2', 1, updated_date, 'other')
+
+    await invalidate_updateinfo(['ALSA-1'])
+
+    for platform_id in (1, 2, None):
+        assert not await get_cached_updateinfo(
+            'ALSA-1', platform_id, updated_date
+        )
+    cached = await get_cached_updateinfo('ALSA-2', 1, updated_date)
+    assert cached[0] == 'other'
+    assert await redis.keys('*ALSA-1*') == []
+
+
+@pytest.mark.anyio
+async def test_invalidate_unknown_record(redis):
+    await invalidate_updateinfo(['ALSA-3'])
+    await invalidate_updateinfo([])
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from alws.crud.errata import UpdateinfoIndex
+
+PKG_HREF = '/pulp/api/v3/content/rpm/packages/1/'
+OTHER_HREF = '/pulp/api/v3/content/rpm/packages/2/'
+
+
+def make_errata_pkg(pkg_id: int, record_id: str, **kwargs):
+    return SimpleNamespace(
+        id=pkg_id,
+        albs_artifact_id=kwargs.get('albs_artifact_id'),
+        pulp_href=kwargs.get('pulp_href'),
+        errata_package=SimpleNamespace(errata_record_id=record_id),
+    )
+
+
+def make_index() -> UpdateinfoIndex:
+    index = UpdateinfoIndex()
+    for artifact_id, href in ((1, PKG_HREF), (2, OTHER_HREF)):
+        artifact = SimpleNamespace(id=artifact_id, href=href)
+        index.artifacts[href].append(artifact)
+        index.artifacts_by_id[artifact_id] = artifact
+    index.pulp_packages[PKG_HREF] = {'name': 'bash'}
+    index.add_errata_packages([
+        make_errata_pkg(1, 'ALSA-2024:0001', albs_artifact_id=1),
+        make_errata_pkg(2, 'ALSA-2024:0002', pulp_href=PKG_HREF),
+        make_errata_pkg(3, 'ALSA-2024:0003', albs_artifact_id=2),
+    ])
+    return index
+
+
+def test_artifact_and_href_links():
+    index = make_index()
+    mapping = index.get_updateinfo_mapping([PKG_HREF, PKG_HREF])
+    assert sorted(mapping) == ['ALSA-2024:0001', 'ALSA-2024:0002']
+    for record_id, errata_pkg_id in (
+        ('ALSA-2024:0001', 1),
+        ('ALSA-2024:0002', 2),
+    ):
+        [(artifact, pulp_pkg, errata_pkg)] = mapping[record_id]
+        assert artifact.id == 1
+        assert pulp_pkg == {'name': 'bash'}
+        assert errata_pkg.id == errata_pkg_id
+
+
+def test_blacklisted_records_are_skipped():
+    index = make_index()
+    mapping = index.get_updateinfo_mapping(
+        [PKG_HREF],
+        blacklist_updateinfo=['ALSA-2024:0001'],
+    )
+    assert list(mapping) == ['ALSA-2024:0002']
+
+
+def test_missing_pulp_package_is_skipped():
+    index = make_index()
+    assert not index.get_updateinfo_mapping([OTHER_HREF])